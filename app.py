@@ -1,825 +1,163 @@
-from flask import Flask, request, jsonify
-import requests
-import json
+"""
+Application factory WhatsApp Bot Kemenag Kabupaten Madiun
+
+Role proses (APP_ROLE atau argumen create_app):
+    bot   -> hanya webhook, health, metrics (worker ringan untuk traffic Meta)
+    admin -> dashboard admin, manajemen layanan & admin
+    all   -> keduanya (default, cocok untuk development)
+
+Contoh deploy terpisah:
+    APP_ROLE=bot   gunicorn -w 4 app:app
+    APP_ROLE=admin gunicorn -w 2 app:app
+"""
+
 import os
 import logging
-from typing import Dict, Optional, Tuple
-from datetime import datetime
-import pytz
-from models import (
-    db,
-    User,
-    Message,
-    UserSession,
-    AdminUser,
-    Kategori,
-    Layanan,
-    Persyaratan,
-    SOP,
-    get_wib_time,
-)
-import time
-from dotenv import load_dotenv
 import secrets
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_migrate import Migrate
-from flask_login import LoginManager, current_user, login_required
+
+from flask import Flask, jsonify, request
+from dotenv import load_dotenv
+
+from models import db
+from logging_setup import NonBlockingQueueHandler, configure_logging
+import catalog
+import db_instrumentation
+import metrics
 
 load_dotenv()
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# Setup logging (non-blocking: format & I/O di thread writer)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-# Flask app
-app = Flask(__name__)
+APP_ROLES = ("bot", "admin", "all")
+ADMIN_BLUEPRINTS = ("admin", "admin_mgmt", "layanan")
 
-# Config
-app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", secrets.token_hex(32))
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "whatsapp_bot_kemenag")
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-if os.getenv("DATABASE_URL"):
-    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL")
-else:
-    app.config["SQLALCHEMY_DATABASE_URI"] = (
-        f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-        "?charset=utf8mb4"
-    )
-
-# Flask-Login
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'admin.login'
-login_manager.login_message = 'Silakan login terlebih dahulu.'
-login_manager.login_message_category = 'warning'
-
-@login_manager.user_loader
-def load_user(user_id):
-    return AdminUser.query.get(int(user_id))
-
-db.init_app(app)
-migrate = Migrate(app, db)
-
-@app.context_processor
-def inject_user():
-    return dict(current_user=current_user)
-
-# Register blueprints
-from routes.admin import admin_bp
-from routes.layanan_routes import layanan_bp
-from routes.admin_management import admin_mgmt_bp
-
-app.register_blueprint(admin_mgmt_bp)
-app.register_blueprint(admin_bp)
-app.register_blueprint(layanan_bp)
-
-# WhatsApp Config
-WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN", "")
-PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID", "")
-VERIFY_TOKEN = os.getenv("VERIFY_TOKEN", "your_verify_token_123")
-WHATSAPP_API_URL = f"https://graph.facebook.com/v21.0/{PHONE_NUMBER_ID}/messages"
-# ============================================
-# HELPER: Load Data from MySQL
-# ============================================
-
-def get_kategori_data():
-    """Get all kategori from database"""
-    kategoris = Kategori.query.filter_by(is_active=True).order_by(Kategori.urutan).all()
-    result = {}
-    for kat in kategoris:
-        result[kat.kode] = {
-            "nama": kat.nama,
-            "icon": kat.icon,
-            "layanan": [
-                lay.to_dict()
-                for lay in kat.layanan.filter_by(is_active=True)
-                .order_by(Layanan.urutan)
-                .all()
-            ],
-        }
-    return result
-
-
-def find_layanan_by_id(layanan_id: str) -> Tuple[Optional[Dict], Optional[str]]:
-    """Cari layanan berdasarkan ID - UPDATED: layanan_id is PRIMARY KEY"""
-    layanan = Layanan.query.filter_by(layanan_id=layanan_id, is_active=True).first()
-    if layanan:
-        return layanan.to_dict(), layanan.kategori.kode
-    return None, None
-
-
-def is_valid_layanan_id(response_id: str) -> bool:
-    """Cek apakah response_id adalah layanan_id yang valid dari database"""
-    layanan = Layanan.query.filter_by(layanan_id=response_id, is_active=True).first()
-    return layanan is not None
-
-
-# ============================================
-# Database Helper Functions
-# ============================================
-
-def get_or_create_user(phone_number: str) -> User:
-    """Get atau create user di database"""
-    user = User.query.filter_by(phone_number=phone_number).first()
-    if not user:
-        user = User(phone_number=phone_number)
-        db.session.add(user)
-        db.session.commit()
-        logger.info(f"✨ New user created: {phone_number}")
-    user.last_interaction = get_wib_time()
-    user.total_messages += 1
-    db.session.commit()
-    return user
-
-
-def save_message(
-    user: User,
-    message_id: str,
-    direction: str,
-    message_type: str,
-    content: str = None,
-    layanan_id: str = None,
-    status: str = "sent",
-):
-    """Save message ke database"""
-    try:
-        msg = Message(
-            message_id=message_id,
-            user_id=user.id,
-            direction=direction,
-            message_type=message_type,
-            content=content,
-            layanan_id=layanan_id,
-            status=status,
-        )
-        db.session.add(msg)
-        db.session.commit()
-        
-        # Log yang lebih jelas
-        if layanan_id:
-            logger.info(f"💾 Message saved: {message_id} | Direction: {direction} | Layanan: {layanan_id}")
-        else:
-            logger.info(f"💾 Message saved: {message_id} | Direction: {direction} | No layanan")
-            
-    except Exception as e:
-        logger.error(f"❌ Error saving message: {e}")
-        db.session.rollback()
-
-def update_session(user: User, category: str = None, layanan_id: str = None):
-    """Update user session"""
-    try:
-        session_obj = UserSession.query.filter_by(user_id=user.id).first()
-        if not session_obj:
-            session_obj = UserSession(user_id=user.id)
-            db.session.add(session_obj)
-        if category:
-            session_obj.current_category = category
-        if layanan_id:
-            session_obj.current_layanan = layanan_id
-            session_obj.last_interaction = layanan_id
-        session_obj.updated_at = get_wib_time()
-        db.session.commit()
-    except Exception as e:
-        logger.error(f"❌ Error updating session: {e}")
-        db.session.rollback()
-
-
-def send_whatsapp_message(to: str, payload: Dict, layanan_id: str = None) -> Optional[Dict]:
-    """
-    Kirim pesan WhatsApp dan save ke database
-    FIXED: Hanya save 1x dengan layanan_id jika diberikan
-    """
-    try:
-        if not WHATSAPP_TOKEN or not PHONE_NUMBER_ID:
-            logger.error("❌ Token atau Phone ID tidak diset!")
-            return None
-
-        headers = {
-            "Authorization": f"Bearer {WHATSAPP_TOKEN}",
-            "Content-Type": "application/json",
-        }
-        data = {"messaging_product": "whatsapp", "to": to, **payload}
-
-        response = requests.post(
-            WHATSAPP_API_URL, headers=headers, json=data, timeout=10
-        )
-        response.raise_for_status()
-        result = response.json()
-
-        user = get_or_create_user(to)
-        message_id = result.get("messages", [{}])[0].get("id", "unknown")
-
-        # Extract content
-        content = None
-        if payload.get("type") == "text":
-            content = payload.get("text", {}).get("body")
-        elif payload.get("type") == "interactive":
-            interactive = payload.get("interactive", {})
-            content = interactive.get("body", {}).get("text")
-
-        # PENTING: Hanya save 1x di sini
-        save_message(
-            user, 
-            message_id, 
-            "outgoing", 
-            payload.get("type"), 
-            content,
-            layanan_id=layanan_id  # Parameter opsional
-        )
-        
-        logger.info(f"✅ Message sent to {to} | Type: {payload.get('type')} | Layanan: {layanan_id or 'None'}")
-        return result
-
-    except Exception as e:
-        logger.error(f"❌ Error sending: {e}")
-        return None
-
-# ============================================
-# WhatsApp Message Builders
-# ============================================
 
-def get_menu_utama() -> Dict:
-    """Generate menu utama dari database MySQL"""
-    KATEGORI_DATA = get_kategori_data()
-    rows = []
-    for kat_key, kat_data in KATEGORI_DATA.items():
-        rows.append({
-            "id": f"kat_{kat_key}",
-            "title": f"{kat_data['icon']} {kat_data['nama']}"[:24],
-        })
-
-    return {
-        "type": "interactive",
-        "interactive": {
-            "type": "list",
-            "header": {"type": "text", "text": "Kemenag Kab. Madiun"},
-            "body": {
-                "text": "Assalamualaikum! Selamat datang di layanan informasi Kemenag Kabupaten Madiun.\n\nSilakan pilih kategori layanan:"
-            },
-            "footer": {"text": "PTSP Kemenag Kab. Madiun"},
-            "action": {
-                "button": "Pilih Kategori",
-                "sections": [{"title": "Kategori Layanan", "rows": rows}],
-            },
-        },
-    }
-
-
-def get_daftar_layanan(kategori_id: str) -> Dict:
-    """Generate daftar layanan per kategori dari database"""
-    try:
-        kategori_key = kategori_id.replace("kat_", "")
-        kategori = Kategori.query.filter_by(kode=kategori_key, is_active=True).first()
-
-        if not kategori:
-            logger.warning(f"⚠️ Kategori {kategori_key} tidak ditemukan")
-            return get_menu_utama()
-
-        layanan_list = (
-            kategori.layanan.filter_by(is_active=True)
-            .order_by(Layanan.urutan)
-            .limit(10)
-            .all()
-        )
-
-        rows = []
-        for layanan in layanan_list:
-            judul = layanan.judul
-            rows.append({
-                "id": layanan.layanan_id,
-                "title": judul[:24],
-                "description": judul[24:72] if len(judul) > 24 else "Klik untuk detail",
-            })
-
-        if not rows:
-            rows.append({
-                "id": "none",
-                "title": "Tidak ada layanan",
-                "description": "Belum ada layanan tersedia",
-            })
-
-        return {
-            "type": "interactive",
-            "interactive": {
-                "type": "list",
-                "header": {"type": "text", "text": f"{kategori.icon} {kategori.nama}"},
-                "body": {"text": "Pilih layanan yang Anda butuhkan untuk melihat persyaratan dan prosedur:"},
-                "footer": {"text": "PTSP Kemenag Kab. Madiun"},
-                "action": {
-                    "button": "Pilih Layanan",
-                    "sections": [{"title": "Layanan Tersedia", "rows": rows}],
-                },
-            },
-        }
-    except Exception as e:
-        logger.error(f"❌ Error get_daftar_layanan: {e}")
-        return get_menu_utama()
-
-
-def get_detail_layanan_split(layanan_id: str) -> Tuple[Dict, Optional[Dict]]:
-    """
-    Generate detail layanan dalam 2 pesan:
-    1. Text message dengan persyaratan lengkap (max 4096 chars)
-    2. Interactive button untuk aksi
-    
-    Returns: (message1, message2) atau (message1, None)
-    """
-    try:
-        layanan, kategori_key = find_layanan_by_id(layanan_id)
-
-        if not layanan:
-            logger.warning(f"⚠️ Layanan {layanan_id} tidak ditemukan")
-            return get_menu_utama(), None
-
-        # PESAN 1: Detail lengkap (text message, max 4096 chars)
-        judul = layanan.get('judul', '')
-        waktu = layanan.get('Jangka Waktu Pelayanan', '-')
-        biaya = layanan.get('Biaya/Tarif', '-')
-        
-        detail_text = f"*{judul}*\n\n"
-        detail_text += "━━━━━━━━━━━━━━━━━━━━\n"
-        detail_text += "*📋 PERSYARATAN LENGKAP*\n"
-        detail_text += "━━━━━━━━━━━━━━━━━━━━\n\n"
-        
-        persyaratan = layanan.get("PERSYARATAN", [])
-        if persyaratan:
-            for i, req in enumerate(persyaratan, 1):
-                detail_text += f"{i}. {req}\n\n"
-        else:
-            detail_text += "Tidak ada persyaratan khusus\n\n"
-        
-        detail_text += "━━━━━━━━━━━━━━━━━━━━\n"
-        detail_text += f"*⏱️ JANGKA WAKTU PELAYANAN*\n{waktu}\n\n"
-        detail_text += f"*💰 BIAYA/TARIF*\n{biaya}\n\n"
-        
-        if "qrcode" in layanan and layanan["qrcode"]:
-            detail_text += f"*🔗 LINK PENDUKUNG*\n{layanan['qrcode']}\n\n"
-        
-        detail_text += "━━━━━━━━━━━━━━━━━━━━\n"
-        detail_text += "_Untuk melihat SOP lengkap, klik tombol di bawah_"
-        
-        # Limit untuk text message: 4096 karakter
-        if len(detail_text) > 4096:
-            detail_text = detail_text[:4093] + "..."
-            logger.warning(f"⚠️ Detail text dipotong: {len(detail_text)} chars")
-        
-        message1 = {
-            "type": "text",
-            "text": {"body": detail_text}
-        }
-        
-        # PESAN 2: Interactive buttons untuk aksi
-        message2 = {
-            "type": "interactive",
-            "interactive": {
-                "type": "button",
-                "body": {"text": "Silakan pilih tindakan:"},
-                "footer": {"text": "PTSP Kemenag Kab. Madiun"},
-                "action": {
-                    "buttons": [
-                        {
-                            "type": "reply",
-                            "reply": {
-                                "id": f"btn_sop_{layanan_id}",
-                                "title": "📄 Lihat SOP",
-                            },
-                        },
-                        {
-                            "type": "reply",
-                            "reply": {
-                                "id": f"btn_back_{kategori_key}",
-                                "title": "⬅️ Kembali",
-                            },
-                        },
-                        {
-                            "type": "reply",
-                            "reply": {"id": "btn_menu", "title": "🏠 Menu"},
-                        },
-                    ]
-                },
-            },
-        }
-        
-        logger.info(f"📄 Detail layanan built: {len(detail_text)} chars, {len(persyaratan)} persyaratan")
-        
-        return message1, message2
-        
-    except Exception as e:
-        logger.error(f"❌ Error get_detail_layanan_split: {e}")
-        import traceback
-        traceback.print_exc()
-        return get_menu_utama(), None
-
-
-def get_detail_sop(layanan_id: str) -> Dict:
-    """Generate detail SOP berdasarkan ID dari database"""
-    try:
-        layanan, _ = find_layanan_by_id(layanan_id)
-
-        if not layanan:
-            return {"type": "text", "text": {"body": "SOP tidak ditemukan"}}
-
-        body_text = f"*🔄 ALUR SOP*\n"
-        body_text += f"*{layanan.get('judul', '')}*\n\n"
-        body_text += "━━━━━━━━━━━━━━━━━━━━\n\n"
-
-        sop = layanan.get("SOP", [])
-        if sop:
-            for i, step in enumerate(sop, 1):
-                body_text += f"*Langkah {i}:*\n{step}\n\n"
-        else:
-            body_text += "SOP untuk layanan ini sedang dalam proses penyusunan.\n\n"
-
-        body_text += "━━━━━━━━━━━━━━━━━━━━\n"
-        body_text += f"*⏱️ Total Waktu:* {layanan.get('Jangka Waktu Pelayanan', '-')}\n"
-        body_text += f"*💰 Biaya:* {layanan.get('Biaya/Tarif', '-')}\n"
-        body_text += "━━━━━━━━━━━━━━━━━━━━"
-        
-        # Limit 4096 chars untuk text message
-        if len(body_text) > 4096:
-            body_text = body_text[:4093] + "..."
-
-        return {"type": "text", "text": {"body": body_text}}
-    except Exception as e:
-        logger.error(f"❌ Error get_detail_sop: {e}")
-        return {"type": "text", "text": {"body": "Error mengambil SOP"}}
-
-
-def get_button_wa_lain() -> Dict:
-    """Pesan teks untuk hubungi admin"""
-    return {
-        "type": "text",
-        "text": {
-            "body": "*Ingin langsung menghubungi admin?*\n\nKlik tautan di bawah untuk menghubungi kami melalui WhatsApp:\nhttps://wa.me/6282245552687?text=Assalamualaikum,%20saya%20butuh%20bantuan\n\nTim support kami siap membantu Anda sesuai jam pelayanan 🙏"
-        },
-    }
-# ============================================
-# HANDLE MESSAGE - Dynamic Prefix
-# ============================================
 
-def handle_message(message: Dict, from_number: str):
+def _secret_key(role: str) -> str:
     """
-    Handle incoming message
-    FIXED: layanan_id hanya tersimpan pada content message (detail & SOP)
+    SECRET_KEY wajib sama di semua worker admin (session Flask-Login).
+    Tanpa SECRET_KEY dipakai key random; di production halaman admin lalu
+    ditolak (lihat _require_secret_key), tetapi CLI & webhook tetap jalan.
     """
-    try:
-        message_type = message.get("type")
-        message_id = message.get("id")
-
-        user = get_or_create_user(from_number)
-
-        # Extract content
-        content = None
-        if message_type == "text":
-            content = message.get("text", {}).get("body")
-
-        # Save incoming message (TIDAK PERNAH ada layanan_id untuk incoming)
-        save_message(user, message_id, "incoming", message_type, content)
-
-        # Validasi type
-        valid_types = ["text", "interactive"]
-        if message_type not in valid_types:
-            logger.info(f"⏭️ Skipping message type: {message_type}")
-            return
-
-        logger.info(f"📨 Processing {message_type} from {from_number}")
-
-        # === TEXT MESSAGE ===
-        if message_type == "text":
-            text = content.lower() if content else ""
-            logger.info(f"💬 Text: {text}")
-
-            if any(word in text for word in ["halo", "hi", "menu", "mulai", "start"]):
-                # ❌ Menu utama = NAVIGASI (tanpa layanan_id)
-                send_whatsapp_message(from_number, get_menu_utama())
-                time.sleep(1)
-                send_whatsapp_message(from_number, get_button_wa_lain())
-                update_session(user)
-            else:
-                # ❌ Response text = NAVIGASI (tanpa layanan_id)
-                send_whatsapp_message(
-                    from_number,
-                    {"type": "text", "text": {"body": "Ketik *menu* untuk melihat layanan yang tersedia."}},
-                )
-
-        # === INTERACTIVE MESSAGE ===
-        elif message_type == "interactive":
-            interactive = message.get("interactive", {})
-            response_id = interactive.get("list_reply", {}).get("id") or \
-                         interactive.get("button_reply", {}).get("id")
-
-            if not response_id:
-                logger.warning("⚠️ No response_id found")
-                return
-
-            logger.info(f"📘 Button/List clicked: {response_id}")
-
-            # 1️⃣ ❌ Pilih kategori = NAVIGASI (tanpa layanan_id)
-            if response_id.startswith("kat_"):
-                kategori_key = response_id.replace("kat_", "")
-                send_whatsapp_message(
-                    from_number, 
-                    get_daftar_layanan(response_id)
-                    # TIDAK ada parameter layanan_id
-                )
-                update_session(user, category=kategori_key)
-
-            # 2️⃣ ✅ PILIH LAYANAN - Detail DENGAN layanan_id, Button TANPA
-            elif is_valid_layanan_id(response_id):
-                logger.info(f"📋 Layanan dipilih: {response_id}")
-                
-                msg1, msg2 = get_detail_layanan_split(response_id)
-                
-                # ✅ Pesan 1: Detail layanan = CONTENT (DENGAN layanan_id)
-                send_whatsapp_message(
-                    from_number, 
-                    msg1, 
-                    layanan_id=response_id  # ← SIMPAN DI SINI
-                )
-                
-                time.sleep(0.8)
-                
-                # ❌ Pesan 2: Button navigasi = NAVIGASI (TANPA layanan_id)
-                if msg2:
-                    send_whatsapp_message(
-                        from_number, 
-                        msg2
-                        # ← TIDAK ada layanan_id
-                    )
-                
-                update_session(user, layanan_id=response_id)
-
-            # 3️⃣ ❌ Tombol SOP = NAVIGASI/INFO (TANPA layanan_id)
-            elif response_id.startswith("btn_sop_"):
-                layanan_id = response_id.replace("btn_sop_", "")
-                logger.info(f"📄 SOP diminta: {layanan_id}")
-                
-                send_whatsapp_message(
-                    from_number, 
-                    get_detail_sop(layanan_id)
-                    # ← TIDAK ada layanan_id (NULL)
-                )
-
-            # 4️⃣ ❌ Tombol Kembali = NAVIGASI (tanpa layanan_id)
-            elif response_id.startswith("btn_back_"):
-                kategori_key = response_id.replace("btn_back_", "")
-                send_whatsapp_message(
-                    from_number, 
-                    get_daftar_layanan(f"kat_{kategori_key}")
-                    # TIDAK ada layanan_id
-                )
-
-            # 5️⃣ ❌ Tombol Menu = NAVIGASI (tanpa layanan_id)
-            elif response_id == "btn_menu":
-                send_whatsapp_message(from_number, get_menu_utama())
-                time.sleep(1)
-                send_whatsapp_message(from_number, get_button_wa_lain())
-                update_session(user)
-
-            # 6️⃣ ❌ Tidak ada layanan = NAVIGASI (tanpa layanan_id)
-            elif response_id == "none":
-                send_whatsapp_message(
-                    from_number,
-                    {"type": "text", "text": {"body": "Maaf, belum ada layanan tersedia untuk kategori ini. Ketik *menu* untuk kembali."}},
-                )
-
-            # 7️⃣ ❌ Fallback = NAVIGASI (tanpa layanan_id)
-            else:
-                logger.warning(f"⚠️ Unknown response_id: {response_id}")
-                send_whatsapp_message(
-                    from_number,
-                    {"type": "text", "text": {"body": "Maaf, pilihan tidak dikenali. Ketik *menu* untuk kembali ke menu utama."}},
-                )
-
-    except Exception as e:
-        logger.error(f"❌ Error handling message: {e}")
-        import traceback
-        traceback.print_exc()
-
-# ============================================
-# Flask Routes
-# ============================================
-
-@app.route("/webhook", methods=["GET"])
-def webhook_verify():
-    """Verify webhook"""
-    mode = request.args.get("hub.mode")
-    token = request.args.get("hub.verify_token")
-    challenge = request.args.get("hub.challenge")
-
-    logger.info(f"🔍 Verification request - Token: {token}")
-
-    if mode == "subscribe" and token == VERIFY_TOKEN:
-        logger.info("✅ Webhook verified!")
-        return challenge, 200
-    else:
-        logger.warning("❌ Verification failed!")
-        return "Forbidden", 403
-
-
-@app.route("/webhook", methods=["POST"])
-def webhook_handler():
-    """Handle incoming webhooks"""
-    try:
-        body = request.get_json()
-        logger.debug(f"📥 Webhook: {json.dumps(body, indent=2)}")
+    secret_key = os.getenv("SECRET_KEY")
+    if secret_key:
+        return secret_key
+    if role != "bot":
+        logger.warning("⚠️ SECRET_KEY tidak di-set, memakai key random (hanya untuk development)")
+    return secrets.token_hex(32)
 
-        if body.get("object") != "whatsapp_business_account":
-            return jsonify({"status": "ignored"}), 200
 
-        for entry in body.get("entry", []):
-            for change in entry.get("changes", []):
-                value = change.get("value", {})
-
-                if "statuses" in value:
-                    logger.info("ℹ️ Status update (ignored)")
-                    continue
+def _require_secret_key(app: Flask):
+    """Production tanpa SECRET_KEY: request ke halaman admin gagal, bukan import app"""
+    if os.getenv("SECRET_KEY") or os.getenv("FLASK_ENV", "production") == "development":
+        return
 
-                if "messages" not in value:
-                    continue
+    @app.before_request
+    def _refuse_admin_without_secret_key():
+        if request.blueprint in ADMIN_BLUEPRINTS:
+            raise RuntimeError("SECRET_KEY belum di-set! Wajib untuk halaman admin di production.")
 
-                messages = value.get("messages", [])
 
-                for message in messages:
-                    from_number = message.get("from")
-                    message_id = message.get("id")
+def _init_admin(app: Flask):
+    """Flask-Login, Migrate, dan blueprint admin (di-import hanya untuk role admin/all)"""
+    from flask_login import LoginManager, current_user
+    from flask_migrate import Migrate
+    from models import AdminUser
+    from routes.admin import admin_bp
+    from routes.layanan_routes import layanan_bp
+    from routes.admin_management import admin_mgmt_bp
 
-                    existing = Message.query.filter_by(message_id=message_id).first()
-                    if existing:
-                        logger.info(f"⏭️ Message {message_id} already processed")
-                        continue
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.login_view = 'admin.login'
+    login_manager.login_message = 'Silakan login terlebih dahulu.'
+    login_manager.login_message_category = 'warning'
 
-                    logger.info(f"✅ New message {message_id} from {from_number}")
-                    handle_message(message, from_number)
+    @login_manager.user_loader
+    def load_user(user_id):
+        return AdminUser.query.get(int(user_id))
 
-        return jsonify({"status": "success"}), 200
+    Migrate(app, db)
 
-    except Exception as e:
-        logger.error(f"❌ Webhook error: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"status": "error", "message": str(e)}), 500
+    @app.context_processor
+    def inject_user():
+        return dict(current_user=current_user)
 
+    app.register_blueprint(admin_mgmt_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(layanan_bp)
+    _require_secret_key(app)
 
-@app.route("/health", methods=["GET"])
-def health_check():
-    """Health check"""
-    try:
-        db.session.execute(db.text("SELECT 1"))
-        db_status = "connected"
-    except Exception as e:
-        db_status = f"disconnected: {str(e)}"
 
-    kategori_count = Kategori.query.filter_by(is_active=True).count()
-    layanan_count = Layanan.query.filter_by(is_active=True).count()
+def _init_bot(app: Flask):
+    """Blueprint webhook, health probe, dan metrics"""
+    from routes.webhook import webhook_bp
+    import bot
 
-    return jsonify({
-        "status": "healthy",
-        "service": "WhatsApp Bot Kemenag Madiun",
-        "timestamp": get_wib_time().isoformat(),
-        "database": db_status,
-        "database_type": "MySQL",
-        "timezone": "Asia/Jakarta (WIB)",
-        "categories": kategori_count,
-        "total_services": layanan_count,
-    }), 200
+    app.register_blueprint(webhook_bp)
+    bot.init_spool_replay(app)
+    bot.init_webhook_journal(app)
 
 
-@app.route("/send-test", methods=["POST"])
-def send_test_message():
-    """Test endpoint"""
-    data = request.get_json()
-    to = data.get("to")
+def create_app(role: str = None) -> Flask:
+    """Buat Flask app untuk role tertentu (default: APP_ROLE atau 'all')"""
+    role = (role or os.getenv("APP_ROLE", "all")).lower()
+    if role not in APP_ROLES:
+        raise ValueError(f"APP_ROLE tidak dikenal: {role} (pilih: {', '.join(APP_ROLES)})")
 
-    if not to:
-        return jsonify({"error": "Phone number required"}), 400
+    app = Flask(__name__)
 
-    result = send_whatsapp_message(to, get_menu_utama())
+    # Config
+    app.config["APP_ROLE"] = role
+    app.config["SECRET_KEY"] = _secret_key(role)
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQL_STATS_HEADERS"] = os.getenv("SQL_STATS_HEADERS", "").lower() in ("1", "true", "yes")
 
-    if result:
-        return jsonify({"status": "success", "result": result}), 200
+    if os.getenv("DATABASE_URL"):
+        app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL")
     else:
-        return jsonify({"status": "error"}), 500
+        app.config["SQLALCHEMY_DATABASE_URI"] = (
+            f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+            "?charset=utf8mb4"
+        )
 
+    db.init_app(app)
+    db_instrumentation.init_app(app)
+    catalog.init_app(app)
+    metrics.REGISTRY.start_flusher()
+    metrics.REGISTRY.gauge(
+        "log_records_dropped", "Log record yang di-drop karena antrian logging penuh"
+    ).set_function(lambda: NonBlockingQueueHandler.dropped)
 
-@app.errorhandler(404)
-def not_found(e):
-    return jsonify({"error": "Not found", "message": str(e)}), 404
+    if role in ("bot", "all"):
+        _init_bot(app)
+    if role in ("admin", "all"):
+        _init_admin(app)
 
+    from cli import register_commands
+    register_commands(app)
 
-@app.errorhandler(500)
-def internal_error(e):
-    return jsonify({"error": "Internal server error", "message": str(e)}), 500
-# ============================================
-# CLI Commands
-# ============================================
+    @app.errorhandler(404)
+    def not_found(e):
+        return jsonify({"error": "Not found", "message": str(e)}), 404
 
-@app.cli.command()
-def init_db():
-    """Initialize database tables"""
-    print("=" * 60)
-    print("⚠️  WARNING: This will DROP ALL TABLES and data!")
-    print("=" * 60)
-    confirm = input("Type 'yes' to confirm: ")
+    @app.errorhandler(500)
+    def internal_error(e):
+        return jsonify({"error": "Internal server error", "message": str(e)}), 500
 
-    if confirm.lower() != "yes":
-        print("❌ Operation cancelled")
-        return
+    logger.info("🚀 App created (role=%s)", role)
+    return app
 
-    try:
-        db.drop_all()
-        db.create_all()
-        print("✅ Database tables created successfully!")
-    except Exception as e:
-        print(f"❌ Error: {e}")
-
-
-@app.cli.command()
-def create_admin():
-    """Create admin user"""
-    print("=" * 60)
-    print("👤 Creating Admin User")
-    print("=" * 60)
-
-    existing_admin = AdminUser.query.first()
-    if existing_admin:
-        print(f"⚠️  Admin user already exists: {existing_admin.username}")
-        overwrite = input("Overwrite? (yes/no): ")
-        if overwrite.lower() != "yes":
-            print("❌ Operation cancelled")
-            return
-        db.session.delete(existing_admin)
-        db.session.commit()
-
-    username = os.getenv("ADMIN_USERNAME")
-    password = os.getenv("ADMIN_PASSWORD")
-
-    if not username:
-        username = input("Enter admin username: ").strip()
-        if not username:
-            print("❌ Username cannot be empty")
-            return
-
-    if not password:
-        import getpass
-        password = getpass.getpass("Enter admin password (min 8 chars): ").strip()
-        if len(password) < 8:
-            print("❌ Password must be at least 8 characters")
-            return
-
-        password_confirm = getpass.getpass("Confirm password: ").strip()
-        if password != password_confirm:
-            print("❌ Passwords do not match")
-            return
-
-    try:
-        admin = AdminUser(
-            username=username,
-            password_hash=generate_password_hash(password),
-            is_active=True,
-        )
-        db.session.add(admin)
-        db.session.commit()
-        print(f"\n✅ Admin user created successfully!")
-        print(f"   Username: {username}")
-
-    except Exception as e:
-        print(f"❌ Error creating admin: {e}")
-        db.session.rollback()
-
-
-@app.cli.command()
-def import_layanan():
-    """Import data layanan dari JSON ke MySQL"""
-    from import_layanan import import_layanan_from_json, verify_import
-    success = import_layanan_from_json()
-    if success:
-        verify_import()
-
-
-@app.cli.command()
-def setup():
-    """First-time setup: Create tables only"""
-    print("=" * 60)
-    print("🚀 Database Setup")
-    print("=" * 60)
-
-    try:
-        db.create_all()
-        print("✅ Database tables created!")
-        print("\nNext steps:")
-        print("1. Run: flask create-admin")
-        print("2. Run: flask import-layanan")
-        print("3. Start app: python app.py")
-    except Exception as e:
-        print(f"❌ Error: {e}")
+
+# Entry point untuk `gunicorn app:app` dan `flask run`
+app = create_app()
 
 
 # ============================================
@@ -827,6 +165,9 @@ def setup():
 # ============================================
 
 if __name__ == "__main__":
+    from models import AdminUser, Kategori, Layanan
+    import bot
+
     with app.app_context():
         try:
             db.create_all()
@@ -843,15 +184,16 @@ if __name__ == "__main__":
                 logger.warning("⚠️  No service data found! Run 'flask import-layanan'")
 
         except Exception as e:
-            logger.error(f"⚠️  Database init error: {e}")
+            logger.error("⚠️  Database init error: %s", e)
             kategori_count = 0
             layanan_count = 0
 
         print("=" * 60)
         print("🚀 WhatsApp Bot Kemenag Madiun - MySQL Version")
         print("=" * 60)
-        print(f"📱 WhatsApp Token: {'✅ Set' if WHATSAPP_TOKEN else '❌ Not Set'}")
-        print(f"📞 Phone ID: {'✅ Set' if PHONE_NUMBER_ID else '❌ Not Set'}")
+        print(f"🧩 Role: {app.config['APP_ROLE']}")
+        print(f"📱 WhatsApp Token: {'✅ Set' if bot.WHATSAPP_TOKEN else '❌ Not Set'}")
+        print(f"📞 Phone ID: {'✅ Set' if bot.PHONE_NUMBER_ID else '❌ Not Set'}")
         print(f"🗄️  Database: MySQL ({DB_HOST}:{DB_PORT}/{DB_NAME})")
         print(f"🌏 Timezone: Asia/Jakarta (WIB)")
         print(f"📂 Categories: {kategori_count}")
@@ -859,4 +201,4 @@ if __name__ == "__main__":
         print("=" * 60)
 
     port = int(os.getenv("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True, use_reloader=True)
\ No newline at end of file
+    app.run(host="0.0.0.0", port=port, debug=True, use_reloader=True)
@@ -0,0 +1,12 @@
+"""
+Benchmark & load generator untuk webhook WhatsApp Bot Kemenag
+
+Jalankan:
+    python -m benchmark --rate 50 --duration 30
+    python -m benchmark.replay captures/ --speed 5
+"""
+
+from benchmark.payloads import PayloadGenerator
+from benchmark.runner import BenchmarkConfig, run_benchmark
+
+__all__ = ['PayloadGenerator', 'BenchmarkConfig', 'run_benchmark']
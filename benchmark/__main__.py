@@ -0,0 +1,77 @@
+"""
+CLI benchmark webhook
+
+Contoh:
+    python -m benchmark --rate 50 --duration 30 --output hasil.json
+    python -m benchmark --database-url mysql+pymysql://root:@localhost/bench --no-seed
+"""
+
+import argparse
+import json
+import sys
+
+from benchmark.runner import BenchmarkConfig, run_benchmark
+
+
+def parse_mix(value: str):
+    """Parse 'greeting=10,kategori=30,...' menjadi dict bobot"""
+    mix = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark end-to-end webhook WhatsApp Bot')
+    parser.add_argument('--rate', type=float, default=20.0, help='request webhook per detik')
+    parser.add_argument('--duration', type=float, default=10.0, help='durasi run (detik)')
+    parser.add_argument('--batch-size', type=int, default=1, help='jumlah pesan per POST')
+    parser.add_argument('--concurrency', type=int, default=16, help='request paralel maksimum')
+    parser.add_argument('--users', type=int, default=200, help='jumlah nomor pengirim sintetis')
+    parser.add_argument('--database-url', help='default: SQLite sementara')
+    parser.add_argument('--no-seed', action='store_true', help='pakai katalog yang sudah ada di DB')
+    parser.add_argument('--kategori', type=int, default=6, help='jumlah kategori sintetis')
+    parser.add_argument('--layanan', type=int, default=8, help='layanan per kategori sintetis')
+    parser.add_argument('--graph-latency-ms', type=float, default=80.0, help='latency Graph API stub')
+    parser.add_argument('--graph-profile', help='jalankan Graph API stub HTTP dengan profil ini (healthy, chaos, ...)')
+    parser.add_argument('--graph-url', help='URL messages Graph API/stub yang sudah berjalan')
+    parser.add_argument('--honour-delays', action='store_true', help='jalankan jeda time.sleep() antar pesan')
+    parser.add_argument('--mix', type=parse_mix, default={}, help='bobot skenario, mis. kategori=30,layanan=30')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--output', help='tulis laporan JSON ke file')
+    args = parser.parse_args(argv)
+
+    config = BenchmarkConfig(
+        rate=args.rate,
+        duration=args.duration,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        users=args.users,
+        database_url=args.database_url,
+        seed_catalog=not args.no_seed,
+        kategori_count=args.kategori,
+        layanan_per_kategori=args.layanan,
+        graph_latency_ms=args.graph_latency_ms,
+        graph_profile=args.graph_profile,
+        graph_url=args.graph_url,
+        honour_delays=args.honour_delays,
+        seed=args.seed,
+        log_level=args.log_level,
+        mix=args.mix,
+    )
+    report = run_benchmark(config)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
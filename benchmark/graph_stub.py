@@ -0,0 +1,341 @@
+"""
+Stub server lokal pengganti Graph API WhatsApp
+(https://graph.facebook.com/v21.0/{PHONE_NUMBER_ID}/messages)
+
+Mendukung profil fault-injection: distribusi latency, burst 429, badai 5xx,
+timeout, dan response body yang lambat. Semua request direkam untuk asersi.
+
+Jalankan standalone:
+    python -m benchmark.graph_stub --port 8089 --profile chaos
+lalu arahkan app:
+    WHATSAPP_API_URL=http://127.0.0.1:8089/v21.0/123456789/messages
+
+Endpoint kontrol:
+    GET  /__stub__/requests   -> daftar request yang terekam
+    POST /__stub__/reset      -> kosongkan rekaman
+    POST /__stub__/profile    -> ganti profil, body: {"profile": "rate-limited"}
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+MESSAGES_PATH = re.compile(r'^/v\d+\.\d+/(?P<phone_number_id>[^/]+)/messages/?$')
+
+
+@dataclass
+class FaultProfile:
+    """Konfigurasi perilaku stub"""
+    name: str = 'healthy'
+    # Latency: fixed | uniform | lognormal
+    latency: str = 'lognormal'
+    latency_ms: float = 120.0          # fixed / median lognormal / batas bawah uniform
+    latency_max_ms: float = 400.0      # batas atas uniform
+    latency_sigma: float = 0.5         # sebaran lognormal
+    # 429: setiap `rate_limit_every` request, `rate_limit_burst` request berikutnya ditolak
+    rate_limit_every: int = 0
+    rate_limit_burst: int = 0
+    # Badai 5xx: `storm_seconds` terakhir dari setiap `storm_period_seconds`
+    storm_period_seconds: float = 0.0
+    storm_seconds: float = 0.0
+    error_rate: float = 0.0            # peluang 500 acak di luar badai
+    # Timeout: tahan response selama `hang_seconds` (lebih lama dari timeout client)
+    timeout_rate: float = 0.0
+    hang_seconds: float = 15.0
+    # Body lambat: header dikirim cepat, body dikirim per potongan
+    slow_body_rate: float = 0.0
+    slow_body_seconds: float = 3.0
+
+
+PROFILES: Dict[str, FaultProfile] = {
+    'healthy': FaultProfile(),
+    'fast': FaultProfile(name='fast', latency='fixed', latency_ms=0.0),
+    'slow': FaultProfile(name='slow', latency='uniform', latency_ms=800.0, latency_max_ms=3000.0),
+    'rate-limited': FaultProfile(name='rate-limited', rate_limit_every=20, rate_limit_burst=10),
+    '5xx-storm': FaultProfile(name='5xx-storm', storm_period_seconds=30.0, storm_seconds=10.0,
+                              error_rate=0.02),
+    'timeouts': FaultProfile(name='timeouts', timeout_rate=0.2),
+    'slow-body': FaultProfile(name='slow-body', slow_body_rate=0.3),
+    'chaos': FaultProfile(name='chaos', latency_sigma=0.9, rate_limit_every=50, rate_limit_burst=5,
+                          storm_period_seconds=60.0, storm_seconds=5.0, error_rate=0.03,
+                          timeout_rate=0.02, slow_body_rate=0.05),
+}
+
+
+@dataclass
+class RecordedRequest:
+    """Satu request yang diterima stub"""
+    seq: int
+    received_at: float
+    path: str
+    phone_number_id: Optional[str]
+    authorization: Optional[str]
+    body: Optional[Dict]
+    status: int = 0
+    outcome: str = ''
+    latency_ms: float = 0.0
+    message_id: Optional[str] = None
+    extra: Dict = field(default_factory=dict)
+
+
+class GraphApiStubServer:
+    """HTTP server Graph API palsu, bisa dijalankan di thread background"""
+
+    def __init__(self, profile='healthy', host: str = '127.0.0.1', port: int = 0, seed: Optional[int] = None):
+        self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+        self.requests: List[RecordedRequest] = []
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._seq = 0
+        self._started_at = time.monotonic()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- lifecycle ----------
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def messages_url(self, phone_number_id: str = '123456789', version: str = 'v21.0') -> str:
+        return f'{self.base_url}/{version}/{phone_number_id}/messages'
+
+    def start(self) -> 'GraphApiStubServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='graph-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- asersi ----------
+
+    def set_profile(self, profile):
+        with self._lock:
+            self.profile = PROFILES[profile] if isinstance(profile, str) else profile
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+            self._seq = 0
+            self._started_at = time.monotonic()
+
+    def sent_to(self, to: str) -> List[RecordedRequest]:
+        """Request yang ditujukan ke nomor tertentu"""
+        with self._lock:
+            return [r for r in self.requests if r.body and r.body.get('to') == to]
+
+    def count(self, outcome: Optional[str] = None) -> int:
+        with self._lock:
+            if outcome is None:
+                return len(self.requests)
+            return sum(1 for r in self.requests if r.outcome == outcome)
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            result: Dict[str, int] = {}
+            for r in self.requests:
+                result[r.outcome] = result.get(r.outcome, 0) + 1
+            return result
+
+    # ---------- perilaku ----------
+
+    def _sample_latency(self, profile: FaultProfile) -> float:
+        rnd = self._random
+        if profile.latency == 'fixed':
+            ms = profile.latency_ms
+        elif profile.latency == 'uniform':
+            ms = rnd.uniform(profile.latency_ms, profile.latency_max_ms)
+        else:
+            ms = profile.latency_ms * rnd.lognormvariate(0.0, profile.latency_sigma)
+        return max(ms, 0.0) / 1000.0
+
+    def _decide(self, seq: int, profile: FaultProfile) -> str:
+        """Tentukan outcome: ok | rate_limited | server_error | timeout | slow_body"""
+        if profile.rate_limit_every and profile.rate_limit_burst:
+            position = (seq - 1) % (profile.rate_limit_every + profile.rate_limit_burst)
+            if position >= profile.rate_limit_every:
+                return 'rate_limited'
+
+        if profile.storm_period_seconds and profile.storm_seconds:
+            elapsed = time.monotonic() - self._started_at
+            if elapsed % profile.storm_period_seconds >= profile.storm_period_seconds - profile.storm_seconds:
+                return 'server_error'
+
+        roll = self._random.random()
+        if roll < profile.error_rate:
+            return 'server_error'
+        roll -= profile.error_rate
+        if roll < profile.timeout_rate:
+            return 'timeout'
+        roll -= profile.timeout_rate
+        if roll < profile.slow_body_rate:
+            return 'slow_body'
+        return 'ok'
+
+    def _new_message_id(self) -> str:
+        raw = self._random.getrandbits(8 * 24).to_bytes(24, 'big')
+        return 'wamid.' + base64.b64encode(b'HBgM' + raw).decode('ascii').rstrip('=')
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                return None
+
+            def _send_json(self, status: int, payload: Dict, slow_seconds: float = 0.0):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                if slow_seconds:
+                    chunks = [data[i:i + 16] for i in range(0, len(data), 16)]
+                    pause = slow_seconds / max(len(chunks), 1)
+                    for chunk in chunks:
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                        time.sleep(pause)
+                else:
+                    self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path.startswith('/__stub__/requests'):
+                    with stub._lock:
+                        records = [asdict(r) for r in stub.requests]
+                    self._send_json(200, {'profile': stub.profile.name, 'requests': records})
+                else:
+                    self._send_json(404, {'error': {'message': 'Unknown path', 'code': 803}})
+
+            def do_POST(self):
+                started = time.perf_counter()
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+
+                if self.path == '/__stub__/reset':
+                    stub.reset()
+                    return self._send_json(200, {'success': True})
+                if self.path == '/__stub__/profile':
+                    name = (body or {}).get('profile', 'healthy')
+                    if name not in PROFILES:
+                        return self._send_json(400, {'error': f'unknown profile {name}'})
+                    stub.set_profile(name)
+                    return self._send_json(200, {'success': True, 'profile': name})
+
+                match = MESSAGES_PATH.match(self.path)
+                with stub._lock:
+                    stub._seq += 1
+                    seq = stub._seq
+                    profile = stub.profile
+                    record = RecordedRequest(
+                        seq=seq,
+                        received_at=time.time(),
+                        path=self.path,
+                        phone_number_id=match.group('phone_number_id') if match else None,
+                        authorization=self.headers.get('Authorization'),
+                        body=body,
+                    )
+                    stub.requests.append(record)
+
+                if not match:
+                    record.status, record.outcome = 404, 'not_found'
+                    return self._send_json(404, {'error': {
+                        'message': 'Unsupported post request.', 'type': 'GraphMethodException', 'code': 100,
+                    }})
+
+                if not record.authorization or not record.authorization.startswith('Bearer '):
+                    record.status, record.outcome = 401, 'unauthorized'
+                    return self._send_json(401, {'error': {
+                        'message': 'Invalid OAuth access token.', 'type': 'OAuthException', 'code': 190,
+                    }})
+
+                outcome = stub._decide(seq, profile)
+                time.sleep(stub._sample_latency(profile))
+
+                if outcome == 'timeout':
+                    time.sleep(profile.hang_seconds)
+
+                if outcome == 'rate_limited':
+                    status, payload = 429, {'error': {
+                        'message': '(#130429) Rate limit hit',
+                        'type': 'OAuthException',
+                        'code': 130429,
+                        'error_subcode': 2494055,
+                        'fbtrace_id': f'STUB{seq:08d}',
+                    }}
+                elif outcome == 'server_error':
+                    status, payload = 500, {'error': {
+                        'message': 'An unknown error occurred',
+                        'type': 'OAuthException',
+                        'code': 1,
+                        'is_transient': True,
+                        'fbtrace_id': f'STUB{seq:08d}',
+                    }}
+                else:
+                    to = (body or {}).get('to', '')
+                    record.message_id = stub._new_message_id()
+                    status, payload = 200, {
+                        'messaging_product': 'whatsapp',
+                        'contacts': [{'input': to, 'wa_id': to}],
+                        'messages': [{'id': record.message_id}],
+                    }
+
+                record.status = status
+                record.outcome = outcome
+                record.latency_ms = round((time.perf_counter() - started) * 1000.0, 2)
+                try:
+                    self._send_json(
+                        status, payload,
+                        slow_seconds=profile.slow_body_seconds if outcome == 'slow_body' else 0.0,
+                    )
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client sudah menyerah (timeout)
+                    record.extra['client_disconnected'] = True
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stub lokal Graph API WhatsApp')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--profile', default='healthy', choices=sorted(PROFILES))
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    server = GraphApiStubServer(args.profile, host=args.host, port=args.port, seed=args.seed)
+    print(f'Graph API stub [{args.profile}] listening on {server.messages_url()}')
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        print(json.dumps(server.summary()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Generator payload webhook WhatsApp yang realistis untuk benchmark
+"""
+
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Bobot skenario: mendekati pola percakapan warga di production
+DEFAULT_MIX = {
+    'greeting': 15,
+    'kategori': 25,
+    'layanan': 25,
+    'sop': 12,
+    'back': 8,
+    'menu': 8,
+    'duplicate': 7,
+}
+
+GREETINGS = ['halo', 'Halo min', 'menu', 'hi', 'mulai', 'assalamualaikum menu', 'start']
+
+
+class PayloadGenerator:
+    """Buat pesan webhook sintetis dari katalog kategori/layanan"""
+
+    def __init__(self, catalog: Dict[str, List[str]], users: int = 200,
+                 mix: Optional[Dict[str, int]] = None, seed: int = 42):
+        if not catalog:
+            raise ValueError('Katalog kosong, tidak ada layanan untuk benchmark')
+
+        self.catalog = catalog
+        self.kategori_keys = list(catalog.keys())
+        self.layanan_ids = [lid for ids in catalog.values() for lid in ids] or ['none']
+        self.phone_numbers = [f'62899{i:07d}' for i in range(users)]
+        self.mix = mix or DEFAULT_MIX
+        self._scenarios = list(self.mix.keys())
+        self._weights = list(self.mix.values())
+        self._random = random.Random(seed)
+        self._counter = 0
+        self._recent: List[Dict] = []
+
+    def _next_message_id(self) -> str:
+        self._counter += 1
+        return f'wamid.BENCH{self._counter:012d}'
+
+    def _interactive(self, from_number: str, reply_type: str, reply_id: str) -> Dict:
+        return {
+            'from': from_number,
+            'id': self._next_message_id(),
+            'timestamp': str(int(time.time())),
+            'type': 'interactive',
+            'interactive': {
+                'type': reply_type,
+                reply_type: {'id': reply_id, 'title': reply_id[:24]},
+            },
+        }
+
+    def _text(self, from_number: str, body: str) -> Dict:
+        return {
+            'from': from_number,
+            'id': self._next_message_id(),
+            'timestamp': str(int(time.time())),
+            'type': 'text',
+            'text': {'body': body},
+        }
+
+    def next_message(self) -> Tuple[str, Dict]:
+        """Return (skenario, message) berikutnya"""
+        rnd = self._random
+        scenario = rnd.choices(self._scenarios, weights=self._weights)[0]
+        from_number = rnd.choice(self.phone_numbers)
+
+        if scenario == 'duplicate' and self._recent:
+            # Retry dari Meta: message id yang sama dikirim ulang
+            return scenario, rnd.choice(self._recent)
+
+        if scenario in ('greeting', 'duplicate'):
+            scenario = 'greeting'
+            message = self._text(from_number, rnd.choice(GREETINGS))
+        elif scenario == 'kategori':
+            message = self._interactive(
+                from_number, 'list_reply', f'kat_{rnd.choice(self.kategori_keys)}'
+            )
+        elif scenario == 'layanan':
+            message = self._interactive(
+                from_number, 'list_reply', rnd.choice(self.layanan_ids)
+            )
+        elif scenario == 'sop':
+            message = self._interactive(
+                from_number, 'button_reply', f'btn_sop_{rnd.choice(self.layanan_ids)}'
+            )
+        elif scenario == 'back':
+            message = self._interactive(
+                from_number, 'button_reply', f'btn_back_{rnd.choice(self.kategori_keys)}'
+            )
+        else:
+            message = self._interactive(from_number, 'button_reply', 'btn_menu')
+
+        self._recent.append(message)
+        if len(self._recent) > 100:
+            self._recent.pop(0)
+        return scenario, message
+
+    def next_batch(self, size: int = 1) -> Tuple[List[str], Dict]:
+        """Return (daftar skenario, body webhook) berisi `size` pesan"""
+        scenarios = []
+        messages = []
+        for _ in range(size):
+            scenario, message = self.next_message()
+            scenarios.append(scenario)
+            messages.append(message)
+        return scenarios, build_webhook_body(messages)
+
+
+def build_webhook_body(messages: List[Dict], phone_number_id: str = '123456789') -> Dict:
+    """Bungkus pesan ke format body webhook WhatsApp Business Account"""
+    return {
+        'object': 'whatsapp_business_account',
+        'entry': [{
+            'id': 'BENCH_WABA_ID',
+            'changes': [{
+                'field': 'messages',
+                'value': {
+                    'messaging_product': 'whatsapp',
+                    'metadata': {
+                        'display_phone_number': '6281234567890',
+                        'phone_number_id': phone_number_id,
+                    },
+                    'contacts': [
+                        {'profile': {'name': 'Bench User'}, 'wa_id': m['from']}
+                        for m in messages
+                    ],
+                    'messages': messages,
+                },
+            }],
+        }],
+    }
@@ -0,0 +1,330 @@
+"""
+Replay traffic webhook hasil capture (WEBHOOK_CAPTURE_DIR) atau journal
+(WEBHOOK_JOURNAL_DIR) ke webhook_handler, dengan Graph API di-stub.
+
+Contoh:
+    python -m benchmark.replay captures/ --speed 1          # pola waktu asli
+    python -m benchmark.replay captures/ --speed 5          # 5x lebih cepat
+    python -m benchmark.replay captures/ --speed max --catalog layanan.json
+    python -m benchmark.replay captures/ --baseline sebelum.json --output sesudah.json
+
+Laporan berisi throughput, latency, query DB (total, per pesan, per cabang
+handle_message); dengan --baseline ditambah selisih terhadap laporan lama.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from benchmark.graph_stub import GraphApiStubServer
+from benchmark.runner import (
+    GraphApiStub,
+    QueryCounter,
+    graph_patches,
+    latency_summary,
+    load_app,
+    request_errors,
+    temp_database_url,
+)
+
+logger = logging.getLogger(__name__)
+
+# Angka yang dibandingkan dengan --baseline: (path di laporan, lebih kecil lebih baik)
+COMPARED = (
+    (('throughput', 'messages_per_s'), False),
+    (('latency_ms', 'p50'), True),
+    (('latency_ms', 'p95'), True),
+    (('latency_ms', 'p99'), True),
+    (('db_queries_per_message',), True),
+    (('outbound_calls_per_message',), True),
+)
+
+
+@dataclass
+class ReplayConfig:
+    """Konfigurasi satu run replay"""
+    source: str
+    speed: float = 1.0                   # 0 = secepat mungkin
+    concurrency: int = 16
+    limit: Optional[int] = None          # replay N body pertama saja
+    database_url: Optional[str] = None   # default: SQLite sementara
+    catalog_path: Optional[str] = None   # import katalog (import-layanan) ke DB replay
+    keep_ids: bool = False               # pakai message id asli (dedup di DB yang sama)
+    graph_latency_ms: float = 80.0
+    graph_profile: Optional[str] = None
+    graph_url: Optional[str] = None
+    honour_delays: bool = False
+    log_level: str = 'WARNING'
+
+
+# ============================================
+# Sumber trace
+# ============================================
+
+def _is_journal(path: str) -> bool:
+    return os.path.isdir(path) and bool(glob.glob(os.path.join(path, '*', '*.seg')))
+
+
+def load_trace(path: str) -> List[Tuple[float, Dict]]:
+    """
+    [(waktu terima, body)] urut waktu dari file/direktori capture NDJSON,
+    atau direktori journal webhook (di-scrub saat dibaca).
+    """
+    records = []
+    if _is_journal(path):
+        import webhook_capture
+        import webhook_journal
+
+        for received_at, payload in webhook_journal.iter_records(path):
+            try:
+                records.append((received_at, webhook_capture.capture.scrubber.body(json.loads(payload))))
+            except ValueError:
+                continue
+    else:
+        paths = sorted(glob.glob(os.path.join(path, '*.ndjson'))) if os.path.isdir(path) else [path]
+        for capture_path in paths:
+            with open(capture_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        records.append((record['t'], record['body']))
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+def _rewrite_ids(body: Dict, run_tag: str) -> Tuple[Dict, int]:
+    """Tambah suffix run ke message id (duplikat di trace tetap duplikat); return (body, jumlah pesan)"""
+    count = 0
+    for entry in body.get('entry', []):
+        for change in entry.get('changes', []):
+            for message in change.get('value', {}).get('messages', []):
+                if run_tag:
+                    message['id'] = f"{message.get('id')}.{run_tag}"
+                count += 1
+    return body, count
+
+
+def _branch_stats(before: Dict, after: Dict) -> Dict:
+    """Selisih histogram handle_message_duration_seconds per cabang"""
+    stats = {}
+    for branch, state in after.items():
+        previous = before.get(branch, {'sum': 0.0, 'count': 0})
+        count = state['count'] - previous['count']
+        if count:
+            stats[branch] = {
+                'count': count,
+                'mean_ms': round((state['sum'] - previous['sum']) / count * 1000.0, 2),
+            }
+    return stats
+
+
+# ============================================
+# Replay
+# ============================================
+
+def run_replay(config: ReplayConfig) -> Dict:
+    """Jalankan replay dan kembalikan laporan (dict siap di-JSON-kan)"""
+    # App di-load dulu: env capture/journal sudah dimatikan sebelum modulnya di-import
+    database_url = config.database_url or temp_database_url()
+    app_module, bot_module = load_app(database_url, config.log_level)
+
+    trace = load_trace(config.source)
+    if config.limit:
+        trace = trace[:config.limit]
+    if not trace:
+        raise ValueError(f'Trace kosong: {config.source}')
+
+    import metrics
+    from sqlalchemy import event
+
+    flask_app = app_module.app
+    with flask_app.app_context():
+        app_module.db.create_all()
+        if config.catalog_path:
+            from import_layanan import import_layanan_from_json
+            import_layanan_from_json(config.catalog_path)
+        if not bot_module.catalog.cache.active_kategori():
+            logger.warning("⚠️ Katalog kosong: sebagian besar pesan akan masuk cabang fallback")
+        engine = app_module.db.engine
+
+    run_tag = '' if config.keep_ids else f'r{int(time.time())}'
+    # Id pesan keluar stub juga diberi tag run: DB yang sama bisa dipakai berulang kali
+    graph = GraphApiStub(latency_ms=config.graph_latency_ms, id_prefix=f'{run_tag or int(time.time())}.')
+    stub_server = GraphApiStubServer(config.graph_profile).start() if config.graph_profile else None
+    queries = QueryCounter()
+    client = flask_app.test_client()
+
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    results_lock = threading.Lock()
+
+    def fire(body: Dict, scheduled_at: Optional[float]):
+        # Speed max: latency dari saat request mulai; selain itu dari waktu terjadwal
+        started_at = scheduled_at if scheduled_at is not None else time.perf_counter()
+        response = client.post('/webhook', json=body)
+        elapsed = time.perf_counter() - started_at
+        with results_lock:
+            latencies.append(elapsed)
+            key = str(response.status_code)
+            status_codes[key] = status_codes.get(key, 0) + 1
+
+    patches = graph_patches(bot_module, graph, stub_server, config.graph_url, config.honour_delays)
+    messages_sent = 0
+    futures: List[Future] = []
+    first_at = trace[0][0]
+    branches_before = metrics.HANDLE_MESSAGE_DURATION.snapshot()
+
+    for p in patches:
+        p.start()
+    event.listen(engine, 'before_cursor_execute', queries)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=config.concurrency) as pool:
+            for received_at, body in trace:
+                scheduled_at = None
+                if config.speed > 0:
+                    scheduled_at = started + (received_at - first_at) / config.speed
+                    delay = scheduled_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                body, count = _rewrite_ids(body, run_tag)
+                messages_sent += count
+                futures.append(pool.submit(fire, body, scheduled_at))
+        elapsed_total = time.perf_counter() - started
+    finally:
+        event.remove(engine, 'before_cursor_execute', queries)
+        for p in reversed(patches):
+            p.stop()
+        if stub_server:
+            stub_server.stop()
+
+    outbound_calls = stub_server.count() if stub_server else graph.calls
+    latencies_ms = [v * 1000.0 for v in latencies]
+    config_dict = asdict(config)
+    config_dict['database_url'] = database_url.split('@')[-1]
+
+    return {
+        'config': config_dict,
+        'requests': len(trace),
+        'messages': messages_sent,
+        'trace_span_s': round(trace[-1][0] - first_at, 3),
+        'duration_s': round(elapsed_total, 3),
+        'throughput': {
+            'requests_per_s': round(len(trace) / elapsed_total, 2),
+            'messages_per_s': round(messages_sent / elapsed_total, 2),
+        },
+        'latency_ms': latency_summary(latencies_ms),
+        'status_codes': status_codes,
+        'errors': request_errors(futures),
+        'db_queries': queries.count,
+        'db_queries_per_message': round(queries.count / max(messages_sent, 1), 2),
+        'outbound_calls_per_message': round(outbound_calls / max(messages_sent, 1), 2),
+        'handle_message': _branch_stats(branches_before, metrics.HANDLE_MESSAGE_DURATION.snapshot()),
+        'graph_outcomes': stub_server.summary() if stub_server else {'ok': graph.calls},
+    }
+
+
+def _lookup(report: Dict, path: Tuple[str, ...]):
+    for key in path:
+        report = report.get(key) if isinstance(report, dict) else None
+    return report
+
+
+def compare(report: Dict, baseline: Dict) -> Dict:
+    """Selisih laporan terhadap baseline; regressed=True jika lebih buruk"""
+    delta = {}
+    for path, lower_is_better in COMPARED:
+        current, previous = _lookup(report, path), _lookup(baseline, path)
+        if current is None or previous is None:
+            continue
+        change = current - previous
+        delta['.'.join(path)] = {
+            'baseline': previous,
+            'current': current,
+            'delta': round(change, 2),
+            'delta_pct': round(change / previous * 100.0, 1) if previous else None,
+            'regressed': change > 0 if lower_is_better else change < 0,
+        }
+    for branch, stats in report.get('handle_message', {}).items():
+        previous = baseline.get('handle_message', {}).get(branch)
+        if previous:
+            change = stats['mean_ms'] - previous['mean_ms']
+            delta[f'handle_message.{branch}.mean_ms'] = {
+                'baseline': previous['mean_ms'],
+                'current': stats['mean_ms'],
+                'delta': round(change, 2),
+                'delta_pct': round(change / previous['mean_ms'] * 100.0, 1) if previous['mean_ms'] else None,
+                'regressed': change > 0,
+            }
+    return delta
+
+
+def parse_speed(value: str) -> float:
+    """'1', '2.5', '5x' atau 'max' (= 0, secepat mungkin)"""
+    value = value.strip().lower()
+    if value in ('max', 'asap', '0'):
+        return 0.0
+    speed = float(value[:-1] if value.endswith('x') else value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError('speed harus > 0 atau "max"')
+    return speed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay capture/journal webhook WhatsApp Bot')
+    parser.add_argument('source', help='file/direktori capture NDJSON atau direktori journal webhook')
+    parser.add_argument('--speed', type=parse_speed, default=1.0, help='1 (waktu asli), N (N kali lebih cepat), atau max')
+    parser.add_argument('--concurrency', type=int, default=16, help='request paralel maksimum')
+    parser.add_argument('--limit', type=int, help='hanya replay N body pertama')
+    parser.add_argument('--database-url', help='default: SQLite sementara')
+    parser.add_argument('--catalog', help='file katalog (format import-layanan) untuk DB replay')
+    parser.add_argument('--keep-ids', action='store_true', help='jangan beri suffix run ke message id')
+    parser.add_argument('--graph-latency-ms', type=float, default=80.0, help='latency Graph API stub')
+    parser.add_argument('--graph-profile', help='jalankan Graph API stub HTTP dengan profil ini (healthy, chaos, ...)')
+    parser.add_argument('--graph-url', help='URL messages Graph API/stub yang sudah berjalan')
+    parser.add_argument('--honour-delays', action='store_true', help='jalankan jeda time.sleep() antar pesan')
+    parser.add_argument('--baseline', help='laporan replay sebelumnya untuk dibandingkan')
+    parser.add_argument('--log-level', default='WARNING')
+    parser.add_argument('--output', help='tulis laporan JSON ke file')
+    args = parser.parse_args(argv)
+
+    config = ReplayConfig(
+        source=args.source,
+        speed=args.speed,
+        concurrency=args.concurrency,
+        limit=args.limit,
+        database_url=args.database_url,
+        catalog_path=args.catalog,
+        keep_ids=args.keep_ids,
+        graph_latency_ms=args.graph_latency_ms,
+        graph_profile=args.graph_profile,
+        graph_url=args.graph_url,
+        honour_delays=args.honour_delays,
+        log_level=args.log_level,
+    )
+    report = run_replay(config)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report['delta'] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    regressed = [name for name, item in report.get('delta', {}).items() if item['regressed']]
+    if regressed:
+        print(f"⚠️ Lebih buruk dari baseline: {', '.join(regressed)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Runner benchmark end-to-end: kirim payload webhook ke Flask app dengan
+rate tertentu, Graph API di-stub, lalu laporkan hasilnya sebagai JSON.
+"""
+
+import importlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+from unittest import mock
+
+from benchmark.graph_stub import GraphApiStubServer
+from benchmark.payloads import PayloadGenerator
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BenchmarkConfig:
+    """Konfigurasi satu run benchmark"""
+    rate: float = 20.0                 # request webhook per detik
+    duration: float = 10.0             # detik
+    batch_size: int = 1                # pesan per POST webhook
+    concurrency: int = 16              # request webhook paralel maksimum
+    users: int = 200
+    database_url: Optional[str] = None  # default: SQLite sementara
+    seed_catalog: bool = True
+    kategori_count: int = 6
+    layanan_per_kategori: int = 8
+    graph_latency_ms: float = 80.0
+    graph_profile: Optional[str] = None  # jalankan graph_stub HTTP dengan profil ini
+    graph_url: Optional[str] = None      # atau pakai stub/endpoint yang sudah jalan
+    honour_delays: bool = False        # jalankan time.sleep() di handle_message
+    seed: int = 42
+    log_level: str = 'WARNING'
+    mix: Dict[str, int] = field(default_factory=dict)
+
+
+class GraphApiStub:
+    """Pengganti `requests` untuk app: Graph API palsu di dalam proses"""
+
+    def __init__(self, latency_ms: float = 0.0, id_prefix: str = ''):
+        self.latency = latency_ms / 1000.0
+        self.id_prefix = id_prefix
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, headers=None, json=None, timeout=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call_no = self.calls
+        if self.latency:
+            time.sleep(self.latency)
+        return _StubResponse(f'{self.id_prefix}{call_no:012d}')
+
+
+class _StubResponse:
+    status_code = 200
+
+    def __init__(self, call_id: str):
+        self._call_id = call_id
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return {
+            'messaging_product': 'whatsapp',
+            'contacts': [{'input': 'bench', 'wa_id': 'bench'}],
+            'messages': [{'id': f'wamid.STUB{self._call_id}'}],
+        }
+
+
+class _NoDelayTime:
+    """Proxy modul `time` tanpa sleep, supaya benchmark mengukur kerja app"""
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    @staticmethod
+    def sleep(seconds):
+        return None
+
+
+class QueryCounter:
+    """Hitung statement SQL yang dieksekusi engine"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.count += 1
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile dengan nearest-rank"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100.0 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def seed_catalog(kategori_count: int, layanan_per_kategori: int):
+    """Isi katalog sintetis (idempotent per kode kategori)"""
+    from models import db, Kategori, Layanan, Persyaratan, SOP
+
+    for k in range(1, kategori_count + 1):
+        kode = f'bench{k}'
+        if Kategori.query.filter_by(kode=kode).first():
+            continue
+        kategori = Kategori(kode=kode, nama=f'Kategori Bench {k}', icon='📁', urutan=k)
+        db.session.add(kategori)
+        db.session.flush()
+        for n in range(1, layanan_per_kategori + 1):
+            layanan_id = f'{kode}_{n}'
+            db.session.add(Layanan(
+                layanan_id=layanan_id,
+                kategori_id=kategori.id,
+                judul=f'Layanan Bench {k}.{n} - Penerbitan Rekomendasi dan Legalisasi Dokumen',
+                jangka_waktu='3 hari kerja',
+                biaya='Tidak dipungut biaya',
+                urutan=n,
+            ))
+            for i in range(1, 9):
+                db.session.add(Persyaratan(
+                    layanan_id=layanan_id,
+                    teks=f'Fotokopi dokumen persyaratan nomor {i} yang telah dilegalisir (rangkap 2)',
+                    urutan=i,
+                ))
+            for i in range(1, 7):
+                db.session.add(SOP(
+                    layanan_id=layanan_id,
+                    teks=f'Petugas PTSP memverifikasi berkas tahap {i} dan meneruskan ke seksi terkait',
+                    urutan=i,
+                ))
+    db.session.commit()
+
+
+def load_catalog(bot_module) -> Dict[str, List[str]]:
+    """Ambil {kode_kategori: [layanan_id, ...]} dari database"""
+    return {
+        kat.kode: [lay.layanan_id for lay in kat.layanan]
+        for kat in bot_module.catalog.cache.active_kategori()
+    }
+
+
+def temp_database_url() -> str:
+    """URL SQLite sementara untuk satu run"""
+    tmpdir = tempfile.mkdtemp(prefix='wa-bench-')
+    return f"sqlite:///{os.path.join(tmpdir, 'bench.db')}?timeout=30"
+
+
+def load_app(database_url: str, log_level: str = 'WARNING'):
+    """Import app & bot dengan env benchmark; return (modul app, modul bot)"""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('WHATSAPP_TOKEN', 'bench-token')
+    os.environ.setdefault('PHONE_NUMBER_ID', '123456789')
+    os.environ.setdefault('APP_ROLE', 'bot')
+    # Benchmark mengukur pemrosesan di request: tanpa journal & tanpa capture ulang
+    os.environ['WEBHOOK_JOURNAL_DIR'] = ''
+    os.environ['WEBHOOK_CAPTURE_DIR'] = ''
+
+    app_module = importlib.import_module('app')
+    bot_module = importlib.import_module('bot')
+    quiet_logging(log_level)
+    return app_module, bot_module
+
+
+def graph_patches(bot_module, graph: 'GraphApiStub', stub_server: Optional[GraphApiStubServer] = None,
+                  graph_url: Optional[str] = None, honour_delays: bool = False) -> List:
+    """mock.patch untuk mengarahkan Graph API ke stub (belum di-start)"""
+    if stub_server:
+        patches = [mock.patch.object(bot_module, 'WHATSAPP_API_URL', stub_server.messages_url())]
+    elif graph_url:
+        patches = [mock.patch.object(bot_module, 'WHATSAPP_API_URL', graph_url)]
+    else:
+        patches = [mock.patch.object(bot_module, 'requests', graph)]
+    if not honour_delays:
+        patches.append(mock.patch.object(bot_module, 'time', _NoDelayTime()))
+    return patches
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict:
+    return {
+        'p50': round(percentile(latencies_ms, 50), 2),
+        'p95': round(percentile(latencies_ms, 95), 2),
+        'p99': round(percentile(latencies_ms, 99), 2),
+        'max': round(max(latencies_ms), 2) if latencies_ms else 0.0,
+        'mean': round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+    }
+
+
+def request_errors(futures: List[Future]) -> Dict[str, int]:
+    """Hitung exception per tipe dari request yang sudah selesai; yang pertama di-log lengkap"""
+    errors: Dict[str, int] = {}
+    for future in futures:
+        error = future.exception()
+        if error is None:
+            continue
+        if not errors:
+            logger.error("❌ Request benchmark gagal: %r", error, exc_info=error)
+        name = type(error).__name__
+        errors[name] = errors.get(name, 0) + 1
+    return errors
+
+
+def run_benchmark(config: BenchmarkConfig) -> Dict:
+    """Jalankan benchmark dan kembalikan laporan (dict siap di-JSON-kan)"""
+    database_url = config.database_url or temp_database_url()
+    app_module, bot_module = load_app(database_url, config.log_level)
+    from sqlalchemy import event
+
+    flask_app = app_module.app
+    with flask_app.app_context():
+        app_module.db.create_all()
+        if config.seed_catalog:
+            seed_catalog(config.kategori_count, config.layanan_per_kategori)
+        catalog = load_catalog(bot_module)
+        engine = app_module.db.engine
+
+    generator = PayloadGenerator(catalog, users=config.users, mix=config.mix or None, seed=config.seed)
+    graph = GraphApiStub(latency_ms=config.graph_latency_ms)
+    stub_server = None
+    if config.graph_profile:
+        stub_server = GraphApiStubServer(config.graph_profile, seed=config.seed).start()
+    queries = QueryCounter()
+    client = flask_app.test_client()
+
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    scenario_counts: Dict[str, int] = {}
+    results_lock = threading.Lock()
+
+    def fire(body: Dict, scheduled_at: float):
+        response = client.post('/webhook', json=body)
+        # Latency dihitung dari waktu terjadwal (koreksi coordinated omission)
+        elapsed = time.perf_counter() - scheduled_at
+        with results_lock:
+            latencies.append(elapsed)
+            key = str(response.status_code)
+            status_codes[key] = status_codes.get(key, 0) + 1
+
+    patches = graph_patches(bot_module, graph, stub_server, config.graph_url, config.honour_delays)
+
+    total_requests = max(int(config.rate * config.duration), 1)
+    interval = 1.0 / config.rate if config.rate > 0 else 0.0
+    messages_sent = 0
+    futures: List[Future] = []
+
+    for p in patches:
+        p.start()
+    event.listen(engine, 'before_cursor_execute', queries)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=config.concurrency) as pool:
+            for i in range(total_requests):
+                scheduled_at = started + i * interval
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                scenarios, body = generator.next_batch(config.batch_size)
+                for scenario in scenarios:
+                    scenario_counts[scenario] = scenario_counts.get(scenario, 0) + 1
+                messages_sent += len(scenarios)
+                futures.append(pool.submit(fire, body, scheduled_at))
+        elapsed_total = time.perf_counter() - started
+    finally:
+        event.remove(engine, 'before_cursor_execute', queries)
+        for p in reversed(patches):
+            p.stop()
+        if stub_server:
+            stub_server.stop()
+
+    outbound_calls = stub_server.count() if stub_server else graph.calls
+
+    latencies_ms = [v * 1000.0 for v in latencies]
+    config_dict = asdict(config)
+    config_dict['database_url'] = database_url.split('@')[-1]
+
+    return {
+        'config': config_dict,
+        'requests': total_requests,
+        'messages': messages_sent,
+        'scenarios': scenario_counts,
+        'duration_s': round(elapsed_total, 3),
+        'throughput': {
+            'requests_per_s': round(total_requests / elapsed_total, 2),
+            'messages_per_s': round(messages_sent / elapsed_total, 2),
+        },
+        'latency_ms': latency_summary(latencies_ms),
+        'status_codes': status_codes,
+        'errors': request_errors(futures),
+        'db_queries_per_message': round(queries.count / max(messages_sent, 1), 2),
+        'outbound_calls_per_message': round(outbound_calls / max(messages_sent, 1), 2),
+        'graph_outcomes': stub_server.summary() if stub_server else {'ok': graph.calls},
+    }
+
+
+def quiet_logging(level: str = 'WARNING'):
+    """Kurangi log app supaya tidak mendominasi hasil benchmark"""
+    logging.getLogger().setLevel(getattr(logging, level.upper(), logging.WARNING))
+    for name in ('app', 'bot', 'routes.webhook', 'db_instrumentation'):
+        logging.getLogger(name).setLevel(getattr(logging, level.upper(), logging.WARNING))
@@ -0,0 +1,932 @@
+"""
+Logika bot WhatsApp: katalog, penyimpanan pesan, pengiriman ke Graph API,
+builder pesan, handle_message, dan pemrosesan batch webhook.
+Modul ini tidak meng-import komponen admin (Flask-Login, Migrate, template),
+sehingga worker dengan APP_ROLE=bot tetap ringan.
+"""
+
+import os
+import json
+import logging
+import threading
+import time
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests import exceptions as requests_exceptions
+from urllib3 import exceptions as urllib3_exceptions
+from dotenv import load_dotenv
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import (
+    db,
+    User,
+    Message,
+    UserSession,
+    get_wib_time,
+)
+import catalog
+import circuit_breaker
+import coalescing
+import db_instrumentation
+import flood_control
+import health
+import message_bodies
+import metrics
+import outbound
+import webhook_journal
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# WhatsApp Config
+WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN", "")
+PHONE_NUMBER_ID = os.getenv("PHONE_NUMBER_ID", "")
+VERIFY_TOKEN = os.getenv("VERIFY_TOKEN", "your_verify_token_123")
+# WHATSAPP_API_URL bisa diarahkan ke stub lokal (benchmark/graph_stub.py)
+WHATSAPP_API_URL = os.getenv(
+    "WHATSAPP_API_URL", f"https://graph.facebook.com/v21.0/{PHONE_NUMBER_ID}/messages"
+)
+
+# Webhook batch processing: jumlah worker untuk memproses pesan dari
+# nomor berbeda secara paralel dalam satu POST webhook
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+_batch_executor = ThreadPoolExecutor(
+    max_workers=max(WEBHOOK_WORKERS, 1), thread_name_prefix="webhook-batch"
+)
+# ============================================
+# HELPER: Load Data (cache katalog, lihat catalog.py)
+# ============================================
+
+def get_kategori_data():
+    """Get all kategori dari cache katalog"""
+    return catalog.cache.get_kategori_data()
+
+
+def find_layanan_by_id(layanan_id: str) -> Tuple[Optional[catalog.LayananRecord], Optional[str]]:
+    """Cari layanan berdasarkan ID - UPDATED: layanan_id is PRIMARY KEY"""
+    return catalog.cache.find_layanan(layanan_id)
+
+
+def is_valid_layanan_id(response_id: str) -> bool:
+    """Cek apakah response_id adalah layanan_id yang valid di katalog"""
+    return catalog.cache.has_layanan(response_id)
+
+
+# ============================================
+# Database Helper Functions
+# ============================================
+
+# Error DB/koneksi yang membuat pesan belum tersimpan; consumer journal
+# mengulang batch-nya (dedup message_id membuat retry aman)
+DB_ERRORS = (SQLAlchemyError, ConnectionError)
+_raise_db_errors: contextvars.ContextVar[bool] = contextvars.ContextVar("raise_db_errors", default=False)
+
+
+def _reraise_db_error(error: Exception):
+    """Teruskan error DB jika pemanggil (consumer journal) akan mengulang pesan ini"""
+    if _raise_db_errors.get() and isinstance(error, DB_ERRORS):
+        raise error
+
+
+def get_or_create_user(phone_number: str) -> User:
+    """Get atau create user di database"""
+    user = User.query.filter_by(phone_number=phone_number).first()
+    if not user:
+        user = User(phone_number=phone_number)
+        db.session.add(user)
+        db.session.commit()
+        logger.info("✨ New user created: %s", phone_number)
+    user.last_interaction = get_wib_time()
+    user.total_messages += 1
+    db.session.commit()
+    return user
+
+
+def save_message(
+    user: User,
+    message_id: str,
+    direction: str,
+    message_type: str,
+    content: str = None,
+    layanan_id: str = None,
+    status: str = "sent",
+):
+    """Save message ke database"""
+    try:
+        content, body_hash = message_bodies.resolve(content, direction)
+        msg = Message(
+            message_id=message_id,
+            user_id=user.id,
+            direction=direction,
+            message_type=message_type,
+            content=content,
+            body_hash=body_hash,
+            layanan_id=layanan_id,
+            status=status,
+        )
+        db.session.add(msg)
+        db.session.commit()
+        message_bodies.remember(body_hash)
+        
+        # Log yang lebih jelas
+        if layanan_id:
+            logger.info("💾 Message saved: %s | Direction: %s | Layanan: %s", message_id, direction, layanan_id)
+        else:
+            logger.info("💾 Message saved: %s | Direction: %s | No layanan", message_id, direction)
+            
+    except Exception as e:
+        logger.error("❌ Error saving message: %s", e)
+        db.session.rollback()
+        _reraise_db_error(e)
+
+def update_session(user: User, category: str = None, layanan_id: str = None):
+    """Update user session"""
+    try:
+        session_obj = UserSession.query.filter_by(user_id=user.id).first()
+        if not session_obj:
+            session_obj = UserSession(user_id=user.id)
+            db.session.add(session_obj)
+        if category:
+            session_obj.current_category = category
+        if layanan_id:
+            session_obj.current_layanan = layanan_id
+            session_obj.last_interaction = layanan_id
+        session_obj.updated_at = get_wib_time()
+        db.session.commit()
+    except Exception as e:
+        logger.error("❌ Error updating session: %s", e)
+        db.session.rollback()
+        _reraise_db_error(e)
+
+
+def _post_message(data: Dict) -> Dict:
+    """
+    POST ke Graph API (dijalankan di worker lane outbound, tanpa akses DB)
+    Lewat circuit breaker: saat Graph API down langsung CircuitOpenError
+    """
+    breaker = circuit_breaker.breaker
+    if not breaker.allow():
+        raise circuit_breaker.CircuitOpenError("Graph API circuit open")
+
+    headers = {
+        "Authorization": f"Bearer {WHATSAPP_TOKEN}",
+        "Content-Type": "application/json",
+    }
+    started = time.perf_counter()
+    try:
+        response = requests.post(
+            WHATSAPP_API_URL, headers=headers, json=data, timeout=10
+        )
+    except requests_exceptions.Timeout:
+        metrics.GRAPH_API_RESPONSES.labels(status="timeout").inc()
+        breaker.record_failure()
+        raise
+    except requests_exceptions.RequestException:
+        metrics.GRAPH_API_RESPONSES.labels(status="error").inc()
+        breaker.record_failure()
+        raise
+    except BaseException:
+        breaker.record_failure()
+        raise
+    finally:
+        metrics.GRAPH_API_LATENCY.observe(time.perf_counter() - started)
+    metrics.GRAPH_API_RESPONSES.labels(status=response.status_code).inc()
+    # 4xx = API hidup (mis. nomor tidak valid); hanya 5xx/429 dihitung gagal
+    if response.status_code >= 500 or response.status_code == 429:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    response.raise_for_status()
+    return response.json()
+
+
+def _should_spool(error: Exception) -> bool:
+    """Payload pasti belum terkirim dan layak dikirim ulang nanti"""
+    if isinstance(error, (circuit_breaker.CircuitOpenError, requests_exceptions.ConnectionError)):
+        # ConnectTimeout termasuk ConnectionError; ReadTimeout tidak (mungkin sudah terkirim)
+        return True
+    if isinstance(error, requests_exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return False
+
+
+def _never_connected(error: requests_exceptions.ConnectionError) -> bool:
+    """Koneksi gagal dibuka (timeout/ditolak/DNS): request pasti belum sampai ke Meta"""
+    if isinstance(error, requests_exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3_exceptions.NewConnectionError)
+
+
+def _spool(to: str, payload: Dict, layanan_id: str, lane: str, error: Exception):
+    circuit_breaker.spool.append({"to": to, "payload": payload, "layanan_id": layanan_id, "lane": lane})
+    logger.warning("📥 Pesan ke %s masuk spool (%s)", to, error)
+    _spool_replayer.ensure_started()
+
+
+def send_whatsapp_message(
+    to: str, payload: Dict, layanan_id: str = None, lane: str = outbound.INTERACTIVE
+) -> Optional[Dict]:
+    """
+    Kirim pesan WhatsApp dan save ke database
+    FIXED: Hanya save 1x dengan layanan_id jika diberikan
+    HTTP lewat lane outbound (lihat outbound.py); save DB di thread pemanggil
+    """
+    try:
+        if not WHATSAPP_TOKEN or not PHONE_NUMBER_ID:
+            logger.error("❌ Token atau Phone ID tidak diset!")
+            return None
+
+        data = {"messaging_product": "whatsapp", "to": to, **payload}
+        try:
+            result = outbound.scheduler.run(lane, _post_message, data)
+        except Exception as e:
+            if not _should_spool(e):
+                raise
+            _spool(to, payload, layanan_id, lane, e)
+            return None
+        _save_outgoing(to, payload, result, layanan_id)
+        
+        logger.info("✅ Message sent to %s | Type: %s | Layanan: %s", to, payload.get('type'), layanan_id or 'None')
+        return result
+
+    except Exception as e:
+        logger.error("❌ Error sending: %s", e)
+        return None
+
+
+def _save_outgoing(to: str, payload: Dict, result: Dict, layanan_id: str = None):
+    """Simpan pesan outgoing yang sudah terkirim"""
+    user = get_or_create_user(to)
+    message_id = result.get("messages", [{}])[0].get("id", "unknown")
+
+    # Extract content
+    content = None
+    if payload.get("type") == "text":
+        content = payload.get("text", {}).get("body")
+    elif payload.get("type") == "interactive":
+        interactive = payload.get("interactive", {})
+        content = interactive.get("body", {}).get("text")
+
+    # PENTING: Hanya save 1x di sini
+    save_message(
+        user, 
+        message_id, 
+        "outgoing", 
+        payload.get("type"), 
+        content,
+        layanan_id=layanan_id  # Parameter opsional
+    )
+
+def broadcast_message(numbers, payload: Dict) -> Dict[str, int]:
+    """
+    Kirim payload yang sama ke banyak nomor lewat lane broadcast.
+    Semua request di-antrikan sekaligus (concurrency dibatasi lane);
+    penyimpanan ke DB dilakukan di thread ini setiap kali satu selesai.
+    """
+    stats = {"sent": 0, "spooled": 0, "failed": 0}
+    if not WHATSAPP_TOKEN or not PHONE_NUMBER_ID:
+        logger.error("❌ Token atau Phone ID tidak diset!")
+        stats["failed"] = len(numbers)
+        return stats
+
+    futures = [
+        (to, outbound.scheduler.submit(
+            outbound.BROADCAST, _post_message, {"messaging_product": "whatsapp", "to": to, **payload}
+        ))
+        for to in numbers
+    ]
+    for to, future in futures:
+        try:
+            _save_outgoing(to, payload, future.result())
+            stats["sent"] += 1
+        except Exception as e:
+            if _should_spool(e):
+                _spool(to, payload, None, outbound.BROADCAST, e)
+                stats["spooled"] += 1
+                continue
+            logger.error("❌ Broadcast ke %s gagal: %s", to, e)
+            stats["failed"] += 1
+    logger.info(
+        "📢 Broadcast selesai: %s terkirim, %s di-spool, %s gagal", stats["sent"], stats["spooled"], stats["failed"]
+    )
+    return stats
+
+class _SpoolReplayer:
+    """Thread per proses yang memutar ulang spool setelah Graph API pulih"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._app = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if self._app is not app:
+            # Worker hasil fork (atau app yang dibuat sebelum fork) memulai thread-nya
+            # sendiri saat request pertama, supaya sisa spool setelah restart ikut diputar
+            app.before_request(self.ensure_started)
+        self._app = app
+        self.ensure_started()
+
+    def ensure_started(self):
+        # Dibuat ulang di setiap proses worker (thread tidak ikut fork)
+        if self._app is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name="graph-spool-replay", daemon=True).start()
+            self._pid = os.getpid()
+
+    def _send(self, record: Dict):
+        """
+        Kirim satu record spool. 4xx dan read timeout (mungkin sudah terkirim)
+        dilewati; error yang pasti belum terkirim -> RetryLater; error lain
+        dihitung sebagai percobaan oleh Spool.replay. Setelah POST berhasil,
+        record selesai walaupun penyimpanan ke DB gagal.
+        """
+        data = {"messaging_product": "whatsapp", "to": record["to"], **record["payload"]}
+        try:
+            result = outbound.scheduler.run(record.get("lane") or outbound.FOLLOWUP, _post_message, data)
+        except circuit_breaker.RetryLater:
+            raise
+        except requests_exceptions.ReadTimeout as e:
+            logger.warning("⏱️ Spool ke %s timeout, status tidak diketahui (tidak diulang): %s", record["to"], e)
+            metrics.GRAPH_SPOOL_RECORDS.labels(result="unknown").inc()
+            return
+        except requests_exceptions.HTTPError as e:
+            if _should_spool(e):
+                raise circuit_breaker.RetryLater(str(e)) from e
+            logger.error("❌ Spool ke %s ditolak Graph API: %s", record["to"], e)
+            return
+        except requests_exceptions.ConnectionError as e:
+            if _never_connected(e):
+                raise circuit_breaker.RetryLater(str(e)) from e
+            raise
+        # Sudah diterima Graph API: gagal simpan ke DB tidak boleh memicu kirim ulang
+        try:
+            _save_outgoing(record["to"], record["payload"], result, record.get("layanan_id"))
+        except Exception as e:
+            db.session.rollback()
+            logger.error("❌ Spool ke %s terkirim tapi gagal disimpan: %s", record["to"], e)
+
+    def _run(self):
+        wakeup = threading.Event()
+        while True:
+            wakeup.wait(self.interval)
+            # Saat breaker open, record pertama ikut berfungsi sebagai probe half-open
+            if not circuit_breaker.spool.pending_bytes():
+                continue
+            try:
+                with self._app.app_context():
+                    try:
+                        replayed = circuit_breaker.spool.replay(self._send)
+                    finally:
+                        db.session.remove()
+                if replayed:
+                    logger.info("📤 Spool: %s pesan dikirim ulang", replayed)
+            except circuit_breaker.RetryLater:
+                pass
+            except Exception as e:
+                logger.warning("⚠️ Replay spool berhenti: %s", e)
+
+
+_spool_replayer = _SpoolReplayer(float(os.getenv("GRAPH_SPOOL_REPLAY_INTERVAL", "5")))
+
+
+def init_spool_replay(app):
+    """Mulai replay spool Graph API untuk role bot/all"""
+    _spool_replayer.init_app(app)
+
+# ============================================
+# WhatsApp Message Builders
+# ============================================
+
+def get_menu_utama() -> Dict:
+    """Generate menu utama dari database MySQL"""
+    rows = []
+    for kategori in catalog.cache.active_kategori():
+        rows.append({
+            "id": f"kat_{kategori.kode}",
+            "title": f"{kategori.icon} {kategori.nama}"[:24],
+        })
+
+    return {
+        "type": "interactive",
+        "interactive": {
+            "type": "list",
+            "header": {"type": "text", "text": "Kemenag Kab. Madiun"},
+            "body": {
+                "text": "Assalamualaikum! Selamat datang di layanan informasi Kemenag Kabupaten Madiun.\n\nSilakan pilih kategori layanan:"
+            },
+            "footer": {"text": "PTSP Kemenag Kab. Madiun"},
+            "action": {
+                "button": "Pilih Kategori",
+                "sections": [{"title": "Kategori Layanan", "rows": rows}],
+            },
+        },
+    }
+
+
+def get_daftar_layanan(kategori_id: str) -> Dict:
+    """Generate daftar layanan per kategori dari database"""
+    try:
+        kategori_key = kategori_id.replace("kat_", "")
+        kategori = catalog.cache.get_kategori(kategori_key)
+
+        if not kategori:
+            logger.warning("⚠️ Kategori %s tidak ditemukan", kategori_key)
+            return get_menu_utama()
+
+        rows = []
+        for layanan in kategori.layanan[:10]:
+            judul = layanan.judul
+            rows.append({
+                "id": layanan.layanan_id,
+                "title": judul[:24],
+                "description": judul[24:72] if len(judul) > 24 else "Klik untuk detail",
+            })
+
+        if not rows:
+            rows.append({
+                "id": "none",
+                "title": "Tidak ada layanan",
+                "description": "Belum ada layanan tersedia",
+            })
+
+        return {
+            "type": "interactive",
+            "interactive": {
+                "type": "list",
+                "header": {"type": "text", "text": f"{kategori.icon} {kategori.nama}"},
+                "body": {"text": "Pilih layanan yang Anda butuhkan untuk melihat persyaratan dan prosedur:"},
+                "footer": {"text": "PTSP Kemenag Kab. Madiun"},
+                "action": {
+                    "button": "Pilih Layanan",
+                    "sections": [{"title": "Layanan Tersedia", "rows": rows}],
+                },
+            },
+        }
+    except Exception as e:
+        logger.error("❌ Error get_daftar_layanan: %s", e)
+        return get_menu_utama()
+
+
+def get_detail_layanan_split(layanan_id: str) -> Tuple[Dict, Optional[Dict]]:
+    """
+    Generate detail layanan dalam 2 pesan:
+    1. Text message dengan persyaratan lengkap (max 4096 chars)
+    2. Interactive button untuk aksi
+    
+    Returns: (message1, message2) atau (message1, None)
+    """
+    try:
+        layanan, kategori_key = find_layanan_by_id(layanan_id)
+
+        if not layanan:
+            logger.warning("⚠️ Layanan %s tidak ditemukan", layanan_id)
+            return get_menu_utama(), None
+
+        # PESAN 1: Detail lengkap (sudah di-render saat layanan disimpan, max 4096 chars)
+        detail_text = layanan.detail_text
+        
+        message1 = {
+            "type": "text",
+            "text": {"body": detail_text}
+        }
+        
+        # PESAN 2: Interactive buttons untuk aksi
+        message2 = {
+            "type": "interactive",
+            "interactive": {
+                "type": "button",
+                "body": {"text": "Silakan pilih tindakan:"},
+                "footer": {"text": "PTSP Kemenag Kab. Madiun"},
+                "action": {
+                    "buttons": [
+                        {
+                            "type": "reply",
+                            "reply": {
+                                "id": f"btn_sop_{layanan_id}",
+                                "title": "📄 Lihat SOP",
+                            },
+                        },
+                        {
+                            "type": "reply",
+                            "reply": {
+                                "id": f"btn_back_{kategori_key}",
+                                "title": "⬅️ Kembali",
+                            },
+                        },
+                        {
+                            "type": "reply",
+                            "reply": {"id": "btn_menu", "title": "🏠 Menu"},
+                        },
+                    ]
+                },
+            },
+        }
+        
+        logger.info("📄 Detail layanan built: %s chars, %s persyaratan", len(detail_text), len(layanan.persyaratan))
+        
+        return message1, message2
+        
+    except Exception as e:
+        logger.error("❌ Error get_detail_layanan_split: %s", e)
+        import traceback
+        traceback.print_exc()
+        return get_menu_utama(), None
+
+
+def get_detail_sop(layanan_id: str) -> Dict:
+    """Generate detail SOP berdasarkan ID dari database"""
+    try:
+        layanan, _ = find_layanan_by_id(layanan_id)
+
+        if not layanan:
+            return {"type": "text", "text": {"body": "SOP tidak ditemukan"}}
+
+        return {"type": "text", "text": {"body": layanan.sop_text}}
+    except Exception as e:
+        logger.error("❌ Error get_detail_sop: %s", e)
+        return {"type": "text", "text": {"body": "Error mengambil SOP"}}
+
+
+def get_button_wa_lain() -> Dict:
+    """Pesan teks untuk hubungi admin"""
+    return {
+        "type": "text",
+        "text": {
+            "body": "*Ingin langsung menghubungi admin?*\n\nKlik tautan di bawah untuk menghubungi kami melalui WhatsApp:\nhttps://wa.me/6282245552687?text=Assalamualaikum,%20saya%20butuh%20bantuan\n\nTim support kami siap membantu Anda sesuai jam pelayanan 🙏"
+        },
+    }
+# ============================================
+# HANDLE MESSAGE - Dynamic Prefix
+# ============================================
+
+def handle_message(message: Dict, from_number: str, token: Optional[int] = None):
+    """
+    Handle incoming message
+    FIXED: layanan_id hanya tersimpan pada content message (detail & SOP)
+    token: generasi pesan untuk coalescing navigasi (lihat coalescing.py)
+    """
+    started = time.perf_counter()
+    with db_instrumentation.track_queries("handle_message") as sql_stats:
+        branch = _handle_message(message, from_number, token)
+
+    metrics.HANDLE_MESSAGE_DURATION.labels(branch=branch).observe(time.perf_counter() - started)
+    metrics.DB_TIME_PER_MESSAGE.observe(sql_stats.total_time)
+    metrics.DB_QUERIES_PER_MESSAGE.observe(sql_stats.statements)
+    db_instrumentation.log_stats(sql_stats, from_number=from_number, message_id=message.get("id"), branch=branch)
+
+
+def _send_navigation(to: str, payload: Dict, token: Optional[int], branch: str, wait: bool = True) -> bool:
+    """
+    Kirim balasan navigasi kecuali sudah tergantikan tap yang lebih baru.
+    Return False jika dilewati (balasan lanjutan di layar yang sama ikut dilewati).
+    """
+    if coalescing.coalescer.superseded(to, token, wait=wait):
+        metrics.COALESCED_REPLIES.labels(branch=branch).inc()
+        logger.info("⏭️ Navigasi %s untuk %s dilewati (ada tap lebih baru)", branch, to)
+        return False
+    send_whatsapp_message(to, payload)
+    return True
+
+
+def _handle_message(message: Dict, from_number: str, token: Optional[int] = None) -> str:
+    """Isi handle_message; return nama cabang untuk metrics"""
+    branch = "other"
+    try:
+        message_type = message.get("type")
+        message_id = message.get("id")
+
+        user = get_or_create_user(from_number)
+
+        # Extract content
+        content = None
+        if message_type == "text":
+            content = message.get("text", {}).get("body")
+
+        # Save incoming message (TIDAK PERNAH ada layanan_id untuk incoming)
+        save_message(user, message_id, "incoming", message_type, content)
+
+        # Validasi type
+        valid_types = ["text", "interactive"]
+        if message_type not in valid_types:
+            logger.info("⏭️ Skipping message type: %s", message_type)
+            return "skipped"
+
+        logger.info("📨 Processing %s from %s", message_type, from_number)
+
+        # === TEXT MESSAGE ===
+        if message_type == "text":
+            branch = "text"
+            text = content.lower() if content else ""
+            logger.info("💬 Text: %s", text)
+
+            if any(word in text for word in ["halo", "hi", "menu", "mulai", "start"]):
+                # ❌ Menu utama = NAVIGASI (tanpa layanan_id)
+                if _send_navigation(from_number, get_menu_utama(), token, branch):
+                    time.sleep(1)
+                    send_whatsapp_message(from_number, get_button_wa_lain())
+                update_session(user)
+            else:
+                # ❌ Response text = NAVIGASI (tanpa layanan_id)
+                send_whatsapp_message(
+                    from_number,
+                    {"type": "text", "text": {"body": "Ketik *menu* untuk melihat layanan yang tersedia."}},
+                )
+
+        # === INTERACTIVE MESSAGE ===
+        elif message_type == "interactive":
+            interactive = message.get("interactive", {})
+            response_id = interactive.get("list_reply", {}).get("id") or \
+                         interactive.get("button_reply", {}).get("id")
+
+            if not response_id:
+                logger.warning("⚠️ No response_id found")
+                return branch
+
+            logger.info("📘 Button/List clicked: %s", response_id)
+
+            # 1️⃣ ❌ Pilih kategori = NAVIGASI (tanpa layanan_id)
+            if response_id.startswith("kat_"):
+                branch = "kat_"
+                kategori_key = response_id.replace("kat_", "")
+                _send_navigation(
+                    from_number, 
+                    get_daftar_layanan(response_id),
+                    token, branch,
+                    # TIDAK ada parameter layanan_id
+                )
+                update_session(user, category=kategori_key)
+
+            # 2️⃣ ✅ PILIH LAYANAN - Detail DENGAN layanan_id, Button TANPA
+            elif is_valid_layanan_id(response_id):
+                branch = "layanan"
+                logger.info("📋 Layanan dipilih: %s", response_id)
+                
+                msg1, msg2 = get_detail_layanan_split(response_id)
+                
+                # ✅ Pesan 1: Detail layanan = CONTENT (DENGAN layanan_id)
+                send_whatsapp_message(
+                    from_number, 
+                    msg1, 
+                    layanan_id=response_id  # ← SIMPAN DI SINI
+                )
+                
+                time.sleep(0.8)
+                
+                # ❌ Pesan 2: Button navigasi = NAVIGASI (TANPA layanan_id)
+                # Detail tetap terkirim; tombolnya dilewati jika user sudah tap lagi
+                if msg2:
+                    _send_navigation(
+                        from_number, 
+                        msg2,
+                        token, branch, wait=False,
+                        # ← TIDAK ada layanan_id
+                    )
+                
+                update_session(user, layanan_id=response_id)
+
+            # 3️⃣ ❌ Tombol SOP = NAVIGASI/INFO (TANPA layanan_id)
+            elif response_id.startswith("btn_sop_"):
+                branch = "btn_sop_"
+                layanan_id = response_id.replace("btn_sop_", "")
+                logger.info("📄 SOP diminta: %s", layanan_id)
+                
+                send_whatsapp_message(
+                    from_number, 
+                    get_detail_sop(layanan_id)
+                    # ← TIDAK ada layanan_id (NULL)
+                )
+
+            # 4️⃣ ❌ Tombol Kembali = NAVIGASI (tanpa layanan_id)
+            elif response_id.startswith("btn_back_"):
+                branch = "btn_back_"
+                kategori_key = response_id.replace("btn_back_", "")
+                _send_navigation(
+                    from_number, 
+                    get_daftar_layanan(f"kat_{kategori_key}"),
+                    token, branch,
+                    # TIDAK ada layanan_id
+                )
+
+            # 5️⃣ ❌ Tombol Menu = NAVIGASI (tanpa layanan_id)
+            elif response_id == "btn_menu":
+                branch = "btn_menu"
+                if _send_navigation(from_number, get_menu_utama(), token, branch):
+                    time.sleep(1)
+                    send_whatsapp_message(from_number, get_button_wa_lain())
+                update_session(user)
+
+            # 6️⃣ ❌ Tidak ada layanan = NAVIGASI (tanpa layanan_id)
+            elif response_id == "none":
+                send_whatsapp_message(
+                    from_number,
+                    {"type": "text", "text": {"body": "Maaf, belum ada layanan tersedia untuk kategori ini. Ketik *menu* untuk kembali."}},
+                )
+
+            # 7️⃣ ❌ Fallback = NAVIGASI (tanpa layanan_id)
+            else:
+                logger.warning("⚠️ Unknown response_id: %s", response_id)
+                send_whatsapp_message(
+                    from_number,
+                    {"type": "text", "text": {"body": "Maaf, pilihan tidak dikenali. Ketik *menu* untuk kembali ke menu utama."}},
+                )
+
+    except Exception as e:
+        logger.error("❌ Error handling message: %s", e)
+        import traceback
+        traceback.print_exc()
+        db.session.rollback()
+        _reraise_db_error(e)
+        branch = "error"
+
+    return branch
+
+# ============================================
+# Webhook Batch Processing
+# ============================================
+
+def partition_messages(body: Dict) -> "OrderedDict[str, list]":
+    """
+    Kelompokkan pesan dalam satu payload webhook berdasarkan nomor pengirim.
+    Urutan kedatangan per nomor tetap dipertahankan.
+    """
+    partitions = OrderedDict()
+    for entry in body.get("entry", []):
+        for change in entry.get("changes", []):
+            value = change.get("value", {})
+
+            if "statuses" in value:
+                logger.info("ℹ️ Status update (ignored)")
+                continue
+
+            if "messages" not in value:
+                continue
+
+            for message in value.get("messages", []):
+                partitions.setdefault(message.get("from"), []).append(message)
+    return partitions
+
+
+def process_partition(from_number: str, messages: list):
+    """Proses pesan dari satu nomor secara berurutan"""
+    accepted = []
+    seen = set()
+    for message in messages:
+        message_id = message.get("id")
+
+        # Retry Meta untuk message id yang sama tidak boleh memakan token flood control:
+        # duplikat di batch ini dicek di memori, duplikat lama lewat satu query PK
+        if message_id in seen:
+            logger.info("⏭️ Message %s duplicated in batch", message_id)
+            continue
+        seen.add(message_id)
+        existing = db.session.query(Message.id).filter_by(message_id=message_id).first()
+        if existing:
+            logger.info("⏭️ Message %s already processed", message_id)
+            continue
+
+        decision = flood_control.limiter.check(from_number)
+        if decision != flood_control.ALLOW:
+            if decision == flood_control.NOTIFY:
+                send_whatsapp_message(
+                    from_number,
+                    {"type": "text", "text": {"body": flood_control.SLOW_DOWN_TEXT}},
+                    lane=outbound.FOLLOWUP,
+                )
+            logger.debug("🚧 Message %s from %s dropped (flood)", message_id, from_number)
+            continue
+        accepted.append(message)
+
+    # Token dibagikan sebelum diproses: tap berikutnya di batch yang sama
+    # langsung menggantikan balasan navigasi tap sebelumnya
+    tokens = [coalescing.coalescer.arrive(from_number) for _ in accepted]
+    for message, token in zip(accepted, tokens):
+        logger.info("✅ New message %s from %s", message.get("id"), from_number)
+        handle_message(message, from_number, token)
+
+
+def _run_partition_in_context(flask_app, from_number: str, messages: list):
+    """Jalankan partisi di thread pool dengan app context sendiri"""
+    metrics.QUEUE_DEPTH.labels(queue="webhook_batch").dec()
+    with flask_app.app_context():
+        try:
+            process_partition(from_number, messages)
+        finally:
+            db.session.remove()
+
+
+def process_partitions(partitions: "OrderedDict[str, list]", raise_errors: bool = False):
+    """
+    Proses semua partisi: satu nomor diproses di thread request,
+    beberapa nomor diproses paralel di thread pool.
+    Latency batch = partisi paling lambat, bukan jumlah semuanya.
+    raise_errors=True: error partisi pertama diteruskan setelah semua partisi selesai.
+    """
+    if len(partitions) == 1:
+        from_number, messages = next(iter(partitions.items()))
+        process_partition(from_number, messages)
+        return
+
+    # copy_context: statistik SQL request ikut terlihat di thread pool
+    flask_app = current_app._get_current_object()
+    metrics.QUEUE_DEPTH.labels(queue="webhook_batch").inc(len(partitions))
+    futures = [
+        _batch_executor.submit(
+            contextvars.copy_context().run,
+            _run_partition_in_context, flask_app, from_number, messages,
+        )
+        for from_number, messages in partitions.items()
+    ]
+    first_error = None
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            logger.error("❌ Error processing partition: %s", e)
+            first_error = first_error or e
+    if raise_errors and first_error is not None:
+        raise first_error
+
+
+def process_journal_records(payloads: list):
+    """
+    Consumer journal webhook: gabungkan beberapa body jadi satu set partisi
+    (urutan per nomor tetap sesuai urutan journal) lalu proses sekaligus.
+    Hanya payload yang tidak bisa di-decode yang dilewati; error DB/infra
+    (termasuk di dalam handle_message) diteruskan supaya consumer tidak
+    memajukan checkpoint.
+    """
+    partitions = OrderedDict()
+    for payload in payloads:
+        try:
+            body = json.loads(payload)
+        except ValueError as e:
+            logger.error("❌ Record journal bukan JSON: %s", e)
+            continue
+        if not isinstance(body, dict) or body.get("object") != "whatsapp_business_account":
+            continue
+        for from_number, messages in partition_messages(body).items():
+            partitions.setdefault(from_number, []).extend(messages)
+    if not partitions:
+        return
+    # copy_context di process_partitions membawa flag ini ke thread pool
+    reset_token = _raise_db_errors.set(True)
+    try:
+        process_partitions(partitions, raise_errors=True)
+    finally:
+        _raise_db_errors.reset(reset_token)
+
+
+def init_webhook_journal(app):
+    """Consumer journal webhook untuk role bot/all (jika WEBHOOK_JOURNAL_DIR di-set)"""
+    webhook_journal.journal.init_app(app, process_journal_records)
+
+
+# ============================================
+# Health Probes
+# ============================================
+
+HEALTH_DB_TTL = float(os.getenv("HEALTH_DB_TTL", "10"))
+HEALTH_MAX_QUEUE_DEPTH = int(os.getenv("HEALTH_MAX_QUEUE_DEPTH", "100"))
+
+
+def _check_database():
+    """Ping DB lewat koneksi terpisah (tidak mengganggu session request)"""
+    with db.engine.connect() as conn:
+        conn.execute(db.text("SELECT 1"))
+    return True, "connected"
+
+
+def _check_catalog():
+    """Katalog sudah ada di memori worker (tanpa I/O)"""
+    if not catalog.cache.is_loaded:
+        return False, "not loaded"
+    if catalog.cache.release_id is not None:
+        return True, f"release {catalog.cache.release_id}"
+    return True, f"draft version {catalog.cache.catalog_version}"
+
+
+def _check_queue_depth():
+    """Antrian batch & journal webhook tidak menumpuk (tanpa I/O)"""
+    depth = (
+        metrics.QUEUE_DEPTH.labels(queue="webhook_batch").get()
+        + metrics.QUEUE_DEPTH.labels(queue="webhook_journal").get()
+    )
+    return depth <= HEALTH_MAX_QUEUE_DEPTH, f"{int(depth)} pending"
+
+
+readiness = health.ReadinessProbe()
+readiness.register("database", _check_database, ttl=HEALTH_DB_TTL)
+readiness.register("catalog", _check_catalog)
+readiness.register("queue", _check_queue_depth)
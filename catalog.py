@@ -0,0 +1,704 @@
+"""
+Cache katalog layanan (kategori, layanan, persyaratan, SOP) di memori worker
+
+Katalog aktif diserialisasi ke file snapshot JSON yang ringkas dan berversi.
+Worker gunicorn memuat snapshot ini saat start (hitungan milidetik), sehingga
+pesan pertama langsung dilayani tanpa query storm ke MySQL.
+
+    flask warm-catalog           # bangun ulang snapshot dari DB
+    CATALOG_SNAPSHOT_PATH=...    # lokasi file (default: instance/catalog_snapshot.json)
+    CATALOG_CHECK_INTERVAL=5     # detik antar pengecekan versi katalog
+
+Setiap perubahan Kategori/Layanan/Persyaratan/SOP menaikkan baris
+`catalog_version` di transaksi yang sama. Worker membandingkan versi itu
+(satu query kecil, paling sering tiap CATALOG_CHECK_INTERVAL detik) dan
+hanya reload katalog jika versinya berubah.
+
+Publish bertahap: edit admin masuk ke tabel katalog sebagai draft. Tombol
+"Publish" menyimpan dokumen katalog utuh sebagai CatalogRelease dan
+memindahkan pointer `catalog_version.published_release_id` dalam satu
+transaksi. Bot hanya membaca rilis aktif, sehingga tidak pernah melihat
+layanan yang setengah diedit, dan rollback cukup memindahkan pointer.
+Selama belum ada rilis, bot membaca draft langsung (perilaku lama).
+"""
+
+import gc
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import (
+    db,
+    CatalogRelease,
+    CatalogVersion,
+    Kategori,
+    Layanan,
+    LayananDocument,
+    LayananSequence,
+    Persyaratan,
+    SOP,
+    get_wib_time,
+)
+import layanan_documents
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 4
+RELEASE_KEEP = int(os.getenv('CATALOG_RELEASE_KEEP', '20'))
+
+CATALOG_MODELS = (Kategori, Layanan, Persyaratan, SOP, LayananDocument)
+_CATALOG_TABLES = frozenset(model.__table__.name for model in CATALOG_MODELS)
+_BUMPED_KEY = 'catalog_version_bumped'
+_hooks_installed = False
+_install_lock = threading.Lock()
+
+
+# ============================================
+# Versi katalog (cross-process invalidation)
+# ============================================
+
+def _bump_version(session: Session):
+    """Naikkan catalog_version sekali per transaksi, lewat koneksi transaksi tsb"""
+    if session.info.get(_BUMPED_KEY):
+        return
+    table = CatalogVersion.__table__
+    conn = session.connection()
+    result = conn.execute(
+        update(table).where(table.c.id == 1)
+        .values(version=table.c.version + 1, updated_at=get_wib_time())
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(id=1, version=1, updated_at=get_wib_time()))
+    session.info[_BUMPED_KEY] = True
+
+
+def _before_flush(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, CATALOG_MODELS) and (obj not in session.dirty or session.is_modified(obj)):
+            _bump_version(session)
+            return
+
+
+def _do_orm_execute(orm_execute_state):
+    """Bulk update/delete (query.update, delete(), insert()) tidak lewat flush"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    if any(mapper.local_table.name in _CATALOG_TABLES for mapper in orm_execute_state.all_mappers):
+        _bump_version(orm_execute_state.session)
+
+
+def _reset_bump(session, *args):
+    session.info.pop(_BUMPED_KEY, None)
+
+
+def install_version_hooks():
+    """Pasang hook session untuk menaikkan catalog_version (idempotent)"""
+    global _hooks_installed
+    with _install_lock:
+        if _hooks_installed:
+            return
+        event.listen(Session, 'before_flush', _before_flush)
+        event.listen(Session, 'do_orm_execute', _do_orm_execute)
+        event.listen(Session, 'after_commit', _reset_bump)
+        event.listen(Session, 'after_rollback', _reset_bump)
+        _hooks_installed = True
+
+
+def read_pointer() -> Tuple[int, Optional[int]]:
+    """(versi draft, id rilis aktif) dalam satu query kecil"""
+    row = db.session.execute(
+        select(CatalogVersion.version, CatalogVersion.published_release_id)
+        .where(CatalogVersion.id == 1)
+    ).first()
+    return (row.version or 0, row.published_release_id) if row else (0, None)
+
+
+def read_version() -> int:
+    """Versi draft katalog saat ini di DB (0 jika belum pernah diubah)"""
+    return read_pointer()[0]
+
+
+# ============================================
+# Sequence layanan_id per kategori
+# ============================================
+
+def _increment_sequence(kategori_id: int) -> Optional[int]:
+    """
+    Naikkan sequence secara atomic (row lock sampai commit) dan kembalikan
+    nilai baru; None jika baris sequence belum ada.
+    """
+    table = LayananSequence.__table__
+    stmt = update(table).where(table.c.kategori_id == kategori_id)
+    dialect = db.session.get_bind().dialect
+
+    if dialect.name == 'mysql':
+        # LAST_INSERT_ID(expr) -> nilai baru terbaca dari cursor, tanpa SELECT
+        result = db.session.execute(
+            stmt.values(last_value=db.func.last_insert_id(table.c.last_value + 1))
+        )
+        return result.lastrowid if result.rowcount else None
+
+    stmt = stmt.values(last_value=table.c.last_value + 1)
+    if dialect.update_returning:
+        return db.session.execute(stmt.returning(table.c.last_value)).scalar()
+
+    if not db.session.execute(stmt).rowcount:
+        return None
+    return db.session.execute(
+        select(table.c.last_value).where(table.c.kategori_id == kategori_id)
+    ).scalar()
+
+
+def _max_layanan_number(kode: str) -> int:
+    """Angka terbesar dari layanan_id '<kode>_<n>' yang sudah ada (numerik, bukan leksikal)"""
+    prefix = f'{kode}_'
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    numbers = [
+        int(layanan_id[len(prefix):])
+        for (layanan_id,) in db.session.query(Layanan.layanan_id)
+        .filter(Layanan.layanan_id.like(f'{escaped}%', escape='\\'))
+        if layanan_id[len(prefix):].isdigit()
+    ]
+    return max(numbers, default=0)
+
+
+def allocate_layanan_id(kategori: Kategori) -> str:
+    """
+    Alokasikan layanan_id berikutnya untuk kategori di transaksi saat ini.
+    Satu UPDATE atomic per alokasi; baris sequence dibuat dari angka terbesar
+    yang sudah ada saat pertama kali dipakai.
+    """
+    while True:
+        number = _increment_sequence(kategori.id)
+        if number is None:
+            start = _max_layanan_number(kategori.kode) + 1
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(
+                        insert(LayananSequence.__table__).values(kategori_id=kategori.id, last_value=start)
+                    )
+                number = start
+            except IntegrityError:
+                # Admin lain membuat baris sequence bersamaan: ulangi UPDATE
+                continue
+
+        layanan_id = f'{kategori.kode}_{number}'
+        # ID yang dibuat manual/impor dengan angka lebih besar: lompati
+        if db.session.get(Layanan, layanan_id) is None:
+            return layanan_id
+
+
+# ============================================
+# Build & serialisasi snapshot
+# ============================================
+
+def build_catalog_document() -> Dict:
+    """
+    Susun dokumen katalog dari kategori + dokumen layanan siap saji
+    (layanan_documents), tanpa query per layanan.
+    Kategori non-aktif tetap disimpan (layanannya masih bisa dibuka via ID).
+    """
+    catalog_version = read_version()
+    kategoris = Kategori.query.order_by(Kategori.urutan).all()
+    layanans = (
+        db.session.query(Layanan.layanan_id, Layanan.kategori_id)
+        .filter(Layanan.is_active.is_(True))
+        .order_by(Layanan.urutan)
+        .all()
+    )
+    documents = layanan_documents.load_documents(lay.layanan_id for lay in layanans)
+
+    layanan_by_kategori: Dict[int, List[Dict]] = {}
+    for lay in layanans:
+        layanan_by_kategori.setdefault(lay.kategori_id, []).append(documents[lay.layanan_id])
+
+    kategori_docs = [
+        {
+            'kode': kat.kode,
+            'nama': kat.nama,
+            'icon': kat.icon,
+            'is_active': bool(kat.is_active),
+            'layanan': layanan_by_kategori.get(kat.id, []),
+        }
+        for kat in kategoris
+    ]
+
+    content = json.dumps(kategori_docs, ensure_ascii=False, sort_keys=True)
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'version': hashlib.sha1(content.encode('utf-8')).hexdigest()[:16],
+        'catalog_version': catalog_version,
+        'release_id': None,
+        'built_at': get_wib_time().isoformat(),
+        'kategori': kategori_docs,
+    }
+
+
+def write_snapshot(path: str, document: Dict):
+    """Tulis snapshot secara atomic (tmp file + rename)"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> Optional[Dict]:
+    """Baca snapshot; None jika tidak ada, rusak, atau format berbeda"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            document = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning('⚠️ Snapshot katalog tidak bisa dibaca (%s): %s', path, e)
+        return None
+    if document.get('format') != SNAPSHOT_FORMAT:
+        logger.warning('⚠️ Format snapshot katalog %s tidak didukung', document.get('format'))
+        return None
+    return document
+
+
+# ============================================
+# Rilis (publish / rollback)
+# ============================================
+
+def load_release_document(release_id: int) -> Dict:
+    """Dokumen katalog dari rilis tertentu"""
+    release = db.session.get(CatalogRelease, release_id)
+    if release is None:
+        raise LookupError(f'Rilis katalog {release_id} tidak ditemukan')
+    document = json.loads(release.document)
+    document['release_id'] = release.id
+    return document
+
+
+def load_current_document() -> Dict:
+    """Dokumen yang harus dilayani bot: rilis aktif, atau draft jika belum ada rilis"""
+    _, release_id = read_pointer()
+    if release_id is not None:
+        return load_release_document(release_id)
+    return build_catalog_document()
+
+
+def _set_published(release_id: int):
+    table = CatalogVersion.__table__
+    result = db.session.execute(
+        update(table).where(table.c.id == 1)
+        .values(published_release_id=release_id, updated_at=get_wib_time())
+    )
+    if result.rowcount == 0:
+        db.session.execute(
+            insert(table).values(id=1, version=0, published_release_id=release_id, updated_at=get_wib_time())
+        )
+
+
+def _prune_releases(keep: int):
+    """Hapus rilis lama, sisakan `keep` terbaru (rilis aktif tidak pernah dihapus)"""
+    _, active_id = read_pointer()
+    old_ids = [
+        release_id for (release_id,) in
+        db.session.query(CatalogRelease.id).order_by(CatalogRelease.id.desc()).offset(keep)
+        if release_id != active_id
+    ]
+    if old_ids:
+        CatalogRelease.query.filter(CatalogRelease.id.in_(old_ids)).delete(synchronize_session=False)
+    return len(old_ids)
+
+
+def publish(note: Optional[str] = None, published_by: Optional[str] = None) -> Optional[CatalogRelease]:
+    """
+    Publish draft saat ini sebagai rilis baru dan aktifkan secara atomic.
+    Return None jika isi draft sama dengan rilis aktif.
+    """
+    document = build_catalog_document()
+    _, active_id = read_pointer()
+    if active_id is not None:
+        active = db.session.get(CatalogRelease, active_id)
+        if active is not None and active.content_hash == document['version']:
+            return None
+
+    release = CatalogRelease(
+        catalog_version=document['catalog_version'],
+        content_hash=document['version'],
+        document=json.dumps(document, ensure_ascii=False, separators=(',', ':')),
+        kategori_count=len(document['kategori']),
+        layanan_count=sum(len(kat['layanan']) for kat in document['kategori']),
+        note=note,
+        published_by=published_by,
+    )
+    db.session.add(release)
+    db.session.flush()
+    _set_published(release.id)
+    _prune_releases(max(RELEASE_KEEP, 1))
+    db.session.commit()
+
+    logger.info('🚀 Katalog dipublish: rilis %s (draft versi %s)', release.id, release.catalog_version)
+    cache.reload()
+    return release
+
+
+def activate_release(release_id: int) -> CatalogRelease:
+    """Rollback / roll-forward: pindahkan pointer ke rilis yang sudah ada"""
+    release = db.session.get(CatalogRelease, release_id)
+    if release is None:
+        raise LookupError(f'Rilis katalog {release_id} tidak ditemukan')
+    _set_published(release.id)
+    db.session.commit()
+
+    logger.info('⏪ Rilis katalog aktif diganti ke %s', release.id)
+    cache.reload()
+    return release
+
+
+# ============================================
+# In-memory cache
+# ============================================
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else value
+
+
+class LayananRecord(NamedTuple):
+    """Layanan di katalog memori (immutable, tanpa __dict__)"""
+    layanan_id: str
+    kategori_kode: str
+    judul: str
+    jangka_waktu: Optional[str]
+    biaya: Optional[str]
+    qrcode: Optional[str]
+    persyaratan: Tuple[str, ...]
+    sop: Tuple[str, ...]
+    detail_text: str
+    sop_text: str
+
+    @classmethod
+    def from_document(cls, lay: Dict, kategori_kode: str) -> 'LayananRecord':
+        # Teks yang berulang antar layanan (mis. "Fotokopi KTP") hanya disimpan sekali
+        return cls(
+            layanan_id=sys.intern(lay['layanan_id']),
+            kategori_kode=sys.intern(kategori_kode),
+            judul=_intern(lay['judul']),
+            jangka_waktu=_intern(lay['jangka_waktu']),
+            biaya=_intern(lay['biaya']),
+            qrcode=_intern(lay['qrcode']),
+            persyaratan=tuple(sys.intern(text) for text in lay['persyaratan']),
+            sop=tuple(sys.intern(text) for text in lay['sop']),
+            # Rilis lama (sebelum layanan_documents) belum punya teks ter-render
+            detail_text=lay.get('detail_text') or layanan_documents.render_detail_text(lay),
+            sop_text=lay.get('sop_text') or layanan_documents.render_sop_text(lay),
+        )
+
+    def to_dict(self) -> Dict:
+        """Bentuk dict sama dengan Layanan.to_dict()"""
+        return {
+            'id': self.layanan_id,
+            'layanan_id': self.layanan_id,
+            'judul': self.judul,
+            'Jangka Waktu Pelayanan': self.jangka_waktu,
+            'Biaya/Tarif': self.biaya,
+            'qrcode': self.qrcode,
+            'PERSYARATAN': list(self.persyaratan),
+            'SOP': list(self.sop),
+        }
+
+
+class KategoriRecord(NamedTuple):
+    """Kategori di katalog memori beserta layanan aktifnya (urut)"""
+    kode: str
+    nama: str
+    icon: Optional[str]
+    is_active: bool
+    layanan: Tuple[LayananRecord, ...]
+
+
+class _CatalogState:
+    """Index katalog yang tidak diubah setelah dibuat (di-swap utuh saat reload)"""
+
+    __slots__ = ('version', 'catalog_version', 'release_id', 'built_at', 'kategori', 'active_kategori', 'layanan')
+
+    def __init__(self, document: Dict):
+        self.version = document['version']
+        self.catalog_version = document['catalog_version']
+        self.release_id = document.get('release_id')
+        self.built_at = document.get('built_at')
+        self.kategori: Dict[str, KategoriRecord] = {}
+        self.layanan: Dict[str, LayananRecord] = {}
+        for kat in document['kategori']:
+            records = tuple(LayananRecord.from_document(lay, kat['kode']) for lay in kat['layanan'])
+            self.kategori[sys.intern(kat['kode'])] = KategoriRecord(
+                kode=sys.intern(kat['kode']),
+                nama=_intern(kat['nama']),
+                icon=_intern(kat['icon']),
+                is_active=bool(kat['is_active']),
+                layanan=records,
+            )
+            for record in records:
+                self.layanan[record.layanan_id] = record
+        self.active_kategori = tuple(kat for kat in self.kategori.values() if kat.is_active)
+
+    def matches(self, catalog_version: int, release_id: Optional[int]) -> bool:
+        """Apakah state ini masih sama dengan pointer di DB"""
+        if release_id is not None:
+            return self.release_id == release_id
+        return self.release_id is None and self.catalog_version == catalog_version
+
+
+class CatalogCache:
+    """Katalog per proses, dimuat dari snapshot file atau DB"""
+
+    def __init__(self, snapshot_path: Optional[str] = None, check_interval: float = 5.0):
+        self.snapshot_path = snapshot_path
+        self.check_interval = check_interval
+        self._state: Optional[_CatalogState] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # ---------- loading ----------
+
+    def _load_document(self, document: Dict):
+        self._state = _CatalogState(document)
+        self._checked_at = time.monotonic()
+
+    def _read_snapshot(self, pointer: Optional[Tuple[int, Optional[int]]] = None) -> Optional[Dict]:
+        """Snapshot dari file, hanya jika cocok dengan `pointer` (bila diisi)"""
+        if not self.snapshot_path:
+            return None
+        document = read_snapshot(self.snapshot_path)
+        if document and pointer is not None:
+            release_id = document.get('release_id')
+            if pointer[1] is not None:
+                fresh = release_id == pointer[1]
+            else:
+                fresh = release_id is None and document['catalog_version'] == pointer[0]
+            if not fresh:
+                return None
+        return document
+
+    def reload(self) -> Dict:
+        """Muat dokumen aktif dari DB, simpan snapshot, dan pakai di proses ini"""
+        started = time.perf_counter()
+        document = load_current_document()
+        if self.snapshot_path:
+            try:
+                write_snapshot(self.snapshot_path, document)
+            except OSError as e:
+                logger.warning('⚠️ Gagal menulis snapshot katalog: %s', e)
+        with self._lock:
+            self._load_document(document)
+        logger.info(
+            '📦 Katalog dimuat dari DB: %s (%.1f ms)',
+            _describe(document), (time.perf_counter() - started) * 1000.0,
+        )
+        return document
+
+    def warm_up(self) -> bool:
+        """Muat snapshot (cepat); jika belum ada atau basi, muat dari DB"""
+        try:
+            pointer = read_pointer()
+        except Exception as e:
+            # DB belum siap: pakai snapshot apa adanya, versi dicek lagi nanti
+            logger.warning('⚠️ Versi katalog tidak bisa dibaca: %s', e)
+            pointer = None
+        document = self._read_snapshot(pointer)
+        if document:
+            with self._lock:
+                self._load_document(document)
+            logger.info('📦 Katalog dimuat dari snapshot: %s', _describe(document))
+            return True
+        try:
+            self.reload()
+            return True
+        except Exception as e:
+            logger.warning('⚠️ Warm-up katalog gagal: %s', e)
+            return False
+
+    def _maybe_refresh(self):
+        """Bandingkan pointer katalog paling sering setiap `check_interval` detik"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # thread lain sedang cek; pakai katalog yang ada
+        try:
+            self._checked_at = now
+            try:
+                pointer = read_pointer()
+            except Exception as e:
+                logger.warning('⚠️ Cek versi katalog gagal: %s', e)
+                return
+            if self._state.matches(*pointer):
+                return
+            document = self._read_snapshot(pointer)
+            if document:
+                self._load_document(document)
+                logger.info('🔄 Katalog di-reload dari snapshot: %s', _describe(document))
+                return
+        finally:
+            self._lock.release()
+        self.reload()
+
+    def _get_state(self) -> _CatalogState:
+        if self._state is None:
+            metrics.cache_miss('catalog')
+            if not self.warm_up():
+                raise RuntimeError('Katalog tidak tersedia')
+            return self._state
+        self._maybe_refresh()
+        metrics.cache_hit('catalog')
+        return self._state
+
+    # ---------- lookup ----------
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._state is not None
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._state.version if self._state else None
+
+    @property
+    def catalog_version(self) -> Optional[int]:
+        return self._state.catalog_version if self._state else None
+
+    @property
+    def release_id(self) -> Optional[int]:
+        return self._state.release_id if self._state else None
+
+    def active_kategori(self) -> Tuple[KategoriRecord, ...]:
+        """Kategori aktif sesuai urutan menu"""
+        return self._get_state().active_kategori
+
+    def get_kategori_data(self) -> Dict:
+        """Format sama dengan get_kategori_data() lama: {kode: {nama, icon, layanan}}"""
+        return {
+            kat.kode: {
+                'nama': kat.nama,
+                'icon': kat.icon,
+                'layanan': [lay.to_dict() for lay in kat.layanan],
+            }
+            for kat in self.active_kategori()
+        }
+
+    def get_kategori(self, kode: str) -> Optional[KategoriRecord]:
+        """Kategori aktif berdasarkan kode (dengan daftar layanan aktif)"""
+        kat = self._get_state().kategori.get(kode)
+        return kat if kat and kat.is_active else None
+
+    def find_layanan(self, layanan_id: str) -> Tuple[Optional[LayananRecord], Optional[str]]:
+        record = self._get_state().layanan.get(layanan_id)
+        return (record, record.kategori_kode) if record else (None, None)
+
+    def has_layanan(self, layanan_id: str) -> bool:
+        return layanan_id in self._get_state().layanan
+
+
+# ============================================
+# Memory report
+# ============================================
+
+def _traced_bytes(build):
+    """Byte yang masih dialokasikan oleh hasil `build()` (tracemalloc)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return allocated
+
+
+def _legacy_dicts(document: Dict) -> List[Dict]:
+    """Representasi lama: dict ala Layanan.to_dict() per layanan"""
+    return [
+        {
+            'id': lay['layanan_id'],
+            'layanan_id': lay['layanan_id'],
+            'judul': lay['judul'],
+            'Jangka Waktu Pelayanan': lay['jangka_waktu'],
+            'Biaya/Tarif': lay['biaya'],
+            'qrcode': lay['qrcode'],
+            'PERSYARATAN': list(lay['persyaratan']),
+            'SOP': list(lay['sop']),
+            'detail_text': lay['detail_text'],
+            'sop_text': lay['sop_text'],
+        }
+        for kat in document['kategori'] for lay in kat['layanan']
+    ]
+
+
+def _orm_objects() -> List:
+    """Objek ORM Layanan + Persyaratan + SOP aktif di session baru (termasuk identity map)"""
+    session = Session(bind=db.engine)
+    objects = [session]
+    objects += session.query(Layanan).filter(Layanan.is_active.is_(True)).all()
+    objects += session.query(Persyaratan).filter(Persyaratan.is_active.is_(True)).all()
+    objects += session.query(SOP).filter(SOP.is_active.is_(True)).all()
+    return objects
+
+
+def memory_report() -> Dict:
+    """Bandingkan memori per layanan: objek ORM, dict to_dict(), dan record katalog"""
+    text = json.dumps(load_current_document(), ensure_ascii=False)
+    services = sum(len(kat['layanan']) for kat in json.loads(text)['kategori'])
+    if not services:
+        return {'services': 0}
+
+    try:
+        orm_bytes = _traced_bytes(_orm_objects)
+    finally:
+        db.session.remove()
+    measured = {
+        'orm_objects': orm_bytes,
+        'dicts': _traced_bytes(lambda: _legacy_dicts(json.loads(text))),
+        'records': _traced_bytes(lambda: _CatalogState(json.loads(text))),
+    }
+    return {
+        'services': services,
+        'total_bytes': measured,
+        'bytes_per_service': {name: round(value / services) for name, value in measured.items()},
+    }
+
+
+def _describe(document: Dict) -> str:
+    if document.get('release_id') is not None:
+        return f"rilis {document['release_id']}"
+    return f"draft versi {document['catalog_version']}"
+
+
+def _default_snapshot_path() -> str:
+    return os.getenv('CATALOG_SNAPSHOT_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'instance', 'catalog_snapshot.json'
+    )
+
+
+cache = CatalogCache(
+    snapshot_path=_default_snapshot_path(),
+    check_interval=float(os.getenv('CATALOG_CHECK_INTERVAL', '5')),
+)
+
+
+def init_app(app):
+    """Pasang hook versi katalog; role bot/all juga memuat katalog sebelum menerima traffic"""
+    install_version_hooks()
+    if app.config.get('APP_ROLE', 'all') in ('bot', 'all'):
+        with app.app_context():
+            cache.warm_up()
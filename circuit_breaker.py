@@ -0,0 +1,228 @@
+"""
+Circuit breaker + spool disk untuk Graph API
+
+Saat Graph API lambat/mati, setiap pengiriman menunggu timeout 10 detik dan
+worker habis. Breaker membuka setelah GRAPH_BREAKER_FAILURES kegagalan
+berturut-turut; selama terbuka pengiriman langsung gagal (CircuitOpenError)
+dan payload ditulis ke spool append-only (NDJSON). Setelah
+GRAPH_BREAKER_RESET detik satu request probe dilewatkan (half-open); jika
+berhasil breaker menutup dan spool diputar ulang sesuai urutan masuk.
+
+Spool dipakai bersama semua worker di host yang sama (flock): append
+dikunci singkat, replay hanya oleh satu proses, dan posisi replay disimpan
+di file .offset sehingga restart tidak mengirim ulang yang sudah terkirim.
+Record yang gagal dengan error yang mungkin sudah sampai ke Meta dicoba
+maksimal GRAPH_SPOOL_MAX_ATTEMPTS kali lalu dilewati (jumlah percobaan ikut
+disimpan di file .offset), supaya warga tidak menerima pesan ganda berulang.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows (development): kunci antar proses tidak tersedia
+    fcntl = None
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class RetryLater(Exception):
+    """Payload pasti belum terkirim: replay spool dicoba lagi tanpa menghitung percobaan"""
+
+
+class CircuitOpenError(RetryLater):
+    """Graph API dianggap down; request tidak dikirim"""
+
+
+class CircuitBreaker:
+    """closed -> open (setelah N gagal) -> half_open (1 probe) -> closed/open"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Boleh kirim? Saat half-open hanya satu probe sekaligus"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._transition(HALF_OPEN)
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = self.clock()
+                self._transition(OPEN)
+
+    def _transition(self, state: str):
+        logger.warning("🔌 Circuit Graph API: %s -> %s", self.state, state)
+        self.state = state
+        metrics.GRAPH_CIRCUIT_TRANSITIONS.labels(state=state).inc()
+
+
+# ============================================
+# Spool append-only
+# ============================================
+
+class Spool:
+    """File NDJSON append-only + offset replay; aman antar thread & proses (flock)"""
+
+    def __init__(self, directory: str, max_age: float = 24 * 3600, max_attempts: int = 5):
+        self.directory = directory
+        self.max_attempts = max(max_attempts, 1)
+        self.path = os.path.join(directory, 'graph_spool.ndjson')
+        self.offset_path = f'{self.path}.offset'
+        self.lock_path = f'{self.path}.replay.lock'
+        self.max_age = max_age
+        self._thread_lock = threading.Lock()
+
+    def _lock(self, f, blocking: bool = True) -> bool:
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+
+    def append(self, record: Dict):
+        """Tambah satu payload di akhir spool (fsync: spool hanya dipakai saat insiden)"""
+        record = dict(record, spooled_at=time.time())
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        os.makedirs(self.directory, exist_ok=True)
+        with self._thread_lock, open(self.path, 'a', encoding='utf-8') as f:
+            self._lock(f)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.GRAPH_SPOOL_RECORDS.labels(result='spooled').inc()
+
+    def _read_state(self) -> Tuple[int, int]:
+        """(offset record berikutnya, percobaan gagal untuk record itu)"""
+        try:
+            with open(self.offset_path, encoding='utf-8') as f:
+                parts = f.read().split()
+            return int(parts[0]) if parts else 0, int(parts[1]) if len(parts) > 1 else 0
+        except (FileNotFoundError, ValueError):
+            return 0, 0
+
+    def _read_offset(self) -> int:
+        return self._read_state()[0]
+
+    def _write_offset(self, offset: int, attempts: int = 0):
+        tmp_path = f'{self.offset_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(f'{offset} {attempts}')
+        os.replace(tmp_path, self.offset_path)
+
+    def pending_bytes(self) -> int:
+        try:
+            return max(os.path.getsize(self.path) - self._read_offset(), 0)
+        except FileNotFoundError:
+            return 0
+
+    def replay(self, send: Callable[[Dict], None]) -> int:
+        """
+        Kirim ulang record sesuai urutan dengan `send(record)`.
+        Exception dari send menghentikan replay (record itu dicoba lagi nanti);
+        selain RetryLater, setiap exception dihitung sebagai satu percobaan dan
+        record dilewati setelah max_attempts. Return jumlah record yang selesai.
+        """
+        if not self.pending_bytes():
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            # Hanya satu proses yang replay; yang lain melewati putaran ini
+            if not self._lock(lock_file, blocking=False):
+                return 0
+            done = 0
+            offset, attempts = self._read_state()
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                for raw in f:
+                    if not raw.endswith(b'\n'):
+                        break  # append yang belum selesai ditulis
+                    record = json.loads(raw)
+                    if time.time() - record.get('spooled_at', 0) > self.max_age:
+                        metrics.GRAPH_SPOOL_RECORDS.labels(result='expired').inc()
+                    else:
+                        try:
+                            send(record)
+                        except RetryLater:
+                            raise
+                        except Exception as e:
+                            attempts += 1
+                            if attempts < self.max_attempts:
+                                self._write_offset(offset, attempts)
+                                raise
+                            logger.error(
+                                "🗑️ Spool ke %s dilewati setelah %s percobaan: %s", record.get('to'), attempts, e
+                            )
+                            metrics.GRAPH_SPOOL_RECORDS.labels(result='abandoned').inc()
+                        else:
+                            metrics.GRAPH_SPOOL_RECORDS.labels(result='replayed').inc()
+                    offset += len(raw)
+                    attempts = 0
+                    self._write_offset(offset)
+                    done += 1
+            self._compact(offset)
+            return done
+
+    def _compact(self, offset: int):
+        """Semua record sudah diputar: kosongkan spool (di bawah kunci append)"""
+        with self._thread_lock, open(self.path, 'a', encoding='utf-8') as f:
+            self._lock(f)
+            if os.path.getsize(self.path) == offset:
+                f.truncate(0)
+                self._write_offset(0)
+
+
+breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('GRAPH_BREAKER_FAILURES', '5')),
+    reset_timeout=float(os.getenv('GRAPH_BREAKER_RESET', '30')),
+)
+spool = Spool(
+    os.getenv('GRAPH_SPOOL_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'spool'),
+    max_age=float(os.getenv('GRAPH_SPOOL_MAX_AGE', str(24 * 3600))),
+    max_attempts=int(os.getenv('GRAPH_SPOOL_MAX_ATTEMPTS', '5')),
+)
+# Antar worker diambil state terburuk; 0/1/2 yang dijumlah tidak bermakna
+metrics.REGISTRY.gauge(
+    'graph_circuit_state', 'State circuit breaker Graph API (0 closed, 1 half-open, 2 open; max antar worker)',
+    aggregate='max',
+).set_function(lambda: STATE_VALUES[breaker.state])
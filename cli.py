@@ -0,0 +1,362 @@
+"""
+CLI commands (flask <command>)
+"""
+
+import os
+
+import click
+from flask.cli import with_appcontext
+from werkzeug.security import generate_password_hash
+
+from models import db, AdminUser
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db():
+    """Initialize database tables"""
+    print("=" * 60)
+    print("⚠️  WARNING: This will DROP ALL TABLES and data!")
+    print("=" * 60)
+    confirm = input("Type 'yes' to confirm: ")
+
+    if confirm.lower() != "yes":
+        print("❌ Operation cancelled")
+        return
+
+    try:
+        db.drop_all()
+        db.create_all()
+        print("✅ Database tables created successfully!")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+@click.command("create-admin")
+@with_appcontext
+def create_admin():
+    """Create admin user"""
+    print("=" * 60)
+    print("👤 Creating Admin User")
+    print("=" * 60)
+
+    existing_admin = AdminUser.query.first()
+    if existing_admin:
+        print(f"⚠️  Admin user already exists: {existing_admin.username}")
+        overwrite = input("Overwrite? (yes/no): ")
+        if overwrite.lower() != "yes":
+            print("❌ Operation cancelled")
+            return
+        db.session.delete(existing_admin)
+        db.session.commit()
+
+    username = os.getenv("ADMIN_USERNAME")
+    password = os.getenv("ADMIN_PASSWORD")
+
+    if not username:
+        username = input("Enter admin username: ").strip()
+        if not username:
+            print("❌ Username cannot be empty")
+            return
+
+    if not password:
+        import getpass
+        password = getpass.getpass("Enter admin password (min 8 chars): ").strip()
+        if len(password) < 8:
+            print("❌ Password must be at least 8 characters")
+            return
+
+        password_confirm = getpass.getpass("Confirm password: ").strip()
+        if password != password_confirm:
+            print("❌ Passwords do not match")
+            return
+
+    try:
+        admin = AdminUser(
+            username=username,
+            password_hash=generate_password_hash(password),
+            is_active=True,
+        )
+        db.session.add(admin)
+        db.session.commit()
+        print(f"\n✅ Admin user created successfully!")
+        print(f"   Username: {username}")
+
+    except Exception as e:
+        print(f"❌ Error creating admin: {e}")
+        db.session.rollback()
+
+
+@click.command("import-layanan")
+@click.argument("path", required=False)
+@click.option("--format", "fmt", type=click.Choice(["json", "ndjson", "csv"]), default=None,
+              help="Default: dari ekstensi file")
+@click.option("--dry-run", is_flag=True, help="Hitung perubahan tanpa menyimpan")
+@with_appcontext
+def import_layanan(path, fmt, dry_run):
+    """Import katalog layanan dari file JSON/NDJSON/CSV (hanya menulis yang berubah)"""
+    from import_layanan import import_layanan_from_json, verify_import
+
+    report = import_layanan_from_json(path, fmt=fmt, dry_run=dry_run)
+    if not report.ok:
+        print(f"❌ Import {report.path} gagal:")
+        for error in report.errors[:50]:
+            print(f"   - {error}")
+        if len(report.errors) > 50:
+            print(f"   ... dan {len(report.errors) - 50} lainnya")
+        raise SystemExit(1)
+
+    print(f"{'🔍 Dry run' if dry_run else '✅ Import'} {report.path}")
+    print(f"   Kategori    : {report.kategori['insert']} baru, {report.kategori['update']} diubah, {report.kategori['unchanged']} sama")
+    print(f"   Layanan     : {report.layanan['insert']} baru, {report.layanan['update']} diubah, {report.layanan['unchanged']} sama, {report.not_in_file} tidak ada di file")
+    for label, counts in (("Persyaratan", report.persyaratan), ("SOP", report.sop)):
+        print(f"   {label:<12}: {counts['insert']} baru, {counts['update']} diubah, {counts['delete']} dihapus")
+    print(f"   Dokumen     : {report.documents} ditulis ulang")
+    print("   Waktu       : " + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in report.timings.items()))
+
+    if dry_run:
+        print("ℹ️  Dry run: tidak ada yang disimpan")
+    elif report.writes:
+        summary = verify_import()
+        print("📊 " + ", ".join(f"{name}: {count}" for name, count in summary.items()))
+        print("ℹ️  Data masuk sebagai draft. Publish: flask publish-catalog")
+    else:
+        print("ℹ️  Tidak ada perubahan")
+
+
+@click.command("warm-catalog")
+@with_appcontext
+def warm_catalog():
+    """Bangun ulang snapshot katalog (rilis aktif) dari database"""
+    import catalog
+    document = catalog.cache.reload()
+    layanan_count = sum(len(kat["layanan"]) for kat in document["kategori"])
+    print(f"✅ Snapshot katalog ditulis: {catalog.cache.snapshot_path}")
+    print(f"   Rilis: {document['release_id'] or '-'} | Draft versi: {document['catalog_version']} | Kategori: {len(document['kategori'])} | Layanan: {layanan_count}")
+
+
+@click.command("rebuild-layanan-docs")
+@with_appcontext
+def rebuild_layanan_docs():
+    """Bangun ulang dokumen layanan siap saji (layanan_documents)"""
+    import layanan_documents
+    result = layanan_documents.rebuild_all()
+    print(f"✅ {result['layanan']} layanan diperiksa | {result['written']} dokumen ditulis | {result['deleted']} dokumen yatim dihapus")
+
+
+@click.command("catalog-memory")
+@with_appcontext
+def catalog_memory():
+    """Laporan memori katalog per layanan (ORM vs dict vs record)"""
+    import catalog
+    report = catalog.memory_report()
+    if not report["services"]:
+        print("ℹ️  Katalog kosong")
+        return
+    print(f"📊 {report['services']} layanan")
+    for name, per_service in report["bytes_per_service"].items():
+        total = report["total_bytes"][name]
+        print(f"   {name:<12} {per_service:>8} byte/layanan   ({total / 1024:.1f} KiB total)")
+
+
+@click.command("publish-catalog")
+@click.option("--note", default=None, help="Catatan rilis")
+@with_appcontext
+def publish_catalog(note):
+    """Publish draft katalog sebagai rilis aktif untuk bot"""
+    import catalog
+    release = catalog.publish(note=note, published_by="cli")
+    if release is None:
+        print("ℹ️  Tidak ada perubahan sejak rilis aktif")
+    else:
+        print(f"✅ Rilis {release.id} aktif ({release.kategori_count} kategori, {release.layanan_count} layanan)")
+
+
+@click.command("export-messages")
+@click.option("--start", default=None, help="Tanggal awal (YYYY-MM-DD)")
+@click.option("--end", default=None, help="Tanggal akhir, inklusif (YYYY-MM-DD)")
+@click.option("--direction", type=click.Choice(["incoming", "outgoing"]), default=None)
+@click.option("--layanan", "layanan_id", default=None, help="Filter layanan_id")
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None,
+              help="Default: dari ekstensi output, atau csv")
+@click.option("-o", "--output", default="-", help="File output (.gz = gzip); '-' untuk stdout")
+@click.option("--analytics", is_flag=True, help="Export rekap harian, bukan pesan")
+@with_appcontext
+def export_messages(start, end, direction, layanan_id, fmt, output, analytics):
+    """Export pesan (streaming) ke CSV/NDJSON"""
+    import gzip
+    import sys
+    import time
+
+    import exports
+
+    try:
+        export_filter = exports.ExportFilter.from_args(
+            {"start": start, "end": end, "direction": direction, "layanan_id": layanan_id}
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    if fmt is None:
+        fmt = "ndjson" if ".ndjson" in output or ".jsonl" in output else "csv"
+    if analytics:
+        rows, columns = exports.analytics_rows(export_filter), exports.ANALYTICS_COLUMNS
+    else:
+        rows, columns = exports.message_rows(export_filter), exports.MESSAGE_COLUMNS
+
+    counted = {"rows": 0}
+
+    def counting(iterable):
+        for row in iterable:
+            counted["rows"] += 1
+            yield row
+
+    started = time.perf_counter()
+    if output == "-":
+        stream = sys.stdout
+    elif output.endswith(".gz"):
+        stream = gzip.open(output, "wt", encoding="utf-8", newline="")
+    else:
+        stream = open(output, "w", encoding="utf-8", newline="")
+    try:
+        for chunk in exports.serialize(counting(rows), columns, fmt):
+            stream.write(chunk)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    if output != "-":
+        print(f"✅ {counted['rows']} baris ditulis ke {output} ({time.perf_counter() - started:.1f} s)")
+
+
+@click.command("migrate-message-bodies")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+@with_appcontext
+def migrate_message_bodies(batch_size):
+    """Pindahkan body outgoing berulang ke tabel message_bodies"""
+    import message_bodies
+
+    for step in message_bodies.ensure_schema():
+        print(f"✅ {step}")
+    stats = message_bodies.dedupe_existing(batch_size=batch_size)
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    print(
+        f"✅ {stats['messages']} pesan -> {stats['bodies']} body baru "
+        f"({stats['bytes_before'] / 1024:.0f} KB -> {stats['bytes_after'] / 1024:.0f} KB, hemat {saved / 1024:.0f} KB)"
+    )
+    if stats["messages"] and db.engine.dialect.name == "mysql":
+        print("ℹ️  Jalankan OPTIMIZE TABLE messages agar ruang InnoDB dikembalikan")
+
+
+@click.command("broadcast")
+@click.option("-m", "--message", required=True, help="Teks pesan")
+@click.option("--to", "numbers", multiple=True, help="Nomor tujuan (boleh berulang)")
+@click.option("--file", "numbers_file", type=click.Path(exists=True, dir_okay=False), help="File berisi satu nomor per baris")
+@click.option("--active-days", type=int, default=None, help="Semua user yang berinteraksi N hari terakhir")
+@click.option("--dry-run", is_flag=True, help="Tampilkan jumlah penerima saja")
+@with_appcontext
+def broadcast(message, numbers, numbers_file, active_days, dry_run):
+    """Kirim pengumuman lewat lane broadcast (tidak menghambat balasan percakapan)"""
+    from datetime import timedelta
+
+    import bot
+    from models import User, get_wib_time
+
+    recipients = list(numbers)
+    if numbers_file:
+        with open(numbers_file, encoding="utf-8") as f:
+            recipients += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if active_days:
+        since = get_wib_time() - timedelta(days=active_days)
+        recipients += [phone for (phone,) in db.session.query(User.phone_number).filter(User.last_interaction >= since)]
+    recipients = list(dict.fromkeys(recipients))
+
+    if not recipients:
+        raise click.UsageError("Tidak ada penerima: pakai --to, --file, atau --active-days")
+    print(f"📢 {len(recipients)} penerima")
+    if dry_run:
+        return
+
+    stats = bot.broadcast_message(recipients, {"type": "text", "text": {"body": message}})
+    print(f"✅ {stats['sent']} terkirim, {stats['failed']} gagal")
+
+
+@click.group("retention")
+def retention_cli():
+    """Retensi pesan: rekap, arsip, dan hapus pesan lama"""
+
+
+@retention_cli.command("run")
+@click.option("--days", type=int, default=None, help="Simpan pesan N hari terakhir (default MESSAGE_RETENTION_DAYS)")
+@click.option("--dry-run", is_flag=True, help="Hanya tampilkan jumlah pesan per bulan")
+@with_appcontext
+def retention_run(days, dry_run):
+    """Rekap harian, arsip gzip NDJSON per bulan, lalu hapus per batch"""
+    import retention
+
+    days = days or retention.RETENTION_DAYS
+    if days < retention.MIN_RETENTION_DAYS:
+        print(f"⚠️  Minimal {retention.MIN_RETENTION_DAYS} hari, dipakai {retention.MIN_RETENTION_DAYS}")
+    report = retention.run(days=days, dry_run=dry_run)
+    print(f"📅 Cutoff: pesan sebelum {report['cutoff']}")
+    if not report["months"]:
+        print("ℹ️  Tidak ada pesan yang melewati masa retensi")
+        return
+    for month in report["months"]:
+        if dry_run:
+            print(f"   {month['month']}: {month['rows']} pesan")
+        else:
+            print(f"   {month['month']}: {month['rows']} diarsip -> {month['file']}, {month['deleted']} dihapus")
+    if dry_run:
+        print("ℹ️  Dry run: tidak ada yang ditulis atau dihapus")
+    else:
+        print(f"✅ Arsip di {retention.archive_dir()}")
+
+
+@retention_cli.command("partition-ddl")
+@click.option("--months", type=int, default=12, help="Jumlah partisi bulanan ke depan")
+def retention_partition_ddl(months):
+    """Cetak DDL partisi bulanan MySQL untuk tabel messages (tidak dijalankan)"""
+    import retention
+    print(retention.partition_ddl(months=months))
+
+
+@click.command("setup")
+@with_appcontext
+def setup():
+    """First-time setup: Create tables only"""
+    print("=" * 60)
+    print("🚀 Database Setup")
+    print("=" * 60)
+
+    try:
+        import message_bodies
+
+        db.create_all()
+        message_bodies.ensure_schema()
+        print("✅ Database tables created!")
+        print("\nNext steps:")
+        print("1. Run: flask create-admin")
+        print("2. Run: flask import-layanan layanan.json")
+        print("3. Start app: python app.py")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+def register_commands(app):
+    """Daftarkan semua CLI command ke app"""
+    for command in (
+        init_db,
+        create_admin,
+        import_layanan,
+        warm_catalog,
+        rebuild_layanan_docs,
+        catalog_memory,
+        publish_catalog,
+        export_messages,
+        broadcast,
+        migrate_message_bodies,
+        retention_cli,
+        setup,
+    ):
+        app.cli.add_command(command)
@@ -0,0 +1,72 @@
+"""
+Coalescing tap navigasi per percakapan
+
+Setiap pesan masuk dari satu nomor mendapat nomor generasi. Balasan navigasi
+(daftar layanan, kembali, menu) menunggu NAV_COALESCE_WINDOW detik; jika
+dalam waktu itu nomor yang sama sudah mengirim pesan lebih baru, balasan
+dilewati karena layar tersebut sudah ditinggalkan. Balasan konten (detail
+layanan, SOP) selalu dikirim.
+
+NAV_COALESCE_WINDOW=0 (default) mematikan fitur ini. Generasi disimpan per
+proses worker, jadi tap yang jatuh ke worker berbeda tidak saling menggantikan.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class NavigationCoalescer:
+    """Nomor generasi terakhir per pengirim (OrderedDict LRU, thread-safe)"""
+
+    def __init__(self, window: float = 0.0, max_conversations: int = 10000):
+        self.window = window
+        self.max_conversations = max_conversations
+        self._generations: 'OrderedDict[str, int]' = OrderedDict()
+        self._condition = threading.Condition()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def __len__(self) -> int:
+        return len(self._generations)
+
+    def arrive(self, sender: str) -> Optional[int]:
+        """Catat pesan baru dari `sender`; return token generasinya (None jika nonaktif)"""
+        if not self.enabled or not sender:
+            return None
+        with self._condition:
+            generation = self._generations.pop(sender, 0) + 1
+            self._generations[sender] = generation
+            while len(self._generations) > self.max_conversations:
+                self._generations.popitem(last=False)
+            # Bangunkan balasan yang sedang menunggu: mungkin sudah tergantikan
+            self._condition.notify_all()
+        return generation
+
+    def superseded(self, sender: str, token: Optional[int], wait: bool = True) -> bool:
+        """
+        True jika ada pesan lebih baru dari `sender` setelah `token`.
+        wait=True: tunggu sampai window habis (kembali lebih cepat jika tergantikan).
+        """
+        if token is None:
+            return False
+        deadline = time.monotonic() + (self.window if wait else 0)
+        with self._condition:
+            while True:
+                # Nomor yang sudah di-evict dianggap tidak tergantikan
+                if self._generations.get(sender, token) != token:
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+
+
+coalescer = NavigationCoalescer(
+    window=float(os.getenv('NAV_COALESCE_WINDOW', '0')),
+    max_conversations=int(os.getenv('NAV_COALESCE_MAX_CONVERSATIONS', '10000')),
+)
@@ -0,0 +1,200 @@
+"""
+Instrumentasi SQL per request / per handle_message
+Menghitung jumlah statement, total waktu DB, dan statement paling lambat
+lewat event engine SQLAlchemy.
+
+Contoh budget di test:
+    with assert_query_budget(12, label='pilih layanan'):
+        handle_message(message, '6281234567890')
+"""
+
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Collector aktif untuk konteks saat ini (request dan/atau handle_message)
+_active_collectors: contextvars.ContextVar[Tuple['QueryStats', ...]] = contextvars.ContextVar(
+    'sql_active_collectors', default=()
+)
+
+_START_KEY = 'sql_instrumentation_start'
+_listeners_installed = False
+_install_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Jumlah query atau waktu DB melebihi budget"""
+
+
+class QueryStats:
+    """Statistik SQL untuk satu unit kerja"""
+
+    def __init__(self, label: str = '', top_n: int = 5):
+        self.label = label
+        self.statements = 0
+        self.total_time = 0.0
+        self.top_n = top_n
+        self._slowest: List[Tuple[float, int, str]] = []
+        self._tiebreak = itertools.count()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float):
+        with self._lock:
+            self.statements += 1
+            self.total_time += duration
+            item = (duration, next(self._tiebreak), statement)
+            if len(self._slowest) < self.top_n:
+                heapq.heappush(self._slowest, item)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    @property
+    def total_time_ms(self) -> float:
+        return self.total_time * 1000.0
+
+    def slowest(self) -> List[Dict]:
+        """Statement paling lambat, urut dari yang terlama"""
+        with self._lock:
+            items = sorted(self._slowest, reverse=True)
+        return [
+            {'ms': round(duration * 1000.0, 2), 'sql': ' '.join(statement.split())[:200]}
+            for duration, _, statement in items
+        ]
+
+    def as_dict(self) -> Dict:
+        return {
+            'label': self.label,
+            'queries': self.statements,
+            'db_time_ms': round(self.total_time_ms, 2),
+            'slowest': self.slowest(),
+        }
+
+    def __repr__(self):
+        return f'<QueryStats {self.label}: {self.statements} queries, {self.total_time_ms:.1f} ms>'
+
+
+# ============================================
+# Engine event hooks
+# ============================================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not _active_collectors.get():
+        return
+    conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get(_START_KEY)
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    for stats in _active_collectors.get():
+        stats.record(statement, duration)
+
+
+def install_listeners():
+    """Pasang hook di semua Engine (idempotent)"""
+    global _listeners_installed
+    with _install_lock:
+        if _listeners_installed:
+            return
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listeners_installed = True
+
+
+# ============================================
+# Public helpers
+# ============================================
+
+def current_stats() -> Optional[QueryStats]:
+    """Collector terdalam yang sedang aktif (atau None)"""
+    active = _active_collectors.get()
+    return active[-1] if active else None
+
+
+@contextmanager
+def track_queries(label: str = ''):
+    """Catat semua query di dalam blok ini, tanpa melepas collector luar"""
+    install_listeners()
+    stats = QueryStats(label)
+    token = _active_collectors.set(_active_collectors.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active_collectors.reset(token)
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, max_time_ms: Optional[float] = None, label: str = 'budget'):
+    """Gagal (QueryBudgetExceeded) jika blok melebihi jumlah query / waktu DB"""
+    with track_queries(label) as stats:
+        yield stats
+
+    problems = []
+    if stats.statements > max_queries:
+        problems.append(f'{stats.statements} queries > budget {max_queries}')
+    if max_time_ms is not None and stats.total_time_ms > max_time_ms:
+        problems.append(f'{stats.total_time_ms:.1f} ms > budget {max_time_ms} ms')
+    if problems:
+        slowest = '\n'.join(f"  {s['ms']} ms  {s['sql']}" for s in stats.slowest())
+        raise QueryBudgetExceeded(f"[{label}] " + '; '.join(problems) + f'\nSlowest:\n{slowest}')
+
+
+def log_stats(stats: QueryStats, **fields):
+    """Tulis ringkasan SQL ke log (structured via `extra`)"""
+    logger.info(
+        '🗄️ SQL %s: %d queries, %.1f ms',
+        stats.label, stats.statements, stats.total_time_ms,
+        extra={'sql': stats.as_dict(), **fields},
+    )
+
+
+# ============================================
+# Flask integration
+# ============================================
+
+def init_app(app):
+    """
+    Aktifkan statistik SQL per request.
+    Header X-DB-Queries / X-DB-Time-Ms ditambahkan saat debug mode
+    atau jika SQL_STATS_HEADERS=True.
+    """
+    install_listeners()
+    app.config.setdefault('SQL_STATS_HEADERS', False)
+
+    @app.before_request
+    def _start_sql_stats():
+        stats = QueryStats(f'{request.method} {request.path}')
+        g._sql_stats = stats
+        g._sql_stats_token = _active_collectors.set(_active_collectors.get() + (stats,))
+
+    @app.after_request
+    def _finish_sql_stats(response):
+        stats = g.pop('_sql_stats', None)
+        if stats is None:
+            return response
+
+        if app.debug or app.config['SQL_STATS_HEADERS']:
+            response.headers['X-DB-Queries'] = str(stats.statements)
+            response.headers['X-DB-Time-Ms'] = f'{stats.total_time_ms:.2f}'
+        if stats.statements:
+            log_stats(stats, endpoint=request.endpoint, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def _reset_sql_stats(exc=None):
+        token = g.pop('_sql_stats_token', None)
+        if token is not None:
+            _active_collectors.reset(token)
@@ -0,0 +1,184 @@
+"""
+Export streaming pesan & analytics (CSV / NDJSON)
+Baris dibaca lewat server-side cursor (yield_per) dan ditulis per chunk,
+sehingga export jutaan baris berjalan dengan memori konstan dan langsung
+mulai terkirim ke browser.
+
+    flask export-messages --start 2025-01-01 --end 2025-01-31 -o jan.csv.gz
+    GET /export/messages.csv?start=2025-01-01&end=2025-01-31&direction=incoming
+"""
+
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator, Optional, Sequence
+
+from sqlalchemy import func, select
+
+from models import db, Message, MessageBody, User, Layanan
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+YIELD_PER = 1000
+CHUNK_SIZE = 64 * 1024
+
+MESSAGE_COLUMNS = (
+    'id', 'message_id', 'created_at', 'direction', 'message_type', 'status',
+    'phone_number', 'layanan_id', 'layanan_judul', 'content',
+)
+ANALYTICS_COLUMNS = ('date', 'direction', 'layanan_id', 'layanan_judul', 'messages')
+
+
+@dataclass
+class ExportFilter:
+    """Filter export; `end` inklusif (sampai akhir hari)"""
+    start: Optional[date] = None
+    end: Optional[date] = None
+    direction: Optional[str] = None
+    layanan_id: Optional[str] = None
+
+    @classmethod
+    def from_args(cls, args) -> 'ExportFilter':
+        """Dari query string / opsi CLI; ValueError jika format salah"""
+        direction = args.get('direction') or None
+        if direction not in (None, 'incoming', 'outgoing'):
+            raise ValueError(f'direction tidak dikenal: {direction}')
+        return cls(
+            start=parse_date(args.get('start')),
+            end=parse_date(args.get('end')),
+            direction=direction,
+            layanan_id=args.get('layanan_id') or args.get('layanan') or None,
+        )
+
+    def apply(self, stmt):
+        if self.start:
+            stmt = stmt.where(Message.created_at >= datetime.combine(self.start, datetime.min.time()))
+        if self.end:
+            stmt = stmt.where(Message.created_at < datetime.combine(self.end + timedelta(days=1), datetime.min.time()))
+        if self.direction:
+            stmt = stmt.where(Message.direction == self.direction)
+        if self.layanan_id:
+            stmt = stmt.where(Message.layanan_id == self.layanan_id)
+        return stmt
+
+    def filename(self, prefix: str, fmt: str) -> str:
+        parts = [prefix]
+        if self.start or self.end:
+            parts.append(f"{self.start or 'awal'}_{self.end or 'akhir'}")
+        if self.direction:
+            parts.append(self.direction)
+        if self.layanan_id:
+            parts.append(self.layanan_id)
+        return '-'.join(str(part) for part in parts) + f'.{fmt}'
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'Tanggal tidak valid: {value} (format YYYY-MM-DD)') from None
+
+
+# ============================================
+# Query
+# ============================================
+
+def message_rows(export_filter: ExportFilter) -> Iterator:
+    """Message + nomor User + judul Layanan, urut id, via server-side cursor"""
+    stmt = (
+        select(
+            Message.id,
+            Message.message_id,
+            Message.created_at,
+            Message.direction,
+            Message.message_type,
+            Message.status,
+            User.phone_number,
+            Message.layanan_id,
+            Layanan.judul.label('layanan_judul'),
+            func.coalesce(Message.content, MessageBody.content).label('content'),
+        )
+        .join(User, User.id == Message.user_id)
+        .outerjoin(Layanan, Layanan.layanan_id == Message.layanan_id)
+        .outerjoin(MessageBody, MessageBody.hash == Message.body_hash)
+        .order_by(Message.id)
+    )
+    stmt = export_filter.apply(stmt).execution_options(yield_per=YIELD_PER)
+    return iter(db.session.execute(stmt))
+
+
+def analytics_rows(export_filter: ExportFilter) -> Iterator:
+    """Jumlah pesan per hari, arah, dan layanan"""
+    day = func.date(Message.created_at).label('date')
+    stmt = (
+        select(
+            day,
+            Message.direction,
+            Message.layanan_id,
+            Layanan.judul.label('layanan_judul'),
+            func.count(Message.id).label('messages'),
+        )
+        .outerjoin(Layanan, Layanan.layanan_id == Message.layanan_id)
+        .group_by(day, Message.direction, Message.layanan_id, Layanan.judul)
+        .order_by(day, Message.direction, Message.layanan_id)
+    )
+    stmt = export_filter.apply(stmt).execution_options(yield_per=YIELD_PER)
+    return iter(db.session.execute(stmt))
+
+
+# ============================================
+# Serializer (generator, output per chunk)
+# ============================================
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def iter_csv(rows: Iterable, columns: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    # Header langsung dikirim: download mulai sebelum query selesai
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for row in rows:
+        writer.writerow([_value(value) for value in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(rows: Iterable, columns: Sequence[str]) -> Iterator[str]:
+    chunk = []
+    size = 0
+    for row in rows:
+        line = json.dumps(
+            {column: _value(value) for column, value in zip(columns, row)},
+            ensure_ascii=False, default=str,
+        ) + '\n'
+        chunk.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def serialize(rows: Iterable, columns: Sequence[str], fmt: str) -> Iterator[str]:
+    if fmt == 'csv':
+        return iter_csv(rows, columns)
+    if fmt == 'ndjson':
+        return iter_ndjson(rows, columns)
+    raise ValueError(f'Format tidak dikenal: {fmt}')
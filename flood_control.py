@@ -0,0 +1,129 @@
+"""
+Flood control per nomor pengirim (token bucket di memori)
+
+Setiap nomor punya bucket berisi FLOOD_BURST token yang terisi ulang
+FLOOD_RATE token per detik. Duplikat (retry Meta dengan message id yang
+sama) disaring dulu dan tidak memakan token; pesan baru tanpa token di-drop
+sebelum diproses maupun dikirim ke Graph API; nomor tersebut menerima satu balasan "mohon tunggu"
+per FLOOD_NOTICE_INTERVAL detik. Bucket disimpan di OrderedDict berurutan
+LRU dengan batas FLOOD_MAX_SENDERS dan dibuang setelah idle
+FLOOD_IDLE_SECONDS (bucket idle sudah penuh lagi, tidak ada yang hilang).
+
+Per proses worker: dengan N worker gunicorn, batas efektif maksimal N kali lipat.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ALLOW = 'allow'
+NOTIFY = 'notify'
+DROP = 'drop'
+
+SLOW_DOWN_TEXT = (
+    "⏳ Mohon tunggu sebentar, pesan Anda terlalu cepat.\n"
+    "Silakan coba lagi dalam beberapa detik."
+)
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'updated_at', 'notified_at', 'dropped')
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated_at = now
+        self.notified_at = None
+        self.dropped = 0
+
+
+class FloodControl:
+    """Token bucket per pengirim; thread-safe, satu lock untuk seluruh map"""
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: int = 8,
+        max_senders: int = 10000,
+        idle_seconds: float = 600.0,
+        notice_interval: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_senders = max_senders
+        self.idle_seconds = idle_seconds
+        self.notice_interval = notice_interval
+        self.clock = clock
+        self._buckets: 'OrderedDict[str, _Bucket]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.burst > 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        """Buang bucket paling lama tidak dipakai: idle, atau melebihi batas map"""
+        buckets = self._buckets
+        while buckets:
+            _, oldest = next(iter(buckets.items()))
+            if len(buckets) <= self.max_senders and now - oldest.updated_at < self.idle_seconds:
+                return
+            buckets.popitem(last=False)
+
+    def check(self, sender: str) -> str:
+        """ALLOW (proses), NOTIFY (drop + kirim balasan pelan-pelan), atau DROP"""
+        if not self.enabled or not sender:
+            return ALLOW
+
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(sender)
+            if bucket is None:
+                bucket = self._buckets[sender] = _Bucket(self.burst, now)
+                self._evict(now)
+            else:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated_at) * self.rate)
+                bucket.updated_at = now
+                self._buckets.move_to_end(sender)
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                decision = ALLOW
+            else:
+                decision = self._reject(sender, bucket, now)
+
+        metrics.FLOOD_CONTROL_MESSAGES.labels(decision=decision).inc()
+        return decision
+
+    def _reject(self, sender: str, bucket: _Bucket, now: float) -> str:
+        """Pesan tanpa token (dipanggil dengan lock dipegang)"""
+        bucket.dropped += 1
+        if bucket.notified_at is not None and now - bucket.notified_at < self.notice_interval:
+            return DROP
+        # Satu log per interval notifikasi, bukan per pesan yang di-drop
+        logger.warning("🚧 Flood dari %s: %s pesan di-drop sejak notifikasi terakhir", sender, bucket.dropped)
+        bucket.notified_at = now
+        bucket.dropped = 0
+        return NOTIFY
+
+
+limiter = FloodControl(
+    rate=float(os.getenv('FLOOD_RATE', '1.0')),
+    burst=int(os.getenv('FLOOD_BURST', '8')),
+    max_senders=int(os.getenv('FLOOD_MAX_SENDERS', '10000')),
+    idle_seconds=float(os.getenv('FLOOD_IDLE_SECONDS', '600')),
+    notice_interval=float(os.getenv('FLOOD_NOTICE_INTERVAL', '60')),
+)
+metrics.REGISTRY.gauge(
+    'flood_control_tracked_senders', 'Jumlah nomor yang punya bucket flood control'
+).set_function(lambda: len(limiter))
@@ -0,0 +1,44 @@
+"""
+Konfigurasi gunicorn (opsional): gunicorn -c gunicorn.conf.py app:app
+
+Snapshot katalog dibangun sekali sebelum worker di-fork, sehingga setiap
+worker cukup membaca file snapshot saat start (tanpa query ke DB).
+Snapshot dibangun di subprocess `flask warm-catalog`: master tidak pernah
+meng-import app, jadi tidak ada koneksi DB di pool maupun thread background
+(metrics flusher, replay spool) yang ikut ter-fork ke worker.
+"""
+
+import os
+import subprocess
+import sys
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+
+def on_starting(server):
+    """Bangun snapshot katalog di subprocess sebelum worker di-fork"""
+    import metrics
+
+    # Snapshot metrics dari run sebelumnya tidak ikut dijumlahkan
+    metrics.REGISTRY.clear_multiproc_dir()
+
+    env = dict(os.environ, APP_ROLE="bot")
+    try:
+        subprocess.run(
+            [sys.executable, "-m", "flask", "--app", "app:app", "warm-catalog"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            check=True,
+            timeout=int(os.getenv("CATALOG_WARM_TIMEOUT", "120")),
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        server.log.warning("Snapshot katalog tidak bisa dibangun: %s", e)
+
+
+def child_exit(server, worker):
+    """Worker keluar/di-recycle: snapshot metrics-nya tidak dijumlahkan lagi"""
+    import metrics
+
+    metrics.REGISTRY.mark_process_dead(worker.pid)
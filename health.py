@@ -0,0 +1,67 @@
+"""
+Liveness / readiness probe yang murah
+Hasil check yang butuh I/O di-cache dengan TTL, sehingga probe dari
+orchestrator (setiap beberapa detik per replica) hampir tidak menyentuh DB.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+CheckResult = Tuple[bool, str]
+
+
+class CachedCheck:
+    """Bungkus fungsi check; hasilnya disimpan selama `ttl` detik"""
+
+    def __init__(self, name: str, function: Callable[[], CheckResult], ttl: float = 10.0):
+        self.name = name
+        self.function = function
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result: Optional[CheckResult] = None
+        self._checked_at = 0.0
+
+    def __call__(self) -> CheckResult:
+        now = time.monotonic()
+        if self._result is not None and now - self._checked_at < self.ttl:
+            return self._result
+
+        # Hanya satu thread yang refresh; thread lain pakai hasil lama
+        if not self._lock.acquire(blocking=self._result is None):
+            return self._result
+        try:
+            if self._result is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._result
+            try:
+                result = self.function()
+            except Exception as e:
+                result = (False, f'error: {e}')
+            self._result = result
+            self._checked_at = time.monotonic()
+            return result
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+
+class ReadinessProbe:
+    """Kumpulan check readiness"""
+
+    def __init__(self):
+        self._checks: Dict[str, Callable[[], CheckResult]] = {}
+
+    def register(self, name: str, function: Callable[[], CheckResult], ttl: Optional[float] = None):
+        """Daftarkan check; jika `ttl` diisi, hasilnya di-cache"""
+        self._checks[name] = CachedCheck(name, function, ttl) if ttl else function
+
+    def run(self) -> Tuple[bool, Dict[str, Dict]]:
+        ready = True
+        results = {}
+        for name, check in self._checks.items():
+            ok, detail = check()
+            ready = ready and ok
+            results[name] = {'ok': ok, 'detail': detail}
+        return ready, results
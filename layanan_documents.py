@@ -0,0 +1,202 @@
+"""
+Dokumen layanan siap saji (tabel layanan_documents)
+
+Satu baris per layanan berisi dokumen JSON terurut (judul, jangka waktu,
+biaya, persyaratan, SOP) plus teks detail & SOP yang sudah di-render untuk
+WhatsApp. Dibangun ulang saat layanan disimpan dari admin, sehingga katalog
+bot cukup membaca satu baris per layanan.
+
+    flask rebuild-layanan-docs    # bangun ulang semua dokumen
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from models import db, Layanan, LayananDocument, Persyaratan, SOP, get_wib_time
+
+logger = logging.getLogger(__name__)
+
+MAX_TEXT_LENGTH = 4096
+DIVIDER = "━━━━━━━━━━━━━━━━━━━━"
+
+
+# ============================================
+# Render teks WhatsApp
+# ============================================
+
+def _limit(text: str, label: str, layanan_id: str) -> str:
+    """Batas text message WhatsApp: 4096 karakter"""
+    if len(text) > MAX_TEXT_LENGTH:
+        logger.warning("⚠️ %s %s dipotong: %s chars", label, layanan_id, len(text))
+        return text[:MAX_TEXT_LENGTH - 3] + "..."
+    return text
+
+
+def render_detail_text(document: Dict) -> str:
+    """Teks detail layanan (persyaratan, jangka waktu, biaya, link)"""
+    detail_text = f"*{document.get('judul') or ''}*\n\n"
+    detail_text += f"{DIVIDER}\n"
+    detail_text += "*📋 PERSYARATAN LENGKAP*\n"
+    detail_text += f"{DIVIDER}\n\n"
+
+    persyaratan = document.get('persyaratan') or []
+    if persyaratan:
+        for i, req in enumerate(persyaratan, 1):
+            detail_text += f"{i}. {req}\n\n"
+    else:
+        detail_text += "Tidak ada persyaratan khusus\n\n"
+
+    detail_text += f"{DIVIDER}\n"
+    detail_text += f"*⏱️ JANGKA WAKTU PELAYANAN*\n{document.get('jangka_waktu') or '-'}\n\n"
+    detail_text += f"*💰 BIAYA/TARIF*\n{document.get('biaya') or '-'}\n\n"
+
+    if document.get('qrcode'):
+        detail_text += f"*🔗 LINK PENDUKUNG*\n{document['qrcode']}\n\n"
+
+    detail_text += f"{DIVIDER}\n"
+    detail_text += "_Untuk melihat SOP lengkap, klik tombol di bawah_"
+    return _limit(detail_text, "Detail text", document.get('layanan_id'))
+
+
+def render_sop_text(document: Dict) -> str:
+    """Teks alur SOP layanan"""
+    body_text = "*🔄 ALUR SOP*\n"
+    body_text += f"*{document.get('judul') or ''}*\n\n"
+    body_text += f"{DIVIDER}\n\n"
+
+    sop = document.get('sop') or []
+    if sop:
+        for i, step in enumerate(sop, 1):
+            body_text += f"*Langkah {i}:*\n{step}\n\n"
+    else:
+        body_text += "SOP untuk layanan ini sedang dalam proses penyusunan.\n\n"
+
+    body_text += f"{DIVIDER}\n"
+    body_text += f"*⏱️ Total Waktu:* {document.get('jangka_waktu') or '-'}\n"
+    body_text += f"*💰 Biaya:* {document.get('biaya') or '-'}\n"
+    body_text += DIVIDER
+    return _limit(body_text, "SOP text", document.get('layanan_id'))
+
+
+# ============================================
+# Build & simpan dokumen
+# ============================================
+
+def _texts_by_layanan(model, layanan_ids: Optional[List[str]]) -> Dict[str, List[str]]:
+    query = (
+        db.session.query(model.layanan_id, model.teks)
+        .filter(model.is_active.is_(True))
+        .order_by(model.layanan_id, model.urutan, model.id)
+    )
+    if layanan_ids is not None:
+        query = query.filter(model.layanan_id.in_(layanan_ids))
+    result: Dict[str, List[str]] = {}
+    for row in query:
+        result.setdefault(row.layanan_id, []).append(row.teks)
+    return result
+
+
+def build_documents(layanan_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+    """
+    Dokumen untuk layanan tertentu (atau semua) dengan 3 query, bukan N+1.
+    Return {layanan_id: document}; dokumen sudah termasuk teks ter-render.
+    """
+    layanan_ids = list(layanan_ids) if layanan_ids is not None else None
+    query = Layanan.query
+    if layanan_ids is not None:
+        if not layanan_ids:
+            return {}
+        query = query.filter(Layanan.layanan_id.in_(layanan_ids))
+
+    persyaratan = _texts_by_layanan(Persyaratan, layanan_ids)
+    sop = _texts_by_layanan(SOP, layanan_ids)
+
+    documents = {}
+    for lay in query:
+        document = {
+            'layanan_id': lay.layanan_id,
+            'judul': lay.judul,
+            'jangka_waktu': lay.jangka_waktu,
+            'biaya': lay.biaya,
+            'qrcode': lay.qrcode,
+            'persyaratan': persyaratan.get(lay.layanan_id, []),
+            'sop': sop.get(lay.layanan_id, []),
+        }
+        document['detail_text'] = render_detail_text(document)
+        document['sop_text'] = render_sop_text(document)
+        documents[lay.layanan_id] = document
+    return documents
+
+
+def _row_values(document: Dict) -> Dict:
+    content = json.dumps(document, ensure_ascii=False, separators=(',', ':'))
+    return {
+        'layanan_id': document['layanan_id'],
+        'document': content,
+        'detail_text': document['detail_text'],
+        'sop_text': document['sop_text'],
+        'content_hash': hashlib.sha1(content.encode('utf-8')).hexdigest(),
+        'updated_at': get_wib_time(),
+    }
+
+
+def save_documents(documents: Dict[str, Dict]) -> int:
+    """Upsert dokumen di transaksi saat ini; hanya baris yang isinya berubah. Return jumlah write."""
+    if not documents:
+        return 0
+    existing = dict(
+        db.session.query(LayananDocument.layanan_id, LayananDocument.content_hash)
+        .filter(LayananDocument.layanan_id.in_(list(documents)))
+    )
+    inserts, updates = [], []
+    for layanan_id, document in documents.items():
+        values = _row_values(document)
+        if layanan_id not in existing:
+            inserts.append(values)
+        elif existing[layanan_id] != values['content_hash']:
+            updates.append(values)
+
+    if inserts:
+        db.session.execute(db.insert(LayananDocument), inserts)
+    if updates:
+        db.session.execute(db.update(LayananDocument), updates)
+    return len(inserts) + len(updates)
+
+
+def rebuild(layanan_id: str) -> Optional[Dict]:
+    """Bangun ulang dokumen satu layanan (dipanggil sebelum commit di routes admin)"""
+    db.session.flush()
+    document = build_documents([layanan_id]).get(layanan_id)
+    if document:
+        save_documents({layanan_id: document})
+    return document
+
+
+def rebuild_all(batch_size: int = 200) -> Dict[str, int]:
+    """Bangun ulang semua dokumen per batch; hapus dokumen yatim"""
+    layanan_ids = [layanan_id for (layanan_id,) in db.session.query(Layanan.layanan_id).order_by(Layanan.layanan_id)]
+    written = 0
+    for start in range(0, len(layanan_ids), batch_size):
+        written += save_documents(build_documents(layanan_ids[start:start + batch_size]))
+
+    orphans = LayananDocument.query.filter(
+        ~LayananDocument.layanan_id.in_(db.session.query(Layanan.layanan_id))
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return {'layanan': len(layanan_ids), 'written': written, 'deleted': orphans}
+
+
+def load_documents(layanan_ids: Iterable[str]) -> Dict[str, Dict]:
+    """Baca dokumen tersimpan; layanan yang belum punya dokumen dibangun on the fly"""
+    layanan_ids = list(layanan_ids)
+    documents = {
+        layanan_id: json.loads(content)
+        for layanan_id, content in db.session.query(LayananDocument.layanan_id, LayananDocument.document)
+        .filter(LayananDocument.layanan_id.in_(layanan_ids))
+    } if layanan_ids else {}
+    missing = [layanan_id for layanan_id in layanan_ids if layanan_id not in documents]
+    if missing:
+        documents.update(build_documents(missing))
+    return documents
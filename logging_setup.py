@@ -0,0 +1,170 @@
+"""
+Pipeline logging non-blocking
+Thread request hanya memasukkan LogRecord ke antrian; format (teks/JSON)
+dan I/O dikerjakan thread writer di background (QueueListener).
+
+Konfigurasi lewat environment:
+    LOG_LEVEL=INFO
+    LOG_FORMAT=text | json
+    LOG_QUEUE_SIZE=10000         # record di-drop jika antrian penuh
+    LOG_SAMPLE=app=0.2,db_instrumentation=0.05
+                                 # simpan sebagian log INFO/DEBUG per logger
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from typing import Dict, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Atribut bawaan LogRecord; sisanya dianggap field structured dari `extra`
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+# Arg log bertipe ini aman diinterpolasi belakangan di thread writer
+_IMMUTABLE_ARGS = (str, bytes, int, float, bool, type(None), Decimal, date, BaseException)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Satu baris JSON per record, termasuk field dari `extra`"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Simpan 1 dari N record INFO/DEBUG per logger (deterministik, tanpa random).
+    WARNING ke atas selalu lolos.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self._every = {
+            name: max(int(round(1.0 / rate)), 1)
+            for name, rate in rates.items() if 0 < rate < 1
+        }
+        self._counters = {name: itertools.count() for name in self._every}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        every = self._every.get(record.name)
+        if every is None:
+            return True
+        return next(self._counters[record.name]) % every == 0
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler yang tidak pernah menunggu; record di-drop saat antrian penuh"""
+
+    dropped = 0
+    _dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Interpolasi msg % args, format traceback, dan format teks/JSON
+        # dikerjakan thread writer. Hanya args yang bisa berubah setelah
+        # logger.x() return (list, dict, objek lain) diinterpolasi di sini.
+        if not isinstance(record.msg, str) or not _immutable_args(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with NonBlockingQueueHandler._dropped_lock:
+                NonBlockingQueueHandler.dropped += 1
+
+
+def _immutable_args(args) -> bool:
+    if not args:
+        return True
+    # Satu dict sebagai args (logger.info('%(x)s', {...})) selalu diinterpolasi
+    return isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARGS) for arg in args)
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse 'app=0.2,db_instrumentation=0.05'"""
+    rates = {}
+    for part in (value or '').split(','):
+        name, sep, rate = part.partition('=')
+        if sep and name.strip():
+            try:
+                rates[name.strip()] = float(rate)
+            except ValueError:
+                continue
+    return rates
+
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None):
+    """Pasang QueueHandler di root logger dan jalankan writer thread (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    log_format = (log_format or os.getenv('LOG_FORMAT', 'text')).lower()
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    rates = parse_sample_rates(os.getenv('LOG_SAMPLE', ''))
+    if rates:
+        queue_handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level, logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def _restart_after_fork():
+    """Writer thread tidak ikut ter-fork (gunicorn --preload); jalankan ulang di child"""
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def stop_logging():
+    """Flush antrian dan hentikan writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,151 @@
+"""
+Body pesan outgoing berbasis hash (tabel message_bodies)
+
+Teks detail layanan, SOP, dan menu yang sama dikirim ribuan kali sehari.
+Body outgoing yang panjang disimpan sekali, dengan kunci sha256, dan
+messages.body_hash menunjuk ke sana (messages.content = NULL).
+Message.text membaca keduanya.
+
+Body tidak pernah dihapus: jumlahnya sebanding dengan variasi isi katalog,
+bukan jumlah pesan.
+
+    flask migrate-message-bodies     # tabel/kolom baru + dedup pesan lama
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, inspect, insert, select, text, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Message, MessageBody, get_wib_time
+
+logger = logging.getLogger(__name__)
+
+# Body yang tidak lebih panjang dari hash (64 char) tetap di messages.content; teks menu
+# & navigasi (~75-120 char) sudah di atas batas ini dan ikut disimpan sekali
+MIN_LENGTH = int(os.getenv('MESSAGE_BODY_MIN_LENGTH', '65'))
+KNOWN_CACHE_SIZE = 1024
+
+_known: 'OrderedDict[str, None]' = OrderedDict()
+_known_lock = threading.Lock()
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _is_known(digest: str) -> bool:
+    with _known_lock:
+        if digest in _known:
+            _known.move_to_end(digest)
+            return True
+    return False
+
+
+def remember(digest: Optional[str]):
+    """Tandai body sudah ada di DB; panggil setelah commit"""
+    if not digest:
+        return
+    with _known_lock:
+        _known[digest] = None
+        _known.move_to_end(digest)
+        while len(_known) > KNOWN_CACHE_SIZE:
+            _known.popitem(last=False)
+
+
+def resolve(content: Optional[str], direction: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (content, body_hash) untuk kolom Message di transaksi saat ini.
+    Body disisipkan jika belum ada; panggil remember(body_hash) setelah commit.
+    """
+    if direction != 'outgoing' or not content or len(content) < MIN_LENGTH:
+        return content, None
+
+    digest = content_hash(content)
+    if not _is_known(digest) and db.session.get(MessageBody, digest) is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(MessageBody(hash=digest, content=content, length=len(content)))
+        except IntegrityError:
+            # Worker lain menyisipkan body yang sama lebih dulu
+            pass
+    return None, digest
+
+
+# ============================================
+# Migrasi database lama
+# ============================================
+
+def ensure_schema() -> List[str]:
+    """Buat tabel message_bodies & kolom messages.body_hash jika belum ada"""
+    steps = []
+    inspector = inspect(db.engine)
+    if not inspector.has_table(MessageBody.__tablename__):
+        MessageBody.__table__.create(db.engine)
+        steps.append('tabel message_bodies dibuat')
+
+    columns = {column['name'] for column in inspector.get_columns(Message.__tablename__)}
+    if 'body_hash' not in columns:
+        with db.engine.begin() as conn:
+            conn.execute(text('ALTER TABLE messages ADD COLUMN body_hash VARCHAR(64)'))
+            conn.execute(text('CREATE INDEX ix_messages_body_hash ON messages (body_hash)'))
+            if conn.dialect.name == 'mysql':
+                conn.execute(text(
+                    'ALTER TABLE messages ADD CONSTRAINT fk_messages_body_hash '
+                    'FOREIGN KEY (body_hash) REFERENCES message_bodies (hash)'
+                ))
+        steps.append('kolom messages.body_hash ditambahkan')
+    return steps
+
+
+def dedupe_existing(batch_size: int = 1000) -> Dict[str, int]:
+    """Pindahkan body outgoing lama ke message_bodies per batch (keyset by id, commit per batch)"""
+    stats = {'messages': 0, 'bodies': 0, 'bytes_before': 0, 'bytes_after': 0}
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Message.id, Message.content)
+            .where(
+                Message.id > last_id,
+                Message.direction == 'outgoing',
+                Message.body_hash.is_(None),
+                Message.content.isnot(None),
+                func.length(Message.content) >= MIN_LENGTH,
+            )
+            .order_by(Message.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return stats
+        last_id = rows[-1].id
+
+        bodies = {}
+        updates = []
+        for message_id, content in rows:
+            digest = content_hash(content)
+            bodies[digest] = content
+            updates.append({'id': message_id, 'body_hash': digest, 'content': None})
+            stats['bytes_before'] += len(content.encode('utf-8'))
+
+        existing = set(
+            db.session.execute(select(MessageBody.hash).where(MessageBody.hash.in_(list(bodies)))).scalars()
+        )
+        new_bodies = [
+            {'hash': digest, 'content': content, 'length': len(content), 'created_at': get_wib_time()}
+            for digest, content in bodies.items()
+            if digest not in existing
+        ]
+        if new_bodies:
+            db.session.execute(insert(MessageBody), new_bodies)
+        db.session.execute(update(Message), updates)
+        db.session.commit()
+
+        stats['messages'] += len(updates)
+        stats['bodies'] += len(new_bodies)
+        stats['bytes_after'] += sum(len(body['content'].encode('utf-8')) for body in new_bodies)
+        logger.info('🗜️ Dedup body: %s pesan (sampai id %s)', stats['messages'], last_id)
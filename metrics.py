@@ -0,0 +1,452 @@
+"""
+Registry metrics sederhana dengan format text exposition Prometheus
+Tanpa dependency eksternal.
+
+Multi-process (gunicorn): set METRICS_MULTIPROC_DIR ke direktori yang bisa
+ditulis semua worker. Setiap proses menulis snapshot ke
+`<dir>/metrics-<pid>.json` secara berkala; endpoint /metrics menggabungkan
+semua snapshot proses yang masih hidup (counter & histogram dijumlah; gauge
+dijumlah atau diambil max/min sesuai `aggregate`, mis. state per worker).
+Snapshot proses yang sudah mati dihapus: saat dibaca, di hook gunicorn
+child_exit, dan seluruhnya saat master gunicorn start (gunicorn.conf.py).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values, **kwargs) -> '_Child':
+        if kwargs:
+            values = tuple(str(kwargs[n]) for n in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f'{self.name}: expected labels {self.labelnames}')
+        return _Child(self, values)
+
+    def _reset(self):
+        with self._lock:
+            self._values = {}
+
+    # Diimplementasi subclass
+    def snapshot(self) -> Dict:
+        raise NotImplementedError
+
+
+class _Child:
+    """Metric dengan nilai label tertentu"""
+    __slots__ = ('_metric', '_key')
+
+    def __init__(self, metric: _Metric, key: Tuple[str, ...]):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount: float = 1.0):
+        self._metric._inc(self._key, amount)
+
+    def dec(self, amount: float = 1.0):
+        self._metric._inc(self._key, -amount)
+
+    def set(self, value: float):
+        self._metric._set(self._key, value)
+
+    def observe(self, value: float):
+        self._metric._observe(self._key, value)
+
+    def get(self) -> float:
+        """Nilai saat ini di proses ini (counter/gauge)"""
+        with self._metric._lock:
+            return self._metric._values.get(self._key, 0.0)
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _inc(self, key, amount):
+        if amount < 0:
+            raise ValueError('Counter hanya bisa naik')
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def inc(self, amount: float = 1.0):
+        self._inc((), amount)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {'|'.join(k): v for k, v in self._values.items()}
+
+
+GAUGE_AGGREGATES = {'sum': lambda a, b: a + b, 'max': max, 'min': min}
+
+
+class Gauge(_Metric):
+    """
+    aggregate: cara menggabungkan nilai antar proses worker. 'sum' untuk jumlah
+    (antrian, ukuran), 'max'/'min' untuk kode state yang tidak bermakna dijumlah.
+    """
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), aggregate: str = 'sum'):
+        super().__init__(name, documentation, labelnames)
+        if aggregate not in GAUGE_AGGREGATES:
+            raise ValueError(f'aggregate harus salah satu dari {sorted(GAUGE_AGGREGATES)}')
+        self.aggregate = aggregate
+        self._function: Optional[Callable[[], float]] = None
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _set(self, key, value):
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0):
+        self._inc((), amount)
+
+    def dec(self, amount: float = 1.0):
+        self._inc((), -amount)
+
+    def set(self, value: float):
+        self._set((), value)
+
+    def set_function(self, function: Callable[[], float]):
+        """Nilai dihitung saat scrape (mis. kedalaman antrian)"""
+        self._function = function
+
+    def snapshot(self) -> Dict:
+        if self._function is not None:
+            try:
+                self._set((), self._function())
+            except Exception as e:
+                logger.debug('Gauge %s callback error: %s', self.name, e)
+        with self._lock:
+            return {'|'.join(k): v for k, v in self._values.items()}
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _observe(self, key, value):
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def observe(self, value: float):
+        self._observe((), value)
+
+    def time(self):
+        return _Timer(self, ())
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                '|'.join(k): {'buckets': list(v['buckets']), 'sum': v['sum'], 'count': v['count']}
+                for k, v in self._values.items()
+            }
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, key):
+        self._histogram = histogram
+        self._key = key
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram._observe(self._key, time.perf_counter() - self._started)
+
+
+# ============================================
+# Registry
+# ============================================
+
+class Registry:
+    """Kumpulan metric + exposition + agregasi multi-process"""
+
+    def __init__(self, multiproc_dir: Optional[str] = None, flush_interval: float = 5.0):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self.multiproc_dir = multiproc_dir
+        self.flush_interval = flush_interval
+        self._flusher: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), aggregate: str = 'sum') -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, aggregate))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {m.name: m.snapshot() for m in metrics}
+
+    def reset(self):
+        """Kosongkan nilai (dipakai di child proses setelah fork)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            m._reset()
+
+    # ---------- multi-process ----------
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(self.multiproc_dir, f'metrics-{pid}.json')
+
+    def flush(self):
+        """Tulis snapshot proses ini ke METRICS_MULTIPROC_DIR (atomic replace)"""
+        if not self.multiproc_dir:
+            return
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f'{path}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'pid': os.getpid(), 'written_at': time.time(), 'metrics': self.snapshot()}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning('⚠️ Metrics flush gagal: %s', e)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def start_flusher(self):
+        if not self.multiproc_dir or (self._flusher and self._flusher.is_alive()):
+            return
+        os.makedirs(self.multiproc_dir, exist_ok=True)
+        self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def _after_fork_in_child(self):
+        self.reset()
+        self._flusher = None
+        self.start_flusher()
+
+    def mark_process_dead(self, pid: int):
+        """Hapus snapshot worker yang sudah keluar (gunicorn child_exit)"""
+        if not self.multiproc_dir:
+            return
+        try:
+            os.remove(self._snapshot_path(pid))
+        except FileNotFoundError:
+            pass
+
+    def clear_multiproc_dir(self):
+        """Hapus semua snapshot (master gunicorn sebelum worker pertama di-fork)"""
+        if not self.multiproc_dir or not os.path.isdir(self.multiproc_dir):
+            return
+        for filename in os.listdir(self.multiproc_dir):
+            if filename.startswith('metrics-'):
+                try:
+                    os.remove(os.path.join(self.multiproc_dir, filename))
+                except FileNotFoundError:
+                    pass
+
+    def _collect_snapshots(self) -> List[Tuple[int, Dict]]:
+        if not self.multiproc_dir:
+            return [(os.getpid(), self.snapshot())]
+        self.flush()
+        snapshots = []
+        for filename in os.listdir(self.multiproc_dir):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.multiproc_dir, filename)) as f:
+                    data = json.load(f)
+                pid = int(data['pid'])
+            except (OSError, ValueError, KeyError):
+                continue
+            # Snapshot proses yang sudah mati/diganti tidak dijumlahkan lagi
+            if pid != os.getpid() and not _pid_alive(pid):
+                self.mark_process_dead(pid)
+                continue
+            snapshots.append((pid, data['metrics']))
+        return snapshots
+
+    # ---------- exposition ----------
+
+    def generate_latest(self) -> str:
+        """Render semua metric (gabungan semua proses) ke text format"""
+        snapshots = self._collect_snapshots()
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            merged: Dict[str, object] = {}
+            combine = GAUGE_AGGREGATES[metric.aggregate] if isinstance(metric, Gauge) else GAUGE_AGGREGATES['sum']
+            for pid, snapshot in snapshots:
+                values = snapshot.get(metric.name, {})
+                for key, value in values.items():
+                    if isinstance(metric, Histogram):
+                        state = merged.setdefault(key, {'buckets': [0] * len(metric.buckets), 'sum': 0.0, 'count': 0})
+                        state['buckets'] = [a + b for a, b in zip(state['buckets'], value['buckets'])]
+                        state['sum'] += value['sum']
+                        state['count'] += value['count']
+                    else:
+                        merged[key] = combine(merged[key], value) if key in merged else value
+
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            for key in sorted(merged):
+                label_values = key.split('|') if metric.labelnames else []
+                value = merged[key]
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets, value['buckets']):
+                        cumulative += count
+                        labels = _format_labels(metric.labelnames, label_values, ('le', _format_value(bound)))
+                        lines.append(f'{metric.name}_bucket{labels} {cumulative}')
+                    labels = _format_labels(metric.labelnames, label_values, ('le', '+Inf'))
+                    lines.append(f'{metric.name}_bucket{labels} {value["count"]}')
+                    labels = _format_labels(metric.labelnames, label_values)
+                    lines.append(f'{metric.name}_sum{labels} {_format_value(value["sum"])}')
+                    lines.append(f'{metric.name}_count{labels} {value["count"]}')
+                else:
+                    labels = _format_labels(metric.labelnames, label_values)
+                    lines.append(f'{metric.name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# ============================================
+# Registry default + metric aplikasi
+# ============================================
+
+REGISTRY = Registry(
+    multiproc_dir=os.getenv('METRICS_MULTIPROC_DIR') or None,
+    flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', '5')),
+)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=REGISTRY._after_fork_in_child)
+
+WEBHOOK_LATENCY = REGISTRY.histogram(
+    'webhook_request_duration_seconds', 'Latency POST /webhook', ('status',)
+)
+HANDLE_MESSAGE_DURATION = REGISTRY.histogram(
+    'handle_message_duration_seconds', 'Durasi handle_message per cabang', ('branch',)
+)
+GRAPH_API_LATENCY = REGISTRY.histogram(
+    'graph_api_request_duration_seconds', 'Latency request ke Graph API WhatsApp'
+)
+GRAPH_API_RESPONSES = REGISTRY.counter(
+    'graph_api_responses_total', 'Response Graph API per status code', ('status',)
+)
+DB_TIME_PER_MESSAGE = REGISTRY.histogram(
+    'db_time_per_message_seconds', 'Total waktu DB per pesan masuk'
+)
+DB_QUERIES_PER_MESSAGE = REGISTRY.histogram(
+    'db_queries_per_message', 'Jumlah statement SQL per pesan masuk',
+    buckets=(1, 2, 5, 10, 15, 20, 30, 50, 100),
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total', 'Lookup cache per hasil (hit/miss); hit ratio = hit / total', ('cache', 'result')
+)
+FLOOD_CONTROL_MESSAGES = REGISTRY.counter(
+    'flood_control_messages_total', 'Pesan masuk per keputusan flood control (allow/notify/drop)', ('decision',)
+)
+COALESCED_REPLIES = REGISTRY.counter(
+    'coalesced_replies_total', 'Balasan navigasi yang dilewati karena ada tap lebih baru', ('branch',)
+)
+OUTBOUND_QUEUE_TIME = REGISTRY.histogram(
+    'outbound_queue_seconds', 'Waktu tunggu pesan keluar sebelum dikirim, per lane', ('lane',)
+)
+GRAPH_CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    'graph_circuit_transitions_total', 'Perpindahan state circuit breaker Graph API', ('state',)
+)
+GRAPH_SPOOL_RECORDS = REGISTRY.counter(
+    'graph_spool_records_total', 'Payload spool Graph API per hasil (spooled/replayed/unknown/abandoned/expired)', ('result',)
+)
+WEBHOOK_JOURNAL_RECORDS = REGISTRY.counter(
+    'webhook_journal_records_total', 'Record journal webhook per hasil (appended/processed/replayed/corrupt/retry)', ('result',)
+)
+WEBHOOK_JOURNAL_FSYNC = REGISTRY.histogram(
+    'webhook_journal_fsync_seconds', 'Durasi fsync group commit journal webhook'
+)
+WEBHOOK_JOURNAL_GROUP_SIZE = REGISTRY.histogram(
+    'webhook_journal_group_size', 'Jumlah record per fsync journal webhook',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+QUEUE_DEPTH = REGISTRY.gauge(
+    'queue_depth', 'Jumlah pekerjaan yang menunggu per antrian', ('queue',)
+)
+
+
+def cache_hit(cache: str):
+    CACHE_REQUESTS.labels(cache, 'hit').inc()
+
+
+def cache_miss(cache: str):
+    CACHE_REQUESTS.labels(cache, 'miss').inc()
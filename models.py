@@ -6,6 +6,7 @@ UPDATED: Message.service_type diganti dengan layanan_id (Foreign Key)
 
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.dialects.mysql import LONGTEXT
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import pytz
@@ -54,6 +55,8 @@ class Message(db.Model):
     direction = db.Column(db.String(10), nullable=False)  # 'incoming' atau 'outgoing'
     message_type = db.Column(db.String(20))  # 'text', 'interactive', 'button', dll
     content = db.Column(db.Text)
+    # Body outgoing yang berulang disimpan sekali di message_bodies (content = NULL)
+    body_hash = db.Column(db.String(64), db.ForeignKey('message_bodies.hash'), index=True)
     
     # UPDATED: Relasi dengan layanan (ganti service_type)
     layanan_id = db.Column(db.String(50), db.ForeignKey('layanan.layanan_id'))
@@ -68,10 +71,18 @@ class Message(db.Model):
     
     # Relationship dengan Layanan
     layanan = db.relationship('Layanan', backref='messages', foreign_keys=[layanan_id])
+    body = db.relationship('MessageBody')
     
     def __repr__(self):
         return f'<Message {self.message_id}>'
     
+    @property
+    def text(self):
+        """Isi pesan: content langsung atau body dari message_bodies"""
+        if self.body_hash:
+            return self.body.content if self.body else None
+        return self.content
+    
     def to_dict(self):
         """Convert to dictionary dengan nama layanan"""
         return {
@@ -80,7 +91,7 @@ class Message(db.Model):
             'user_id': self.user_id,
             'direction': self.direction,
             'message_type': self.message_type,
-            'content': self.content,
+            'content': self.text,
             'layanan_id': self.layanan_id,
             'layanan_nama': self.layanan.judul if self.layanan else None,
             'status': self.status,
@@ -89,6 +100,42 @@ class Message(db.Model):
         }
 
 
+class MessageBody(db.Model):
+    """Body pesan outgoing, disimpan sekali per isi (sha256)"""
+    __tablename__ = 'message_bodies'
+    
+    hash = db.Column(db.String(64), primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=get_wib_time)
+    
+    def __repr__(self):
+        return f'<MessageBody {self.hash[:12]} ({self.length} chars)>'
+
+
+class MessageDailyStat(db.Model):
+    """
+    Rekap harian pesan (per arah & layanan) untuk hari yang sudah di-arsip
+    Ditulis sekali sebelum pesan hari itu dihapus (lihat retention.py)
+    """
+    __tablename__ = 'message_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('date', 'direction', 'layanan_id', name='uq_message_daily_stats'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+    direction = db.Column(db.String(10), nullable=False)
+    layanan_id = db.Column(db.String(50))  # tanpa FK: rekap tetap ada walau layanan dihapus
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    created_at = db.Column(db.DateTime, default=get_wib_time)
+    
+    def __repr__(self):
+        return f'<MessageDailyStat {self.date} {self.direction} {self.layanan_id}: {self.message_count}>'
+
+
 class UserSession(db.Model):
     """Model untuk session user"""
     __tablename__ = 'user_sessions'
@@ -206,6 +253,7 @@ class Layanan(db.Model):
     # Relationship
     persyaratan = db.relationship('Persyaratan', backref='layanan', lazy='dynamic', cascade='all, delete-orphan')
     sop = db.relationship('SOP', backref='layanan', lazy='dynamic', cascade='all, delete-orphan')
+    document = db.relationship('LayananDocument', uselist=False, cascade='all, delete-orphan')
     
     created_at = db.Column(db.DateTime, default=get_wib_time)
     updated_at = db.Column(db.DateTime, default=get_wib_time, onupdate=get_wib_time)
@@ -227,6 +275,17 @@ class Layanan(db.Model):
         }
 
 
+class LayananSequence(db.Model):
+    """Nomor urut layanan_id per kategori (lihat catalog.allocate_layanan_id)"""
+    __tablename__ = 'layanan_sequence'
+    
+    kategori_id = db.Column(db.Integer, db.ForeignKey('kategori.id', ondelete='CASCADE'), primary_key=True)
+    last_value = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<LayananSequence {self.kategori_id}: {self.last_value}>'
+
+
 class Persyaratan(db.Model):
     """Model untuk persyaratan layanan"""
     __tablename__ = 'persyaratan'
@@ -256,4 +315,58 @@ class SOP(db.Model):
     created_at = db.Column(db.DateTime, default=get_wib_time)
     
     def __repr__(self):
-        return f'<SOP {self.id}>'
\ No newline at end of file
+        return f'<SOP {self.id}>'
+
+class LayananDocument(db.Model):
+    """
+    Dokumen layanan siap saji: JSON terurut + teks detail/SOP ter-render
+    Dibangun ulang saat layanan disimpan (lihat layanan_documents.py)
+    """
+    __tablename__ = 'layanan_documents'
+    
+    layanan_id = db.Column(db.String(50), db.ForeignKey('layanan.layanan_id', ondelete='CASCADE'), primary_key=True)
+    document = db.Column(db.Text, nullable=False)
+    detail_text = db.Column(db.Text, nullable=False)
+    sop_text = db.Column(db.Text, nullable=False)
+    content_hash = db.Column(db.String(40), nullable=False)
+    updated_at = db.Column(db.DateTime, default=get_wib_time, onupdate=get_wib_time)
+    
+    def __repr__(self):
+        return f'<LayananDocument {self.layanan_id}>'
+
+
+class CatalogVersion(db.Model):
+    """
+    Nomor versi katalog (satu baris, id=1)
+    `version` dinaikkan di transaksi yang sama dengan setiap perubahan draft
+    Kategori/Layanan/Persyaratan/SOP (lihat catalog.install_version_hooks).
+    `published_release_id` menunjuk rilis yang dibaca bot.
+    """
+    __tablename__ = 'catalog_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    published_release_id = db.Column(db.Integer, db.ForeignKey('catalog_release.id'))
+    updated_at = db.Column(db.DateTime, default=get_wib_time, onupdate=get_wib_time)
+    
+    def __repr__(self):
+        return f'<CatalogVersion {self.version}>'
+
+
+class CatalogRelease(db.Model):
+    """Snapshot katalog yang sudah di-publish (immutable)"""
+    __tablename__ = 'catalog_release'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    catalog_version = db.Column(db.BigInteger, nullable=False)  # versi draft saat publish
+    content_hash = db.Column(db.String(64), nullable=False)
+    document = db.Column(db.Text().with_variant(LONGTEXT(), 'mysql'), nullable=False)
+    kategori_count = db.Column(db.Integer, default=0)
+    layanan_count = db.Column(db.Integer, default=0)
+    note = db.Column(db.String(255))
+    published_by = db.Column(db.String(50))
+    
+    created_at = db.Column(db.DateTime, default=get_wib_time)
+    
+    def __repr__(self):
+        return f'<CatalogRelease {self.id} v{self.catalog_version}>'
@@ -0,0 +1,154 @@
+"""
+Jalur prioritas untuk pesan keluar (Graph API)
+
+Request HTTP ke Graph API dijalankan oleh pool worker bersama yang mengambil
+pekerjaan dari beberapa lane:
+
+    interactive  balasan percakapan dari handle_message
+    followup     balasan otomatis non-percakapan (mis. notifikasi flood control)
+    broadcast    pengumuman massal (flask broadcast)
+
+Lane dipilih dengan weighted fair scheduling (stride: lane dengan "pass"
+terkecil jalan duluan, pass naik 1/weight per pekerjaan) dan setiap lane
+punya batas concurrency. Dengan batas broadcast < jumlah worker, broadcast
+besar tidak pernah memakai semua worker, sehingga balasan menu tidak ikut
+mengantri di belakangnya. Waktu tunggu per lane tercatat di
+outbound_queue_seconds.
+
+    OUTBOUND_WORKERS=10
+    OUTBOUND_LANES=interactive:10:10,followup:3:3,broadcast:1:2   # nama:weight:max_concurrency
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+FOLLOWUP = 'followup'
+BROADCAST = 'broadcast'
+
+DEFAULT_LANES = 'interactive:10:10,followup:3:3,broadcast:1:2'
+
+
+class _Lane:
+    __slots__ = ('name', 'weight', 'max_concurrency', 'queue', 'active', 'pass_value')
+
+    def __init__(self, name: str, weight: float, max_concurrency: int):
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.queue = deque()
+        self.active = 0
+        self.pass_value = 0.0
+
+
+def parse_lanes(spec: str) -> List[Tuple[str, float, int]]:
+    """'nama:weight:max,...' -> [(nama, weight, max_concurrency)]"""
+    lanes = []
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        name, weight, max_concurrency = part.strip().split(':')
+        lanes.append((name, float(weight), int(max_concurrency)))
+    return lanes
+
+
+class OutboundScheduler:
+    """Pool worker dengan lane berprioritas; submit() mengembalikan Future"""
+
+    def __init__(self, lanes: List[Tuple[str, float, int]], workers: int = 10):
+        self.lanes: Dict[str, _Lane] = {
+            name: _Lane(name, weight, max(max_concurrency, 1)) for name, weight, max_concurrency in lanes
+        }
+        self.workers = max(workers, 1)
+        self._condition = threading.Condition()
+        self._virtual_time = 0.0
+        self._threads: List[threading.Thread] = []
+        self._pid = None
+
+    def _ensure_workers(self):
+        # Thread dibuat saat submit pertama di proses ini (aman setelah fork gunicorn)
+        if self._pid == os.getpid():
+            return
+        with self._condition:
+            if self._pid == os.getpid():
+                return
+            self._threads = [
+                threading.Thread(target=self._run, name=f'outbound-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, lane: str, function: Callable, *args, **kwargs) -> Future:
+        if lane not in self.lanes:
+            raise ValueError(f'Lane outbound tidak dikenal: {lane}')
+        self._ensure_workers()
+        future = Future()
+        # copy_context: log & statistik request ikut terlihat di worker
+        job = (future, contextvars.copy_context(), function, args, kwargs, time.perf_counter())
+        with self._condition:
+            target = self.lanes[lane]
+            if not target.queue and not target.active:
+                # Lane yang baru aktif tidak membawa "kredit" dari masa idle
+                target.pass_value = max(target.pass_value, self._virtual_time)
+            target.queue.append(job)
+            metrics.QUEUE_DEPTH.labels(queue=f'outbound_{lane}').inc()
+            self._condition.notify()
+        return future
+
+    def _next_job(self):
+        """Lane siap dengan pass terkecil (dipanggil dengan lock dipegang)"""
+        ready = [
+            lane for lane in self.lanes.values()
+            if lane.queue and lane.active < lane.max_concurrency
+        ]
+        if not ready:
+            return None, None
+        lane = min(ready, key=lambda candidate: candidate.pass_value)
+        self._virtual_time = lane.pass_value
+        lane.pass_value += 1.0 / lane.weight
+        lane.active += 1
+        return lane, lane.queue.popleft()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                lane, job = self._next_job()
+                while job is None:
+                    self._condition.wait()
+                    lane, job = self._next_job()
+
+            future, context, function, args, kwargs, queued_at = job
+            metrics.QUEUE_DEPTH.labels(queue=f'outbound_{lane.name}').dec()
+            metrics.OUTBOUND_QUEUE_TIME.labels(lane=lane.name).observe(time.perf_counter() - queued_at)
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(context.run(function, *args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._condition:
+                lane.active -= 1
+                # Slot lane ini kosong lagi: worker lain mungkin bisa mengambil pekerjaannya
+                self._condition.notify_all()
+
+    def run(self, lane: str, function: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """submit() lalu tunggu hasilnya (exception diteruskan ke pemanggil)"""
+        return self.submit(lane, function, *args, **kwargs).result(timeout=timeout)
+
+
+scheduler = OutboundScheduler(
+    parse_lanes(os.getenv('OUTBOUND_LANES', DEFAULT_LANES)),
+    workers=int(os.getenv('OUTBOUND_WORKERS', '10')),
+)
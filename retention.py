@@ -0,0 +1,363 @@
+"""
+Retensi pesan: rekap harian, arsip bulanan, dan hapus per batch
+
+Pesan yang lebih tua dari MESSAGE_RETENTION_DAYS:
+1. direkap ke message_daily_stats (sekali per hari, sebelum dihapus),
+2. ditulis ke arsip gzip NDJSON per bulan + index.json,
+3. dihapus dari tabel messages per batch kecil (lock pendek).
+
+Analytics membaca rekap untuk hari yang sudah di-arsip, sehingga angka
+di dashboard tidak berubah setelah pesan dihapus.
+
+    flask retention run --dry-run
+    flask retention run --days 365
+    flask retention partition-ddl --months 12   # opsional, MySQL
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+
+from models import db, Layanan, Message, MessageDailyStat, get_wib_time
+import exports
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = int(os.getenv('MESSAGE_RETENTION_DAYS', '365'))
+MIN_RETENTION_DAYS = 30  # dashboard & dedup butuh data beberapa minggu terakhir
+DELETE_BATCH_SIZE = int(os.getenv('RETENTION_DELETE_BATCH', '1000'))
+BATCH_PAUSE = float(os.getenv('RETENTION_BATCH_PAUSE', '0.05'))
+INDEX_FILE = 'index.json'
+
+
+def archive_dir() -> str:
+    return os.getenv('MESSAGE_ARCHIVE_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'instance', 'archive'
+    )
+
+
+def as_date(value) -> date:
+    """func.date() -> date (MySQL) atau 'YYYY-MM-DD' (SQLite)"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def cutoff_date(days: int) -> date:
+    """Pesan sebelum tanggal ini (00:00 WIB) termasuk retensi"""
+    return get_wib_time().date() - timedelta(days=max(days, MIN_RETENTION_DAYS))
+
+
+# ============================================
+# Rekap harian
+# ============================================
+
+def sealed_until() -> Optional[date]:
+    """Hari terakhir yang sudah direkap (hari <= ini dibaca dari rekap)"""
+    value = db.session.execute(select(func.max(MessageDailyStat.date))).scalar()
+    return as_date(value) if value else None
+
+
+def rollup(cutoff: date) -> int:
+    """
+    Rekap hari sebelum `cutoff` yang belum direkap.
+    Hari yang sudah direkap tidak dihitung ulang (pesannya mungkin sudah dihapus).
+    """
+    sealed = sealed_until()
+    day = func.date(Message.created_at)
+    stmt = (
+        select(day, Message.direction, Message.layanan_id, func.count(Message.id))
+        .where(Message.created_at < _day_start(cutoff))
+        .group_by(day, Message.direction, Message.layanan_id)
+    )
+    if sealed:
+        stmt = stmt.where(Message.created_at >= _day_start(sealed + timedelta(days=1)))
+
+    rows = [
+        {
+            'date': as_date(row_day),
+            'direction': direction,
+            'layanan_id': layanan_id,
+            'message_count': count,
+            'created_at': get_wib_time(),
+        }
+        for row_day, direction, layanan_id, count in db.session.execute(stmt)
+    ]
+    if rows:
+        db.session.execute(insert(MessageDailyStat), rows)
+    db.session.commit()
+    days = len({row['date'] for row in rows})
+    if days:
+        logger.info('📊 Rekap harian ditulis untuk %s hari', days)
+    return days
+
+
+def daily_counts(start: date, end: date) -> Dict[date, Dict[str, int]]:
+    """{hari: {'incoming': n, 'outgoing': n}} untuk start <= hari <= end (rekap + live)"""
+    counts: Dict[date, Dict[str, int]] = defaultdict(lambda: {'incoming': 0, 'outgoing': 0})
+    sealed = sealed_until()
+
+    if sealed and start <= sealed:
+        stmt = (
+            select(MessageDailyStat.date, MessageDailyStat.direction, func.sum(MessageDailyStat.message_count))
+            .where(MessageDailyStat.date >= start, MessageDailyStat.date <= min(end, sealed))
+            .group_by(MessageDailyStat.date, MessageDailyStat.direction)
+        )
+        for day, direction, total in db.session.execute(stmt):
+            counts[as_date(day)][direction] = int(total or 0)
+
+    live_start = max(start, sealed + timedelta(days=1)) if sealed else start
+    if live_start <= end:
+        day = func.date(Message.created_at)
+        stmt = (
+            select(day, Message.direction, func.count(Message.id))
+            .where(
+                Message.created_at >= _day_start(live_start),
+                Message.created_at < _day_start(end + timedelta(days=1)),
+            )
+            .group_by(day, Message.direction)
+        )
+        for row_day, direction, total in db.session.execute(stmt):
+            counts[as_date(row_day)][direction] = total
+    return counts
+
+
+def service_counts(start: date, limit: Optional[int] = None) -> List[Tuple[str, int]]:
+    """[(judul layanan, jumlah pesan)] sejak `start` (rekap + live), terbanyak dulu"""
+    totals: Dict[str, int] = defaultdict(int)
+    sealed = sealed_until()
+
+    if sealed and start <= sealed:
+        stmt = (
+            select(MessageDailyStat.layanan_id, func.sum(MessageDailyStat.message_count))
+            .where(MessageDailyStat.date >= start, MessageDailyStat.layanan_id.isnot(None))
+            .group_by(MessageDailyStat.layanan_id)
+        )
+        for layanan_id, total in db.session.execute(stmt):
+            totals[layanan_id] += int(total or 0)
+
+    live_start = max(start, sealed + timedelta(days=1)) if sealed else start
+    stmt = (
+        select(Message.layanan_id, func.count(Message.id))
+        .where(Message.created_at >= _day_start(live_start), Message.layanan_id.isnot(None))
+        .group_by(Message.layanan_id)
+    )
+    for layanan_id, total in db.session.execute(stmt):
+        totals[layanan_id] += total
+
+    if not totals:
+        return []
+    judul = dict(
+        db.session.execute(select(Layanan.layanan_id, Layanan.judul).where(Layanan.layanan_id.in_(list(totals))))
+        .all()
+    )
+    by_judul: Dict[str, int] = defaultdict(int)
+    for layanan_id, total in totals.items():
+        by_judul[judul.get(layanan_id, layanan_id)] += total
+    ranked = sorted(by_judul.items(), key=lambda item: item[1], reverse=True)
+    return ranked[:limit] if limit else ranked
+
+
+def total_message_count() -> int:
+    """Total pesan sepanjang waktu: rekap hari yang sudah di-seal + pesan live setelahnya"""
+    sealed = sealed_until()
+    if not sealed:
+        return Message.query.count()
+    archived = db.session.execute(select(func.sum(MessageDailyStat.message_count))).scalar() or 0
+    live = Message.query.filter(Message.created_at >= _day_start(sealed + timedelta(days=1))).count()
+    return int(archived) + live
+
+
+# ============================================
+# Arsip & hapus
+# ============================================
+
+def read_index(directory: Optional[str] = None) -> Dict:
+    path = os.path.join(directory or archive_dir(), INDEX_FILE)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'files': []}
+
+
+def _write_index(directory: str, index: Dict):
+    path = os.path.join(directory, INDEX_FILE)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _month_windows(first: date, cutoff: date):
+    """[(awal, akhir_eksklusif)] per bulan kalender, dipotong di cutoff"""
+    start = first.replace(day=1)
+    while start < cutoff:
+        next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        yield max(start, first), min(next_month, cutoff)
+        start = next_month
+
+
+def _archive_window(directory: str, start: date, end: date) -> Optional[Dict]:
+    """Tulis pesan [start, end) ke satu file gzip NDJSON; return entri index"""
+    stats = {'rows': 0, 'min_id': None, 'max_id': None}
+
+    def tracked(rows):
+        for row in rows:
+            stats['rows'] += 1
+            stats['min_id'] = row.id if stats['min_id'] is None else stats['min_id']
+            stats['max_id'] = row.id
+            yield row
+
+    stamp = get_wib_time().strftime('%Y%m%dT%H%M%S')
+    filename = f'messages-{start:%Y-%m}-{stamp}.ndjson.gz'
+    path = os.path.join(directory, filename)
+    tmp_path = f'{path}.tmp'
+    digest = hashlib.sha256()
+
+    export_filter = exports.ExportFilter(start=start, end=end - timedelta(days=1))
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(filename=filename[:-3], mode='wb', fileobj=raw) as gz:
+            for chunk in exports.iter_ndjson(tracked(exports.message_rows(export_filter)), exports.MESSAGE_COLUMNS):
+                data = chunk.encode('utf-8')
+                digest.update(data)
+                gz.write(data)
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if not stats['rows']:
+        os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, path)
+    return {
+        'file': filename,
+        'month': f'{start:%Y-%m}',
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'rows': stats['rows'],
+        'min_id': stats['min_id'],
+        'max_id': stats['max_id'],
+        'sha256': digest.hexdigest(),  # isi NDJSON sebelum gzip
+        'bytes': os.path.getsize(path),
+        'archived_at': get_wib_time().isoformat(),
+    }
+
+
+def _delete_window(start: date, end: date, max_id: int) -> int:
+    """Hapus pesan yang sudah di-arsip per batch kecil (commit per batch)"""
+    deleted = 0
+    window = (
+        Message.created_at >= _day_start(start),
+        Message.created_at < _day_start(end),
+        Message.id <= max_id,
+    )
+    while True:
+        ids = db.session.execute(
+            select(Message.id).where(*window).order_by(Message.id).limit(DELETE_BATCH_SIZE)
+        ).scalars().all()
+        if not ids:
+            return deleted
+        db.session.execute(delete(Message).where(Message.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+        if BATCH_PAUSE:
+            time.sleep(BATCH_PAUSE)
+
+
+def run(days: int = RETENTION_DAYS, dry_run: bool = False) -> Dict:
+    """Rekap, arsip, dan hapus pesan yang lebih tua dari `days` hari"""
+    cutoff = cutoff_date(days)
+    first = db.session.execute(
+        select(func.min(Message.created_at)).where(Message.created_at < _day_start(cutoff))
+    ).scalar()
+    report = {'cutoff': cutoff.isoformat(), 'dry_run': dry_run, 'months': []}
+    if first is None:
+        return report
+
+    windows = list(_month_windows(as_date(first), cutoff))
+    if dry_run:
+        for start, end in windows:
+            count = Message.query.filter(
+                Message.created_at >= _day_start(start), Message.created_at < _day_start(end)
+            ).count()
+            if count:
+                report['months'].append({'month': f'{start:%Y-%m}', 'rows': count})
+        return report
+
+    report['sealed_days'] = rollup(cutoff)
+
+    directory = archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    index = read_index(directory)
+    for start, end in windows:
+        started = time.perf_counter()
+        entry = _archive_window(directory, start, end)
+        if entry is None:
+            continue
+        # Index ditulis sebelum hapus: file di index selalu lengkap
+        index['files'].append(entry)
+        _write_index(directory, index)
+        deleted = _delete_window(start, end, entry['max_id'])
+        logger.info(
+            '🗄️ Arsip %s: %s pesan -> %s, %s dihapus (%.1f s)',
+            entry['month'], entry['rows'], entry['file'], deleted, time.perf_counter() - started,
+        )
+        report['months'].append({'month': entry['month'], 'rows': entry['rows'], 'deleted': deleted, 'file': entry['file']})
+    return report
+
+
+# ============================================
+# MySQL range partitioning (opsional)
+# ============================================
+
+def partition_ddl(months: int = 12, start: Optional[date] = None) -> str:
+    """
+    DDL partisi RANGE bulanan pada messages.created_at (MySQL).
+    Tidak dijalankan otomatis: MySQL mensyaratkan kolom partisi ada di setiap
+    unique key, sehingga primary key & unique message_id harus diubah dulu.
+    """
+    start = (start or get_wib_time().date()).replace(day=1)
+    partitions = [f"    PARTITION p_old VALUES LESS THAN (TO_DAYS('{start.isoformat()}'))"]
+    month = start
+    for _ in range(months + 1):
+        next_month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        partitions.append(f"    PARTITION p{month:%Y%m} VALUES LESS THAN (TO_DAYS('{next_month.isoformat()}'))")
+        month = next_month
+    partitions.append('    PARTITION pmax VALUES LESS THAN MAXVALUE')
+
+    return '\n'.join([
+        '-- Partisi bulanan messages.created_at (MySQL 8)',
+        '-- 1) Kolom partisi wajib ada di setiap PRIMARY/UNIQUE key.',
+        '--    Dedup webhook memakai unique message_id: ganti menjadi (message_id, created_at)',
+        '--    hanya jika duplikat lintas bulan bisa diterima, atau jalankan dedup lewat aplikasi.',
+        'ALTER TABLE messages MODIFY created_at DATETIME NOT NULL;',
+        'ALTER TABLE messages DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at);',
+        'ALTER TABLE messages DROP INDEX message_id, ADD UNIQUE KEY uq_messages_message_id (message_id, created_at);',
+        '',
+        '-- 2) Partisi',
+        'ALTER TABLE messages PARTITION BY RANGE (TO_DAYS(created_at)) (',
+        ',\n'.join(partitions),
+        ');',
+        '',
+        '-- 3) Setiap bulan: tambah partisi baru dari pmax, dan (setelah `flask retention run`)',
+        '--    partisi yang sudah kosong bisa di-drop tanpa DELETE besar:',
+        "-- ALTER TABLE messages REORGANIZE PARTITION pmax INTO (",
+        "--     PARTITION pYYYYMM VALUES LESS THAN (TO_DAYS('YYYY-MM-01')), PARTITION pmax VALUES LESS THAN MAXVALUE);",
+        '-- ALTER TABLE messages DROP PARTITION pYYYYMM;',
+    ])
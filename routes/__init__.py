@@ -1,8 +1,22 @@
 """
 Routes package for WhatsApp Bot Kemenag
+Blueprint di-import secara lazy, supaya worker APP_ROLE=bot tidak
+memuat modul admin (Flask-Login, template) saat mengakses routes.webhook.
 """
 
-from routes.admin import admin_bp, login_required
-from routes.layanan_routes import layanan_bp
+__all__ = ['admin_bp', 'layanan_bp', 'login_required', 'webhook_bp']
 
-__all__ = ['admin_bp', 'layanan_bp', 'login_required']
\ No newline at end of file
+_LAZY = {
+    'admin_bp': ('routes.admin', 'admin_bp'),
+    'login_required': ('routes.admin', 'login_required'),
+    'layanan_bp': ('routes.layanan_routes', 'layanan_bp'),
+    'webhook_bp': ('routes.webhook', 'webhook_bp'),
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        module_name, attr = _LAZY[name]
+        return getattr(importlib.import_module(module_name), attr)
+    raise AttributeError(f"module 'routes' has no attribute {name!r}")
@@ -5,12 +5,15 @@ SECURE VERSION with Flask-Login
 UPDATED: Menghapus semua referensi ke service_type
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, Message, User, UserSession, AdminUser, Layanan, Kategori, get_wib_time
 from datetime import datetime, timedelta
 from sqlalchemy import func, desc
+from sqlalchemy.orm import selectinload
 from collections import defaultdict
+import exports
+import retention
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -74,7 +77,7 @@ def dashboard():
     
     # Statistics
     total_users = User.query.count()
-    total_messages = Message.query.count()
+    total_messages = retention.total_message_count()
     
     # Today's stats
     today_start = datetime.combine(today, datetime.min.time())
@@ -179,7 +182,7 @@ def user_detail(user_id):
     user = User.query.get_or_404(user_id)
     
     # Get user messages
-    messages = Message.query.filter_by(user_id=user_id).order_by(desc(Message.created_at)).limit(50).all()
+    messages = Message.query.options(selectinload(Message.body)).filter_by(user_id=user_id).order_by(desc(Message.created_at)).limit(50).all()
     
     # Get session info
     session_info = UserSession.query.filter_by(user_id=user_id).first()
@@ -206,7 +209,7 @@ def messages():
         direction = request.args.get('direction', '')
         search = request.args.get('search', '')
         
-        query = Message.query
+        query = Message.query.options(selectinload(Message.body))
         
         # Filter by direction
         if direction in ['incoming', 'outgoing']:
@@ -233,7 +236,7 @@ def messages():
                 'message_id': msg.message_id,
                 'direction': msg.direction,
                 'message_type': msg.message_type,
-                'content': msg.content[:100] + '...' if msg.content and len(msg.content) > 100 else msg.content,
+                'content': msg.text[:100] + '...' if msg.text and len(msg.text) > 100 else msg.text,
                 'layanan_nama': msg.layanan.judul if msg.layanan else None,
                 'layanan_id': msg.layanan_id,
                 'phone_number': msg.user.phone_number,
@@ -288,60 +291,39 @@ def analytics():
         days = min(max(days, 1), 365)
         
         start_date = get_wib_time() - timedelta(days=days)
+        first_day = start_date.date()
+        last_day = first_day + timedelta(days=days - 1)
+        
+        # Daily statistics: satu query grouped (rekap untuk hari yang sudah di-arsip)
+        message_counts = retention.daily_counts(first_day, last_day)
+        user_day = func.date(User.created_at)
+        new_users_by_day = {
+            retention.as_date(day): count
+            for day, count in db.session.query(user_day, func.count(User.id)).filter(
+                User.created_at >= datetime.combine(first_day, datetime.min.time())
+            ).group_by(user_day)
+        }
         
-        # Daily statistics
         daily_data = []
         for i in range(days):
-            date = start_date + timedelta(days=i)
-            next_date = date + timedelta(days=1)
-            
-            incoming = Message.query.filter(
-                Message.direction == 'incoming',
-                Message.created_at >= date,
-                Message.created_at < next_date
-            ).count()
-            
-            outgoing = Message.query.filter(
-                Message.direction == 'outgoing',
-                Message.created_at >= date,
-                Message.created_at < next_date
-            ).count()
-            
-            new_users = User.query.filter(
-                User.created_at >= date,
-                User.created_at < next_date
-            ).count()
-            
+            date = first_day + timedelta(days=i)
+            counts = message_counts.get(date, {})
             daily_data.append({
                 'date': date.strftime('%Y-%m-%d'),
-                'incoming': incoming,
-                'outgoing': outgoing,
-                'new_users': new_users
+                'incoming': counts.get('incoming', 0),
+                'outgoing': counts.get('outgoing', 0),
+                'new_users': new_users_by_day.get(date, 0)
             })
         
-        # UPDATED: Service statistics dengan JOIN ke tabel Layanan
-        service_stats_query = db.session.query(
-            Layanan.judul,
-            func.count(Message.id).label('count')
-        ).join(
-            Message, Message.layanan_id == Layanan.layanan_id
-        ).filter(
-            Message.created_at >= start_date,
-            Message.layanan_id.isnot(None)
-        ).group_by(
-            Layanan.judul
-        ).order_by(
-            desc('count')
-        ).all()
-        
-        # Convert to list of tuples
-        service_stats = [(row.judul, row.count) for row in service_stats_query]
+        # Service statistics: rekap + pesan live, dengan judul layanan
+        service_stats = retention.service_counts(first_day)
         
         return render_template(
             'admin/analytics.html',
             daily_data=daily_data,
             service_stats=service_stats,
-            days=days
+            days=days,
+            export_start=start_date.strftime('%Y-%m-%d')
         )
         
     except Exception as e:
@@ -349,6 +331,46 @@ def analytics():
         return redirect(url_for('admin.dashboard'))
 
 
+# ============================================
+# Export Routes (streaming)
+# ============================================
+
+def _stream_export(prefix, rows_fn, columns, fmt):
+    """Response streaming CSV/NDJSON; baris dibaca saat response dikirim"""
+    if fmt not in exports.FORMATS:
+        return jsonify({'error': f'Format tidak dikenal: {fmt}'}), 400
+    try:
+        export_filter = exports.ExportFilter.from_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def generate():
+        yield from exports.serialize(rows_fn(export_filter), columns, fmt)
+
+    return Response(
+        stream_with_context(generate()),
+        content_type=exports.FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{export_filter.filename(prefix, fmt)}"',
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+
+@admin_bp.route('/export/messages.<fmt>')
+@login_required
+def export_messages(fmt):
+    """Export pesan (filter: start, end, direction, layanan_id)"""
+    return _stream_export('messages', exports.message_rows, exports.MESSAGE_COLUMNS, fmt)
+
+
+@admin_bp.route('/export/analytics.<fmt>')
+@login_required
+def export_analytics(fmt):
+    """Export jumlah pesan per hari/arah/layanan"""
+    return _stream_export('analytics', exports.analytics_rows, exports.ANALYTICS_COLUMNS, fmt)
+
+
 # ============================================
 # API Routes
 # ============================================
@@ -361,7 +383,7 @@ def api_stats():
     
     stats = {
         'total_users': User.query.count(),
-        'total_messages': Message.query.count(),
+        'total_messages': retention.total_message_count(),
         'today_incoming': Message.query.filter(
             Message.direction == 'incoming',
             Message.created_at >= today_start
@@ -378,6 +400,31 @@ def api_stats():
     return jsonify(stats)
 
 
+@admin_bp.route('/api/health')
+@login_required
+def api_health():
+    """Health detail (dulu di /health): status DB dan jumlah katalog"""
+    try:
+        db.session.execute(db.text("SELECT 1"))
+        db_status = "connected"
+    except Exception as e:
+        db_status = f"disconnected: {str(e)}"
+
+    kategori_count = Kategori.query.filter_by(is_active=True).count()
+    layanan_count = Layanan.query.filter_by(is_active=True).count()
+
+    return jsonify({
+        "status": "healthy",
+        "service": "WhatsApp Bot Kemenag Madiun",
+        "timestamp": get_wib_time().isoformat(),
+        "database": db_status,
+        "database_type": "MySQL",
+        "timezone": "Asia/Jakarta (WIB)",
+        "categories": kategori_count,
+        "total_services": layanan_count,
+    })
+
+
 # ============================================
 # Settings Routes
 # ============================================
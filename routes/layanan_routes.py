@@ -4,15 +4,61 @@ WhatsApp Bot Kemenag Kabupaten Madiun
 FIXED: Perbaikan penggunaan layanan_id
 """
 
+import logging
+
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
-from flask_login import login_required
-from models import db, Kategori, Layanan, Persyaratan, SOP
+from flask_login import login_required, current_user
+from models import db, Kategori, Layanan, Persyaratan, SOP, CatalogRelease
 from datetime import datetime
-from sqlalchemy import desc
+from sqlalchemy import desc, delete, insert, update
+import catalog
+import import_layanan
+import layanan_documents
+
+logger = logging.getLogger(__name__)
 
 layanan_bp = Blueprint('layanan', __name__, url_prefix='/admin/layanan')
 
 
+def _form_items(field):
+    """Teks non-kosong dari form list (persyaratan[] / sop[]) sesuai urutan"""
+    return [text.strip() for text in request.form.getlist(field) if text.strip()]
+
+
+def _sync_items(model, layanan_id, texts):
+    """
+    Samakan baris Persyaratan/SOP dengan `texts` tanpa hapus-semua + insert ulang
+    (rencana write dari import_layanan.diff_items), dikirim sebagai bulk statement.
+    Return jumlah write.
+    """
+    existing = db.session.execute(
+        db.select(model.id, model.teks, model.urutan, model.is_active)
+        .where(model.layanan_id == layanan_id)
+        .order_by(model.urutan, model.id)
+    ).all()
+    updates, inserts, delete_ids = import_layanan.diff_items(existing, layanan_id, texts)
+
+    if updates:
+        db.session.execute(update(model), updates)
+    if inserts:
+        db.session.execute(insert(model), inserts)
+    if delete_ids:
+        db.session.execute(delete(model).where(model.id.in_(delete_ids)))
+
+    return {'insert': len(inserts), 'update': len(updates), 'delete': len(delete_ids)}
+
+
+def _format_writes(writes):
+    return f"{writes['insert']} baru, {writes['update']} diubah, {writes['delete']} dihapus"
+
+
+def _draft_notice():
+    """Ingatkan admin: perubahan baru tampil di bot setelah di-publish"""
+    _, release_id = catalog.read_pointer()
+    if release_id is not None:
+        flash('Perubahan disimpan sebagai draft. Publish di menu Rilis Katalog agar tampil di bot.', 'info')
+
+
 # ============================================
 # KATEGORI CRUD
 # ============================================
@@ -53,6 +99,7 @@ def kategori_create():
             
             db.session.add(kategori)
             db.session.commit()
+            _draft_notice()
             
             flash(f'Kategori "{nama}" berhasil ditambahkan!', 'success')
             return redirect(url_for('layanan.kategori_list'))
@@ -78,6 +125,7 @@ def kategori_edit(id):
             kategori.is_active = request.form.get('is_active') == 'on'
             
             db.session.commit()
+            _draft_notice()
             
             flash(f'Kategori "{kategori.nama}" berhasil diupdate!', 'success')
             return redirect(url_for('layanan.kategori_list'))
@@ -105,6 +153,7 @@ def kategori_delete(id):
         nama = kategori.nama
         db.session.delete(kategori)
         db.session.commit()
+        _draft_notice()
         
         flash(f'Kategori "{nama}" berhasil dihapus!', 'success')
     except Exception as e:
@@ -159,33 +208,8 @@ def layanan_create():
                 flash('Kategori tidak ditemukan!', 'danger')
                 return redirect(url_for('layanan.layanan_create'))
             
-            # Generate layanan_id otomatis
-            kode_kategori = kategori.kode
-            
-            # Cari layanan terakhir dengan prefix yang sama
-            last_layanan = Layanan.query.filter(
-                Layanan.layanan_id.like(f'{kode_kategori}_%')
-            ).order_by(
-                Layanan.layanan_id.desc()
-            ).first()
-            
-            # Generate nomor urut baru
-            if last_layanan:
-                try:
-                    last_number = int(last_layanan.layanan_id.split('_')[-1])
-                    new_number = last_number + 1
-                except (ValueError, IndexError):
-                    new_number = 1
-            else:
-                new_number = 1
-            
-            # Buat layanan_id baru
-            layanan_id = f"{kode_kategori}_{new_number}"
-            
-            # Double check
-            while Layanan.query.filter_by(layanan_id=layanan_id).first():
-                new_number += 1
-                layanan_id = f"{kode_kategori}_{new_number}"
+            # Generate layanan_id otomatis: <kode>_<n> dari sequence per kategori
+            layanan_id = catalog.allocate_layanan_id(kategori)
             
             # Ambil data form
             judul = request.form.get('judul')
@@ -233,7 +257,9 @@ def layanan_create():
                     )
                     db.session.add(sop)
             
+            layanan_documents.rebuild(layanan.layanan_id)
             db.session.commit()
+            _draft_notice()
             
             flash(f'Layanan "{judul}" berhasil ditambahkan dengan ID: {layanan_id}!', 'success')
             return redirect(url_for('layanan.layanan_list'))
@@ -278,36 +304,23 @@ def layanan_edit(layanan_id):
             layanan.urutan = request.form.get('urutan', 0, type=int)
             layanan.is_active = request.form.get('is_active') == 'on'
             
-            # Delete old persyaratan & sop
-            # FIXED: Gunakan variabel layanan
-            Persyaratan.query.filter_by(layanan_id=layanan.layanan_id).delete()
-            SOP.query.filter_by(layanan_id=layanan.layanan_id).delete()
-            
-            # Add new persyaratan
-            persyaratan_list = request.form.getlist('persyaratan[]')
-            for idx, syarat in enumerate(persyaratan_list, 1):
-                if syarat.strip():
-                    persyaratan = Persyaratan(
-                        layanan_id=layanan.layanan_id,  # FIXED
-                        teks=syarat.strip(),
-                        urutan=idx
-                    )
-                    db.session.add(persyaratan)
-            
-            # Add new SOP
-            sop_list = request.form.getlist('sop[]')
-            for idx, sop_text in enumerate(sop_list, 1):
-                if sop_text.strip():
-                    sop = SOP(
-                        layanan_id=layanan.layanan_id,  # FIXED
-                        teks=sop_text.strip(),
-                        urutan=idx
-                    )
-                    db.session.add(sop)
+            # Diff persyaratan & SOP (bukan delete-all + insert ulang)
+            persyaratan_writes = _sync_items(Persyaratan, layanan.layanan_id, _form_items('persyaratan[]'))
+            sop_writes = _sync_items(SOP, layanan.layanan_id, _form_items('sop[]'))
+            layanan_documents.rebuild(layanan.layanan_id)
             
             db.session.commit()
+            _draft_notice()
             
-            flash(f'Layanan "{layanan.judul}" berhasil diupdate!', 'success')
+            logger.info(
+                "✏️ Layanan %s diupdate | persyaratan %s | SOP %s",
+                layanan.layanan_id, _format_writes(persyaratan_writes), _format_writes(sop_writes),
+            )
+            flash(
+                f'Layanan "{layanan.judul}" berhasil diupdate! '
+                f'(persyaratan: {_format_writes(persyaratan_writes)}; SOP: {_format_writes(sop_writes)})',
+                'success'
+            )
             return redirect(url_for('layanan.layanan_detail', layanan_id=layanan.layanan_id))  # FIXED
             
         except Exception as e:
@@ -337,6 +350,7 @@ def layanan_delete(layanan_id):
         # Cascade delete akan hapus persyaratan & sop otomatis
         db.session.delete(layanan)
         db.session.commit()
+        _draft_notice()
         
         flash(f'Layanan "{judul}" berhasil dihapus!', 'success')
     except Exception as e:
@@ -354,6 +368,7 @@ def layanan_toggle(layanan_id):
         layanan = Layanan.query.get_or_404(layanan_id)
         layanan.is_active = not layanan.is_active
         db.session.commit()
+        _draft_notice()
         
         status = "diaktifkan" if layanan.is_active else "dinonaktifkan"
         flash(f'Layanan "{layanan.judul}" berhasil {status}!', 'success')
@@ -364,6 +379,59 @@ def layanan_toggle(layanan_id):
     return redirect(url_for('layanan.layanan_list'))
 
 
+# ============================================
+# RILIS KATALOG (draft -> publish)
+# ============================================
+
+@layanan_bp.route('/releases')
+@login_required
+def release_list():
+    """Daftar rilis katalog dan status draft"""
+    draft_version, active_id = catalog.read_pointer()
+    releases = CatalogRelease.query.order_by(CatalogRelease.id.desc()).all()
+    active = next((r for r in releases if r.id == active_id), None)
+    has_draft_changes = active is None or active.catalog_version != draft_version
+    return render_template(
+        'layanan/release_list.html',
+        releases=releases,
+        active_id=active_id,
+        draft_version=draft_version,
+        has_draft_changes=has_draft_changes,
+    )
+
+
+@layanan_bp.route('/releases/publish', methods=['POST'])
+@login_required
+def release_publish():
+    """Publish draft katalog ke bot (atomic)"""
+    try:
+        note = request.form.get('note', '').strip() or None
+        release = catalog.publish(note=note, published_by=current_user.username)
+        if release is None:
+            flash('Tidak ada perubahan sejak rilis aktif.', 'info')
+        else:
+            flash(f'Rilis #{release.id} berhasil dipublish ({release.layanan_count} layanan)!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('layanan.release_list'))
+
+
+@layanan_bp.route('/releases/<int:release_id>/activate', methods=['POST'])
+@login_required
+def release_activate(release_id):
+    """Aktifkan rilis lama (rollback)"""
+    try:
+        release = catalog.activate_release(release_id)
+        flash(f'Rilis #{release.id} sekarang aktif di bot.', 'success')
+    except LookupError as e:
+        flash(str(e), 'warning')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('layanan.release_list'))
+
+
 # ============================================
 # API Endpoints for AJAX
 # ============================================
@@ -0,0 +1,120 @@
+"""
+Routes bot WhatsApp: webhook Meta, health probe, dan metrics
+Hanya blueprint ini yang diregistrasi untuk APP_ROLE=bot.
+"""
+
+import json
+import logging
+import time
+
+from flask import Blueprint, request, jsonify
+
+import bot
+import metrics
+import webhook_capture
+import webhook_journal
+
+logger = logging.getLogger(__name__)
+
+webhook_bp = Blueprint('webhook', __name__)
+
+
+@webhook_bp.route("/webhook", methods=["GET"])
+def webhook_verify():
+    """Verify webhook"""
+    mode = request.args.get("hub.mode")
+    token = request.args.get("hub.verify_token")
+    challenge = request.args.get("hub.challenge")
+
+    logger.info("🔍 Verification request - Token: %s", token)
+
+    if mode == "subscribe" and token == bot.VERIFY_TOKEN:
+        logger.info("✅ Webhook verified!")
+        return challenge, 200
+    else:
+        logger.warning("❌ Verification failed!")
+        return "Forbidden", 403
+
+
+@webhook_bp.route("/webhook", methods=["POST"])
+def webhook_handler():
+    """Handle incoming webhooks"""
+    started = time.perf_counter()
+    response, status = _webhook_handler()
+    metrics.WEBHOOK_LATENCY.labels(status=status).observe(time.perf_counter() - started)
+    return response, status
+
+
+def _webhook_handler():
+    """Isi webhook_handler; return (response, status)"""
+    try:
+        body = request.get_json()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📥 Webhook: %s", json.dumps(body, indent=2))
+
+        if body.get("object") != "whatsapp_business_account":
+            return jsonify({"status": "ignored"}), 200
+
+        webhook_capture.capture.record(body)
+
+        if webhook_journal.journal.enabled:
+            # Durable di disk lalu langsung ack; diproses oleh consumer journal
+            webhook_journal.journal.append(request.get_data())
+            return jsonify({"status": "queued"}), 200
+
+        partitions = bot.partition_messages(body)
+        if partitions:
+            bot.process_partitions(partitions)
+
+        return jsonify({"status": "success"}), 200
+
+    except Exception as e:
+        logger.error("❌ Webhook error: %s", e)
+        import traceback
+        traceback.print_exc()
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+# ============================================
+# Health & Metrics
+# ============================================
+
+@webhook_bp.route("/health/live", methods=["GET"])
+def health_live():
+    """Liveness: proses hidup dan bisa melayani request (tanpa I/O)"""
+    return jsonify({"status": "alive"}), 200
+
+
+@webhook_bp.route("/health/ready", methods=["GET"])
+@webhook_bp.route("/health", methods=["GET"])
+def health_ready():
+    """Readiness: hasil check di-cache, detail count ada di /api/health (admin)"""
+    ready, checks = bot.readiness.run()
+    return jsonify({
+        "status": "ready" if ready else "not_ready",
+        "service": "WhatsApp Bot Kemenag Madiun",
+        "checks": checks,
+    }), 200 if ready else 503
+
+
+@webhook_bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus text exposition (gabungan semua worker)"""
+    return metrics.REGISTRY.generate_latest(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+
+@webhook_bp.route("/send-test", methods=["POST"])
+def send_test_message():
+    """Test endpoint"""
+    data = request.get_json()
+    to = data.get("to")
+
+    if not to:
+        return jsonify({"error": "Phone number required"}), 400
+
+    result = bot.send_whatsapp_message(to, bot.get_menu_utama())
+
+    if result:
+        return jsonify({"status": "success", "result": result}), 200
+    else:
+        return jsonify({"status": "error"}), 500
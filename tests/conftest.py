@@ -0,0 +1,110 @@
+"""
+Fixture bersama untuk test: app (role all) di atas SQLite sementara,
+Graph API di-stub, tanpa sleep antar pesan.
+
+    python -m pytest -q
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix='wa-test-')
+
+# Env dibaca saat modul app di-import, jadi harus di-set sebelum import di bawah
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(TMP_DIR, 'test.db')}",
+    'FLASK_ENV': 'development',
+    'APP_ROLE': 'all',
+    'WHATSAPP_TOKEN': 'test-token',
+    'PHONE_NUMBER_ID': '123456789',
+    'CATALOG_SNAPSHOT_PATH': os.path.join(TMP_DIR, 'catalog_snapshot.json'),
+    'CATALOG_CHECK_INTERVAL': '0',
+    'GRAPH_SPOOL_DIR': os.path.join(TMP_DIR, 'spool'),
+    'MESSAGE_ARCHIVE_DIR': os.path.join(TMP_DIR, 'archive'),
+    'WEBHOOK_JOURNAL_DIR': '',
+    'WEBHOOK_CAPTURE_DIR': '',
+    'NAV_COALESCE_WINDOW': '0',
+    'FLOOD_RATE': '0',
+})
+sys.path.insert(0, ROOT)
+
+import pytest  # noqa: E402
+
+import app as app_module  # noqa: E402
+import bot  # noqa: E402
+import catalog  # noqa: E402
+from models import db, Kategori, Layanan, Persyaratan, SOP  # noqa: E402
+
+
+class GraphApiRecorder:
+    """Pengganti requests.post: simpan payload, balas seperti Graph API"""
+
+    def __init__(self):
+        self.payloads = []
+
+    def post(self, url, headers=None, json=None, timeout=None, **kwargs):
+        self.payloads.append(json)
+        return _Response(len(self.payloads))
+
+    def bodies(self):
+        """Teks body setiap pesan terkirim (text / interactive)"""
+        bodies = []
+        for payload in self.payloads:
+            if payload.get('type') == 'text':
+                bodies.append(payload['text']['body'])
+            else:
+                bodies.append(payload.get('interactive', {}).get('body', {}).get('text'))
+        return bodies
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, number: int):
+        self.number = number
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return {'messages': [{'id': f'wamid.TEST{self.number:08d}'}]}
+
+
+@pytest.fixture
+def app():
+    """App context dengan database kosong"""
+    flask_app = app_module.app
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    recorder = GraphApiRecorder()
+    monkeypatch.setattr(bot.requests, 'post', recorder.post)
+    monkeypatch.setattr(bot.time, 'sleep', lambda seconds: None)
+    return recorder
+
+
+@pytest.fixture
+def katalog(app):
+    """Satu kategori 'nikah' dengan satu layanan lengkap; cache katalog dimuat ulang"""
+    kategori = Kategori(kode='nikah', nama='Pernikahan', icon='💍', urutan=1)
+    db.session.add(kategori)
+    db.session.flush()
+    db.session.add(Layanan(
+        layanan_id='nikah_1', kategori_id=kategori.id, judul='Pendaftaran Nikah',
+        jangka_waktu='1 hari kerja', biaya='Tidak dipungut biaya', urutan=1,
+    ))
+    for urutan, teks in enumerate(['Fotokopi KTP calon pengantin', 'Surat pengantar kelurahan'], 1):
+        db.session.add(Persyaratan(layanan_id='nikah_1', teks=teks, urutan=urutan))
+    for urutan, teks in enumerate(['Petugas memeriksa berkas', 'Jadwal akad ditetapkan'], 1):
+        db.session.add(SOP(layanan_id='nikah_1', teks=teks, urutan=urutan))
+    db.session.commit()
+    catalog.cache.reload()
+    return 'nikah_1'
@@ -0,0 +1,65 @@
+import threading
+import time
+
+import bot
+import coalescing
+from coalescing import NavigationCoalescer
+
+
+def test_disabled_never_supersedes():
+    coalescer = NavigationCoalescer(window=0)
+
+    assert coalescer.arrive('628111') is None
+    assert coalescer.superseded('628111', None) is False
+
+
+def test_newer_tap_supersedes_older_reply():
+    coalescer = NavigationCoalescer(window=0.05)
+    first = coalescer.arrive('628111')
+    second = coalescer.arrive('628111')
+
+    assert coalescer.superseded('628111', first, wait=False) is True
+    assert coalescer.superseded('628111', second, wait=False) is False
+
+
+def test_other_sender_does_not_supersede():
+    coalescer = NavigationCoalescer(window=0.05)
+    token = coalescer.arrive('628111')
+    coalescer.arrive('628222')
+
+    assert coalescer.superseded('628111', token) is False
+
+
+def test_waiting_reply_wakes_up_when_superseded():
+    coalescer = NavigationCoalescer(window=5.0)
+    token = coalescer.arrive('628111')
+    threading.Timer(0.05, coalescer.arrive, args=('628111',)).start()
+
+    started = time.monotonic()
+    assert coalescer.superseded('628111', token) is True
+    assert time.monotonic() - started < 2.0
+
+
+def test_evicted_conversation_is_not_superseded():
+    coalescer = NavigationCoalescer(window=0.05, max_conversations=1)
+    token = coalescer.arrive('628111')
+    coalescer.arrive('628222')
+
+    assert len(coalescer) == 1
+    assert coalescer.superseded('628111', token, wait=False) is False
+
+
+def test_superseded_navigation_in_batch_is_not_sent(app, graph, katalog, monkeypatch):
+    monkeypatch.setattr(coalescing.coalescer, 'window', 0.05)
+    taps = [
+        {'from': '6281234567890', 'id': f'wamid.IN{n}', 'type': 'interactive',
+         'interactive': {'type': 'list_reply', 'list_reply': {'id': reply_id}}}
+        for n, reply_id in enumerate(['kat_nikah', 'btn_menu'], 1)
+    ]
+
+    bot.process_partition('6281234567890', taps)
+
+    # Daftar layanan (tap pertama) dilewati; hanya menu + pesan hubungi admin
+    menu, admin = bot.get_menu_utama(), bot.get_button_wa_lain()
+    assert [payload['type'] for payload in graph.payloads] == [menu['type'], admin['type']]
+    assert graph.payloads[0]['interactive'] == menu['interactive']
@@ -0,0 +1,79 @@
+from flood_control import ALLOW, DROP, NOTIFY, FloodControl
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def limiter(clock, **kwargs):
+    options = dict(rate=1.0, burst=3, notice_interval=60.0, clock=clock)
+    options.update(kwargs)
+    return FloodControl(**options)
+
+
+def test_burst_then_notify_once_then_drop():
+    flood = limiter(Clock())
+
+    decisions = [flood.check('628111') for _ in range(6)]
+
+    assert decisions == [ALLOW, ALLOW, ALLOW, NOTIFY, DROP, DROP]
+
+
+def test_tokens_refill_at_rate_up_to_burst():
+    clock = Clock()
+    flood = limiter(clock)
+    for _ in range(3):
+        flood.check('628111')
+    assert flood.check('628111') == NOTIFY
+
+    clock.now += 2.0
+    assert [flood.check('628111') for _ in range(3)] == [ALLOW, ALLOW, DROP]
+
+    # Idle lama: bucket penuh lagi tapi tidak lebih dari burst (notice interval juga lewat)
+    clock.now += 1000.0
+    assert [flood.check('628111') for _ in range(4)] == [ALLOW, ALLOW, ALLOW, NOTIFY]
+
+
+def test_notice_repeats_after_interval():
+    clock = Clock()
+    flood = limiter(clock, rate=0.001, notice_interval=30.0)
+    for _ in range(3):
+        flood.check('628111')
+    assert flood.check('628111') == NOTIFY
+    assert flood.check('628111') == DROP
+
+    clock.now += 30.0
+    assert flood.check('628111') == NOTIFY
+
+
+def test_senders_have_separate_buckets():
+    flood = limiter(Clock(), burst=1)
+
+    assert flood.check('628111') == ALLOW
+    assert flood.check('628111') == NOTIFY
+    assert flood.check('628222') == ALLOW
+
+
+def test_idle_and_excess_buckets_are_evicted():
+    clock = Clock()
+    flood = limiter(clock, max_senders=2, idle_seconds=60.0)
+    flood.check('628111')
+    flood.check('628222')
+    flood.check('628333')
+    # Batas map: yang paling lama tidak dipakai dibuang
+    assert len(flood) == 2
+
+    clock.now += 61.0
+    flood.check('628444')
+    assert len(flood) == 1
+
+
+def test_disabled_allows_everything():
+    flood = limiter(Clock(), rate=0)
+
+    assert all(flood.check('628111') == ALLOW for _ in range(20))
+    assert len(flood) == 0
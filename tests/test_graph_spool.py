@@ -0,0 +1,97 @@
+import os
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import bot
+from circuit_breaker import CircuitOpenError, Spool
+
+
+def spool_with(tmp_path, names, **kwargs):
+    spool = Spool(str(tmp_path), **kwargs)
+    for name in names:
+        spool.append({'to': name, 'payload': {'type': 'text'}})
+    return spool
+
+
+def test_replay_sends_in_order_and_compacts(tmp_path):
+    spool = spool_with(tmp_path, ['a', 'b', 'c'])
+    sent = []
+
+    assert spool.replay(lambda record: sent.append(record['to'])) == 3
+
+    assert sent == ['a', 'b', 'c']
+    assert os.path.getsize(spool.path) == 0
+    assert spool._read_state() == (0, 0)
+    assert spool.pending_bytes() == 0
+
+
+def test_retry_later_resumes_without_resending(tmp_path):
+    spool = spool_with(tmp_path, ['a', 'b', 'c'])
+    sent = []
+
+    def send(record):
+        if record['to'] == 'b':
+            raise CircuitOpenError('open')
+        sent.append(record['to'])
+
+    with pytest.raises(CircuitOpenError):
+        spool.replay(send)
+    assert sent == ['a']
+    # RetryLater tidak dihitung sebagai percobaan
+    assert spool._read_state()[1] == 0
+
+    assert spool.replay(lambda record: sent.append(record['to'])) == 2
+    assert sent == ['a', 'b', 'c']
+
+
+def test_failing_record_abandoned_after_max_attempts(tmp_path):
+    spool = spool_with(tmp_path, ['a', 'bad', 'c'], max_attempts=2)
+    sent = []
+
+    def send(record):
+        if record['to'] == 'bad':
+            raise ValueError('400 from Graph API')
+        sent.append(record['to'])
+
+    with pytest.raises(ValueError):
+        spool.replay(send)
+    assert spool._read_state()[1] == 1
+
+    assert spool.replay(send) == 2
+    assert sent == ['a', 'c']
+    assert spool.pending_bytes() == 0
+
+
+def test_expired_records_are_dropped(tmp_path):
+    spool = spool_with(tmp_path, ['a'], max_age=-1)
+    sent = []
+
+    assert spool.replay(sent.append) == 1
+    assert sent == []
+
+
+def test_partial_line_is_not_replayed_or_compacted(tmp_path):
+    spool = spool_with(tmp_path, ['a'])
+    with open(spool.path, 'a', encoding='utf-8') as f:
+        f.write('{"to": "b", "payl')
+    sent = []
+
+    assert spool.replay(lambda record: sent.append(record['to'])) == 1
+
+    assert sent == ['a']
+    assert spool.pending_bytes() == len('{"to": "b", "payl')
+
+
+def test_replayed_message_is_not_resent_when_saving_fails(app, graph, tmp_path, monkeypatch):
+    spool = spool_with(tmp_path, ['6281234567890'], max_attempts=3)
+
+    def broken_save(*args, **kwargs):
+        raise OperationalError('INSERT INTO messages', {}, Exception('database down'))
+
+    monkeypatch.setattr(bot, '_save_outgoing', broken_save)
+
+    assert spool.replay(bot._spool_replayer._send) == 1
+    assert spool.replay(bot._spool_replayer._send) == 0
+    assert len(graph.payloads) == 1
+    assert spool.pending_bytes() == 0
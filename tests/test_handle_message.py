@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import bot
+import metrics
+from db_instrumentation import assert_query_budget
+from models import Message
+
+USER = '6281234567890'
+
+# Pilih layanan untuk user yang sudah ada: 3 pesan (masuk, detail, tombol) x
+# (user + insert pesan), body detail ke message_bodies, update sesi, dan 2 cek
+# versi katalog (CATALOG_CHECK_INTERVAL=0 di test). Detail layanan dari cache
+# katalog di memori, jadi tidak ada query ke tabel layanan/persyaratan/SOP.
+LAYANAN_QUERY_BUDGET = 21
+
+
+def interactive(message_id: str, reply_id: str) -> dict:
+    return {
+        'from': USER,
+        'id': message_id,
+        'type': 'interactive',
+        'interactive': {'type': 'list_reply', 'list_reply': {'id': reply_id}},
+    }
+
+
+def branch_count(branch: str) -> int:
+    return metrics.HANDLE_MESSAGE_DURATION.snapshot().get(branch, {}).get('count', 0)
+
+
+def test_layanan_branch_within_query_budget(app, graph, katalog):
+    bot.handle_message(interactive('wamid.IN1', 'kat_nikah'), USER)
+    before = branch_count('layanan')
+
+    with assert_query_budget(LAYANAN_QUERY_BUDGET, label='pilih layanan'):
+        bot.handle_message(interactive('wamid.IN2', katalog), USER)
+
+    assert branch_count('layanan') == before + 1
+
+
+def test_layanan_detail_sent_and_saved_with_layanan_id(app, graph, katalog):
+    bot.handle_message(interactive('wamid.IN1', katalog), USER)
+
+    detail, buttons = graph.bodies()
+    assert 'Pendaftaran Nikah' in detail
+    assert 'Fotokopi KTP calon pengantin' in detail
+    assert buttons
+
+    outgoing = Message.query.filter_by(direction='outgoing').order_by(Message.id).all()
+    assert [m.layanan_id for m in outgoing] == [katalog, None]
+    assert Message.query.filter_by(direction='incoming').one().layanan_id is None
+
+
+def journal_payload(message: dict) -> bytes:
+    return json.dumps({
+        'object': 'whatsapp_business_account',
+        'entry': [{'changes': [{'value': {'messages': [message]}}]}],
+    }).encode('utf-8')
+
+
+def database_down(*args, **kwargs):
+    raise OperationalError('INSERT INTO messages', {}, Exception('database down'))
+
+
+def test_journal_retries_message_when_database_fails(app, graph, katalog, monkeypatch):
+    payload = journal_payload(interactive('wamid.IN1', katalog))
+    resolve = bot.message_bodies.resolve
+    monkeypatch.setattr(bot.message_bodies, 'resolve', database_down)
+
+    with pytest.raises(OperationalError):
+        bot.process_journal_records([payload])
+    assert graph.payloads == []
+
+    # Retry batch yang sama setelah DB pulih: diproses sekali, lalu dilewati dedup
+    monkeypatch.setattr(bot.message_bodies, 'resolve', resolve)
+    bot.process_journal_records([payload])
+    bot.process_journal_records([payload])
+    assert len(graph.payloads) == 2
+    assert Message.query.filter_by(message_id='wamid.IN1').count() == 1
+
+
+def test_webhook_path_still_logs_database_errors(app, graph, katalog, monkeypatch):
+    monkeypatch.setattr(bot, 'get_or_create_user', database_down)
+
+    bot.process_partitions(bot.partition_messages(json.loads(journal_payload(interactive('wamid.IN1', katalog)))))
+
+    assert graph.payloads == []
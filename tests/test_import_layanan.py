@@ -0,0 +1,86 @@
+import json
+from collections import namedtuple
+
+import pytest
+
+from import_layanan import diff_items, import_layanan_from_json
+from models import Kategori, Layanan, Persyaratan
+
+Row = namedtuple('Row', 'id teks urutan is_active')
+
+
+def catalog_file(tmp_path, persyaratan=('KTP', 'KK', 'Pas foto'), judul='Pendaftaran Nikah'):
+    path = tmp_path / 'layanan.json'
+    path.write_text(json.dumps({'kategori': [{
+        'kode': 'nikah', 'nama': 'Pernikahan', 'icon': '💍', 'urutan': 1,
+        'layanan': [{
+            'layanan_id': 'nikah_1', 'judul': judul, 'jangka_waktu': '1 hari',
+            'biaya': 'Gratis', 'persyaratan': list(persyaratan), 'sop': ['Verifikasi berkas'],
+        }],
+    }]}), encoding='utf-8')
+    return str(path)
+
+
+def test_dry_run_reports_plan_without_saving(app, tmp_path):
+    report = import_layanan_from_json(catalog_file(tmp_path), dry_run=True)
+
+    assert report.ok
+    assert report.kategori['insert'] == 1
+    assert report.layanan['insert'] == 1
+    assert report.persyaratan['insert'] == 3
+    assert Kategori.query.count() == 0
+    assert Layanan.query.count() == 0
+
+
+def test_reimport_of_same_file_writes_nothing(app, tmp_path):
+    path = catalog_file(tmp_path)
+    assert import_layanan_from_json(path).writes == 6
+
+    report = import_layanan_from_json(path)
+
+    assert report.ok
+    assert report.writes == 0
+    assert report.layanan['unchanged'] == 1
+
+
+def test_changed_items_keep_existing_rows(app, tmp_path):
+    import_layanan_from_json(catalog_file(tmp_path))
+    ids = {p.teks: p.id for p in Persyaratan.query}
+
+    report = import_layanan_from_json(catalog_file(tmp_path, persyaratan=('KTP', 'Pas foto')))
+
+    assert report.persyaratan == {'insert': 0, 'update': 1, 'delete': 1}
+    rows = Persyaratan.query.order_by(Persyaratan.urutan).all()
+    assert [(p.teks, p.urutan) for p in rows] == [('KTP', 1), ('Pas foto', 2)]
+    assert [p.id for p in rows] == [ids['KTP'], ids['Pas foto']]
+
+
+def test_invalid_file_reports_every_error(app, tmp_path):
+    path = tmp_path / 'layanan.ndjson'
+    path.write_text('\n'.join(json.dumps(record) for record in [
+        {'kategori': 'nikah', 'layanan_id': 'nikah_1', 'judul': ''},
+        {'kategori': 'nikah', 'layanan_id': 'nikah_1', 'judul': 'Duplikat'},
+    ]), encoding='utf-8')
+
+    report = import_layanan_from_json(str(path))
+
+    assert not report.ok
+    assert len(report.errors) == 2
+    assert Layanan.query.count() == 0
+
+
+@pytest.mark.parametrize('texts, expected', [
+    # Sama persis: tidak ada write
+    (['A', 'B'], ([], [], [])),
+    # Urutan ditukar: baris lama dipakai, hanya urutan yang berubah
+    (['B', 'A'], ([{'id': 2, 'teks': 'B', 'urutan': 1, 'is_active': True},
+                   {'id': 1, 'teks': 'A', 'urutan': 2, 'is_active': True}], [], [])),
+    # Teks berubah: baris lama dipakai ulang, sisanya insert
+    (['A', 'C', 'D'], ([{'id': 2, 'teks': 'C', 'urutan': 2, 'is_active': True}],
+                       [{'layanan_id': 'x', 'teks': 'D', 'urutan': 3, 'is_active': True}], [])),
+    # Item dihapus
+    (['B'], ([{'id': 2, 'teks': 'B', 'urutan': 1, 'is_active': True}], [], [1])),
+])
+def test_diff_items(texts, expected):
+    existing = [Row(1, 'A', 1, True), Row(2, 'B', 2, True)]
+    assert diff_items(existing, 'x', texts) == expected
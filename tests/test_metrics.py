@@ -0,0 +1,31 @@
+import json
+import os
+
+import pytest
+
+from metrics import Registry
+
+
+def write_snapshot(directory, pid, metrics):
+    with open(os.path.join(directory, f'metrics-{pid}.json'), 'w') as f:
+        json.dump({'pid': pid, 'written_at': 0, 'metrics': metrics}, f)
+
+
+def test_state_gauge_takes_worst_worker_not_sum(tmp_path):
+    registry = Registry(multiproc_dir=str(tmp_path))
+    state = registry.gauge('circuit_state', 'state', aggregate='max')
+    queue = registry.gauge('queue_depth', 'depth')
+    state.set(1)
+    queue.set(3)
+    # Worker lain (pid masih hidup): half-open juga, antrian 4
+    write_snapshot(tmp_path, os.getppid(), {'circuit_state': {'': 1.0}, 'queue_depth': {'': 4.0}})
+
+    output = registry.generate_latest()
+
+    assert 'circuit_state 1\n' in output
+    assert 'queue_depth 7\n' in output
+
+
+def test_unknown_aggregate_is_rejected():
+    with pytest.raises(ValueError):
+        Registry().gauge('bad', 'bad', aggregate='avg')
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from webhook_capture import PSEUDONYM_PREFIX, Scrubber, WebhookCapture
+
+scrubber = Scrubber(b'test-salt')
+
+
+def webhook_body(text='halo'):
+    return {
+        'object': 'whatsapp_business_account',
+        'entry': [{'changes': [{'value': {
+            'contacts': [{'wa_id': '6281234567890', 'profile': {'name': 'Budi'}}],
+            'messages': [
+                {'from': '6281234567890', 'id': 'wamid.REAL1', 'timestamp': '1700000000',
+                 'type': 'text', 'text': {'body': text}},
+                {'from': '6281234567890', 'id': 'wamid.REAL2', 'type': 'image',
+                 'image': {'id': 'media-1', 'caption': 'foto KTP'}},
+            ],
+            'statuses': [{'recipient_id': '6281234567890', 'id': 'wamid.OUT1', 'status': 'read'}],
+        }}]}],
+    }
+
+
+def test_phone_pseudonym_is_stable_and_fits_users_table():
+    pseudonym = scrubber.phone('6281234567890')
+
+    assert pseudonym == scrubber.phone('+62 812-3456-7890') == scrubber.phone('081234567890')
+    assert pseudonym.startswith(PSEUDONYM_PREFIX)
+    assert pseudonym.isdigit() and len(pseudonym) <= 20
+    assert Scrubber(b'other-salt').phone('6281234567890') != pseudonym
+
+
+def test_phone_pseudonyms_do_not_collide():
+    numbers = [f'628{n:010d}' for n in range(100_000)]
+    assert len({scrubber.phone(number) for number in numbers}) == len(numbers)
+
+
+@pytest.mark.parametrize('text', [
+    'Saya daftar tanggal 2025-01-01 jam 09:30',
+    'NIK 3577011234560001, NO KK 3577010101010001',
+    'nomor antrian 12345678',
+])
+def test_text_without_phone_numbers_is_untouched(text):
+    assert scrubber.text(text) == text
+
+
+@pytest.mark.parametrize('number', ['081234567890', '6281234567890', '+62 812 3456 7890', '0812-3456-7890'])
+def test_phone_numbers_in_text_are_replaced(number):
+    scrubbed = scrubber.text(f'hubungi {number} ya')
+
+    assert scrubbed == f'hubungi {scrubber.phone(number)} ya'
+    assert '3456' not in scrubbed
+
+
+def test_body_drops_personal_fields():
+    scrubbed = scrubber.body(webhook_body('wa saya 081234567890'))
+    value = scrubbed['entry'][0]['changes'][0]['value']
+    pseudonym = scrubber.phone('6281234567890')
+
+    assert value['contacts'] == [{'wa_id': pseudonym}]
+    text, image = value['messages']
+    assert text['from'] == pseudonym
+    assert text['id'] == scrubber.message_id('wamid.REAL1')
+    assert text['text'] == {'body': f'wa saya {pseudonym}'}
+    assert 'image' not in image
+    assert value['statuses'][0]['recipient_id'] == pseudonym
+    assert '1234567890' not in json.dumps(scrubbed)
+
+
+def test_capture_stops_at_max_bytes(tmp_path):
+    capture = WebhookCapture(str(tmp_path), scrubber, max_bytes=1)
+
+    capture.record(webhook_body(), received_at=1.0)
+    capture.record(webhook_body(), received_at=2.0)
+
+    (path,) = tmp_path.iterdir()
+    lines = path.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line)['t'] for line in lines] == [1.0]
@@ -0,0 +1,200 @@
+import contextlib
+import os
+import threading
+import time
+
+import pytest
+
+import webhook_journal
+from webhook_journal import (
+    WebhookJournal,
+    encode_record,
+    iter_records,
+    iter_segment,
+    read_checkpoint,
+    write_checkpoint,
+)
+
+
+class _App:
+    """Cukup untuk WebhookJournal.init_app & _process"""
+
+    def app_context(self):
+        return contextlib.nullcontext()
+
+    def before_request(self, function):
+        return function
+
+
+def write_orphan(root, name, payloads, checkpoint_after=0, tail=b''):
+    """Direktori worker yang sudah mati: segmen 1 berisi payloads (+ tail mentah)"""
+    directory = os.path.join(root, name)
+    os.makedirs(directory)
+    offsets = [0]
+    with open(os.path.join(directory, '00000001.seg'), 'wb') as f:
+        for number, payload in enumerate(payloads):
+            f.write(encode_record(payload, 1000.0 + number))
+            offsets.append(f.tell())
+        f.write(tail)
+    write_checkpoint(directory, (1, offsets[checkpoint_after]))
+    return directory
+
+
+def journal_for(root, handler, adopt_at_start=False, **kwargs):
+    journal = WebhookJournal(str(root), group_commit=0, **kwargs)
+    if not adopt_at_start:
+        # adopt_orphans dipanggil langsung oleh test
+        journal._adopt_pid = os.getpid()
+    journal.init_app(_App(), handler)
+    return journal
+
+
+def test_dead_worker_records_after_checkpoint_are_replayed(tmp_path):
+    # Worker mati setelah ack 3 record, baru 1 yang di-checkpoint
+    directory = write_orphan(tmp_path, 'host-1-1', [b'a', b'b', b'c'], checkpoint_after=1)
+    processed = []
+
+    replayed = journal_for(tmp_path, processed.extend).adopt_orphans()
+
+    assert replayed == 2
+    assert processed == [b'b', b'c']
+    assert not os.path.exists(directory)
+
+
+def test_orphans_are_adopted_at_start_without_new_webhooks(tmp_path):
+    directory = write_orphan(tmp_path, 'host-1-1', [b'a', b'b'])
+    processed = []
+    done = threading.Event()
+
+    def handler(payloads):
+        processed.extend(payloads)
+        done.set()
+
+    journal = journal_for(tmp_path, handler, adopt_at_start=True)
+
+    assert done.wait(5)
+    assert processed == [b'a', b'b']
+    # Belum ada append: proses ini belum membuat direktori journal sendiri
+    assert journal.directory is None
+    deadline = time.monotonic() + 5
+    while os.path.exists(directory) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not os.path.exists(directory)
+
+
+def test_corrupt_tail_is_skipped(tmp_path):
+    # Tulisan terakhir terpotong saat crash: header lengkap, payload setengah
+    torn = encode_record(b'{"entry": []}', 1003.0)[:-5]
+    directory = write_orphan(tmp_path, 'host-1-1', [b'a', b'b'], tail=torn)
+
+    assert [payload for _, _, payload in iter_segment(os.path.join(directory, '00000001.seg'))] == [b'a', b'b']
+
+    processed = []
+    assert journal_for(tmp_path, processed.extend).adopt_orphans() == 2
+    assert processed == [b'a', b'b']
+
+
+def test_flipped_byte_stops_at_crc_mismatch(tmp_path):
+    directory = write_orphan(tmp_path, 'host-1-1', [b'first', b'second', b'third'])
+    path = os.path.join(directory, '00000001.seg')
+    with open(path, 'r+b') as f:
+        data = bytearray(f.read())
+        data[data.index(b'second')] ^= 0xFF
+        f.seek(0)
+        f.write(data)
+
+    assert [payload for _, _, payload in iter_segment(path)] == [b'first']
+
+
+def test_handler_error_keeps_checkpoint(tmp_path):
+    directory = write_orphan(tmp_path, 'host-1-1', [b'a', b'b'])
+
+    def failing(payloads):
+        raise RuntimeError('database down')
+
+    with pytest.raises(RuntimeError):
+        journal_for(tmp_path, failing).adopt_orphans()
+
+    assert os.path.isdir(directory)
+    assert read_checkpoint(directory) == (1, 0)
+
+    processed = []
+    assert journal_for(tmp_path, processed.extend).adopt_orphans() == 2
+    assert processed == [b'a', b'b']
+
+
+def test_append_is_processed_by_consumer_and_kept_as_trace(tmp_path):
+    processed = []
+    done = threading.Event()
+
+    def handler(payloads):
+        processed.extend(payloads)
+        if len(processed) == 3:
+            done.set()
+
+    journal = journal_for(tmp_path, handler, segment_bytes=64)
+    for number, payload in enumerate([b'x' * 40, b'y' * 40, b'z' * 40]):
+        journal.append(payload, received_at=2000.0 + number)
+
+    assert done.wait(5)
+    assert processed == [b'x' * 40, b'y' * 40, b'z' * 40]
+    # segment_bytes kecil: setiap record di segmen sendiri, semuanya tetap bisa dibaca
+    assert len(webhook_journal._segment_numbers(journal.directory)) == 3
+    assert [payload for _, payload in iter_records(str(tmp_path))] == processed
+
+
+def corrupt(path, needle, at=0):
+    with open(path, 'r+b') as f:
+        data = bytearray(f.read())
+        data[data.index(needle) + at] ^= 0xFF
+        f.seek(0)
+        f.write(data)
+
+
+def test_corrupt_record_in_live_segment_does_not_block_later_records(tmp_path):
+    processed = []
+    first_batch = threading.Event()
+    release = threading.Event()
+    done = threading.Event()
+
+    def handler(payloads):
+        if not processed:
+            first_batch.set()
+            release.wait(5)
+        processed.extend(payloads)
+        if b'third' in payloads:
+            done.set()
+
+    journal = journal_for(tmp_path, handler)
+    journal.append(b'first')
+    assert first_batch.wait(5)
+    # Consumer tertahan di batch pertama; record berikutnya rusak setelah durable
+    journal.append(b'second')
+    journal.append(b'third')
+    segment = os.path.join(journal.directory, '00000001.seg')
+    corrupt(segment, b'second')
+    release.set()
+
+    assert done.wait(5)
+    assert processed == [b'first', b'third']
+    # Checkpoint ditulis setelah handler selesai
+    deadline = time.monotonic() + 5
+    while read_checkpoint(journal.directory) != (1, os.path.getsize(segment)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert read_checkpoint(journal.directory) == (1, os.path.getsize(segment))
+
+
+def test_unreadable_length_skips_to_durable_end(tmp_path):
+    directory = write_orphan(tmp_path, 'host-1-1', [b'a', b'b', b'c'])
+    segment = os.path.join(directory, '00000001.seg')
+    record_size = len(encode_record(b'a', 0.0))
+    with open(segment, 'r+b') as f:
+        f.seek(record_size)
+        f.write(b'\xff\xff\xff\x7f')  # panjang record kedua jadi ~2 GB
+    size = os.path.getsize(segment)
+
+    journal = journal_for(tmp_path, lambda payloads: None)
+    payloads, position = journal._read_batch(directory, (1, 0), (1, size))
+
+    assert payloads == [b'a']
+    assert position == (1, size)
@@ -0,0 +1,160 @@
+"""
+Capture body webhook untuk replay benchmark (python -m benchmark.replay)
+
+Dengan WEBHOOK_CAPTURE_DIR di-set, setiap POST /webhook WhatsApp ditulis ke
+file NDJSON per proses worker: {"t": waktu terima (epoch), "body": {...}}.
+Nomor telepon, wa_id, dan message id diganti pseudonim HMAC yang stabil
+(nomor yang sama selalu jadi pseudonim yang sama selama WEBHOOK_CAPTURE_SALT
+sama), nama profil dihapus, dan nomor HP Indonesia (08.., 628.., +62 8..) di
+teks pesan ikut diganti; tanggal, NIK, dan angka lain dibiarkan. Payload media/lokasi/kontak tidak disimpan.
+
+Capture berhenti setelah WEBHOOK_CAPTURE_MAX_BYTES per proses. Kegagalan
+capture hanya di-log, tidak pernah menggagalkan webhook.
+"""
+
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import socket
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PSEUDONYM_PREFIX = '62800'
+# 15 digit hash: tabrakan pseudonim baru mungkin di puluhan juta nomor (users.phone_number 20 char)
+PSEUDONYM_DIGITS = 15
+# Nomor HP Indonesia: 08xx / 628xx / +62 8xx, 9-12 digit mulai dari angka 8, boleh dipisah spasi/strip
+PHONE_IN_TEXT = re.compile(r'(?<![\d+])(?:\+62[ \-]?|62|0)8\d(?:[ \-]?\d){7,10}(?!\d)')
+# Field per tipe pesan yang dibutuhkan handle_message; selain itu dibuang
+KEPT_MESSAGE_FIELDS = ('from', 'id', 'timestamp', 'type', 'text', 'interactive', 'button', 'context')
+
+
+class Scrubber:
+    """Ganti data pribadi di body webhook dengan pseudonim HMAC yang stabil"""
+
+    def __init__(self, salt: bytes):
+        self.salt = salt
+
+    def _digest(self, value: str) -> str:
+        return hmac.new(self.salt, value.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def phone(self, number: Optional[str]) -> Optional[str]:
+        if not number:
+            return number
+        digits = re.sub(r'\D', '', number)
+        if digits.startswith('0'):
+            # 0812.. di teks pesan = 62812.. di wa_id
+            digits = '62' + digits[1:]
+        hashed = int(self._digest(digits), 16) % 10 ** PSEUDONYM_DIGITS
+        return f'{PSEUDONYM_PREFIX}{hashed:0{PSEUDONYM_DIGITS}d}'
+
+    def message_id(self, message_id: Optional[str]) -> Optional[str]:
+        if not message_id:
+            return message_id
+        return f'wamid.CAP{self._digest(message_id)[:24].upper()}'
+
+    def text(self, text: Optional[str]) -> Optional[str]:
+        if not text:
+            return text
+        return PHONE_IN_TEXT.sub(lambda match: self.phone(match.group()), text)
+
+    def _message(self, message: Dict) -> Dict:
+        scrubbed = {key: message[key] for key in KEPT_MESSAGE_FIELDS if key in message}
+        scrubbed['from'] = self.phone(message.get('from'))
+        scrubbed['id'] = self.message_id(message.get('id'))
+        if 'text' in scrubbed:
+            scrubbed['text'] = {'body': self.text(scrubbed['text'].get('body'))}
+        if 'context' in scrubbed:
+            scrubbed['context'] = {
+                'from': self.phone(scrubbed['context'].get('from')),
+                'id': self.message_id(scrubbed['context'].get('id')),
+            }
+        return scrubbed
+
+    def body(self, body: Dict) -> Dict:
+        """Salinan body webhook tanpa data pribadi"""
+        body = copy.deepcopy(body)
+        for entry in body.get('entry', []):
+            for change in entry.get('changes', []):
+                value = change.get('value', {})
+                if 'contacts' in value:
+                    value['contacts'] = [
+                        {'wa_id': self.phone(contact.get('wa_id'))} for contact in value['contacts']
+                    ]
+                if 'messages' in value:
+                    value['messages'] = [self._message(message) for message in value['messages']]
+                for status in value.get('statuses', []):
+                    status['recipient_id'] = self.phone(status.get('recipient_id'))
+                    status['id'] = self.message_id(status.get('id'))
+        return body
+
+
+def _salt() -> bytes:
+    salt = os.getenv('WEBHOOK_CAPTURE_SALT')
+    if salt:
+        return salt.encode('utf-8')
+    if os.getenv('WEBHOOK_CAPTURE_DIR'):
+        logger.warning("⚠️ WEBHOOK_CAPTURE_SALT tidak di-set: pseudonim hanya stabil di proses ini")
+    return secrets.token_bytes(32)
+
+
+class WebhookCapture:
+    """Writer NDJSON per proses (thread-safe, tanpa fsync: capture bersifat best-effort)"""
+
+    def __init__(self, directory: str, scrubber: Scrubber, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.scrubber = scrubber
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pid = None
+        self._file = None
+        self._written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory)
+
+    def _ensure_open(self):
+        # File dibuka di proses yang menulis (aman setelah fork gunicorn)
+        if self._pid == os.getpid():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        name = f'capture-{socket.gethostname()}-{os.getpid()}-{int(time.time())}.ndjson'
+        self._file = open(os.path.join(self.directory, name), 'a', encoding='utf-8')
+        self._written = 0
+        self._pid = os.getpid()
+        logger.info("🎥 Webhook capture: %s", self._file.name)
+
+    def record(self, body: Dict, received_at: Optional[float] = None):
+        if not self.enabled:
+            return
+        try:
+            line = json.dumps(
+                {'t': time.time() if received_at is None else received_at, 'body': self.scrubber.body(body)},
+                ensure_ascii=False, separators=(',', ':'),
+            ) + '\n'
+            with self._lock:
+                self._ensure_open()
+                if self._written >= self.max_bytes:
+                    return
+                self._file.write(line)
+                self._file.flush()
+                self._written += len(line)
+                if self._written >= self.max_bytes:
+                    logger.warning("🎥 Webhook capture penuh (%s byte), capture berhenti", self._written)
+        except Exception as e:
+            logger.warning("⚠️ Webhook capture gagal: %s", e)
+
+
+capture = WebhookCapture(
+    os.getenv('WEBHOOK_CAPTURE_DIR', ''),
+    Scrubber(_salt()),
+    max_bytes=int(os.getenv('WEBHOOK_CAPTURE_MAX_BYTES', str(256 * 1024 * 1024))),
+)
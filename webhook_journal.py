@@ -0,0 +1,461 @@
+"""
+Journal webhook mentah (segmented, group-commit fsync)
+
+Dengan WEBHOOK_JOURNAL_DIR di-set, POST /webhook hanya menulis body mentah ke
+journal lalu langsung membalas 200 ke Meta. Record sudah di-fsync sebelum
+balasan dikirim, tetapi request yang datang bersamaan berbagi satu fsync
+(group commit): request pertama menjadi leader, menunggu
+WEBHOOK_JOURNAL_GROUP_COMMIT detik supaya request lain ikut menulis, lalu
+satu fsync membuat semuanya durable. Thread consumer membaca record yang
+sudah durable, memprosesnya, lalu menyimpan checkpoint.
+
+Format segmen (00000001.seg, 00000002.seg, ...), per record:
+
+    <I panjang payload> <I crc32(waktu + payload)> <d waktu terima (epoch)> payload
+
+Segmen berganti setelah WEBHOOK_JOURNAL_SEGMENT_BYTES.
+WEBHOOK_JOURNAL_KEEP_SEGMENTS segmen terakhir yang sudah diproses disimpan
+sebagai trace (lihat iter_records), yang lebih lama dihapus.
+
+Setiap proses worker menulis ke direktorinya sendiri (<dir>/<host>-<pid>-<ts>)
+dan memegang flock pada file .lock di dalamnya. Direktori yang lock-nya bisa
+diambil berarti pemiliknya sudah mati: record setelah checkpoint-nya diproses
+oleh worker lain lalu direktorinya dihapus. Setiap worker langsung mengadopsi
+direktori seperti itu saat start (init_app), tanpa menunggu webhook baru. Record yang sempat diproses tapi
+belum di-checkpoint aman diproses ulang, karena process_partition melewati
+message_id yang sudah ada di DB.
+"""
+
+import glob
+import logging
+import os
+import shutil
+import socket
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows (development): kunci antar proses tidak tersedia
+    fcntl = None
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('<IId')
+SEGMENT_SUFFIX = '.seg'
+CHECKPOINT_FILE = 'checkpoint'
+LOCK_FILE = '.lock'
+MAX_RETRY_BACKOFF = 30.0
+
+
+class JournalCorruptError(Exception):
+    """Record dengan CRC/panjang tidak valid (biasanya tulisan terakhir sebelum crash)"""
+
+
+def _segment_name(number: int) -> str:
+    return f'{number:08d}{SEGMENT_SUFFIX}'
+
+
+def _segment_numbers(directory: str) -> List[int]:
+    return sorted(
+        int(os.path.basename(path)[:-len(SEGMENT_SUFFIX)])
+        for path in glob.glob(os.path.join(directory, '*' + SEGMENT_SUFFIX))
+    )
+
+
+def encode_record(payload: bytes, received_at: float) -> bytes:
+    stamp = struct.pack('<d', received_at)
+    return HEADER.pack(len(payload), zlib.crc32(stamp + payload), received_at) + payload
+
+
+def read_record(f) -> Optional[Tuple[float, bytes]]:
+    """
+    Baca satu record dari posisi file saat ini.
+    None di akhir file; JournalCorruptError jika record terpotong/rusak.
+    """
+    header = f.read(HEADER.size)
+    if not header:
+        return None
+    if len(header) < HEADER.size:
+        raise JournalCorruptError('header terpotong')
+    length, crc, received_at = HEADER.unpack(header)
+    payload = f.read(length)
+    if len(payload) < length:
+        raise JournalCorruptError('payload terpotong')
+    if zlib.crc32(header[8:] + payload) != crc:
+        raise JournalCorruptError('crc tidak cocok')
+    return received_at, payload
+
+
+def iter_segment(path: str, offset: int = 0) -> Iterator[Tuple[int, float, bytes]]:
+    """Yield (offset setelah record, waktu terima, payload); berhenti di record rusak"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            try:
+                record = read_record(f)
+            except JournalCorruptError as e:
+                logger.warning("⚠️ Journal %s rusak di offset %s: %s", path, offset, e)
+                metrics.WEBHOOK_JOURNAL_RECORDS.labels(result='corrupt').inc()
+                return
+            if record is None:
+                return
+            offset = f.tell()
+            yield offset, record[0], record[1]
+
+
+def _skip_corrupt(path: str, offset: int, limit: int) -> int:
+    """
+    Offset setelah record rusak di `offset`: jika header masih masuk akal, lompati
+    satu record; jika tidak, sisa data sampai `limit` tidak bisa dibaca dan dilewati.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        header = f.read(HEADER.size)
+    end = limit
+    if len(header) == HEADER.size:
+        record_end = offset + HEADER.size + HEADER.unpack(header)[0]
+        if record_end <= limit:
+            end = record_end
+    # Sudah dihitung result='corrupt' oleh iter_segment
+    logger.error("❌ Journal %s: %s byte rusak di offset %s dilewati", path, end - offset, offset)
+    return end
+
+
+def iter_records(root: str) -> Iterator[Tuple[float, bytes]]:
+    """
+    Semua record di journal (semua direktori worker), urut waktu terima.
+    Dipakai sebagai trace untuk benchmark; termasuk record yang sudah diproses.
+    """
+    records = []
+    for directory in sorted(glob.glob(os.path.join(root, '*', ''))):
+        for number in _segment_numbers(directory):
+            for _, received_at, payload in iter_segment(os.path.join(directory, _segment_name(number))):
+                records.append((received_at, payload))
+    records.sort(key=lambda record: record[0])
+    return iter(records)
+
+
+# ============================================
+# Checkpoint & kunci direktori
+# ============================================
+
+def read_checkpoint(directory: str) -> Tuple[int, int]:
+    """(nomor segmen, offset) record pertama yang belum diproses"""
+    try:
+        with open(os.path.join(directory, CHECKPOINT_FILE), encoding='utf-8') as f:
+            segment, offset = f.read().split()
+            return int(segment), int(offset)
+    except (FileNotFoundError, ValueError):
+        numbers = _segment_numbers(directory)
+        return (numbers[0] if numbers else 1), 0
+
+
+def write_checkpoint(directory: str, position: Tuple[int, int]):
+    # Tanpa fsync: checkpoint yang hilang hanya membuat record diproses ulang
+    tmp_path = os.path.join(directory, f'{CHECKPOINT_FILE}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(f'{position[0]} {position[1]}')
+    os.replace(tmp_path, os.path.join(directory, CHECKPOINT_FILE))
+
+
+def _try_lock(directory: str):
+    """Ambil flock direktori worker; return file lock atau None jika masih dipegang"""
+    lock_file = open(os.path.join(directory, LOCK_FILE), 'a')
+    if fcntl is None:
+        return lock_file
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+    except BlockingIOError:
+        lock_file.close()
+        return None
+
+
+# ============================================
+# Journal
+# ============================================
+
+class WebhookJournal:
+    """Writer group-commit + consumer thread per proses worker"""
+
+    def __init__(
+        self,
+        root: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        group_commit: float = 0.002,
+        keep_segments: int = 4,
+        batch_records: int = 100,
+        orphan_scan_interval: float = 60.0,
+    ):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.group_commit = group_commit
+        self.keep_segments = keep_segments
+        self.batch_records = max(batch_records, 1)
+        self.orphan_scan_interval = orphan_scan_interval
+        self._handler: Optional[Callable[[List[bytes]], None]] = None
+        self._app = None
+        self._pid = None
+        self._adopt_pid = None
+        self._condition = threading.Condition()
+        self.directory = None
+        self._lock_file = None
+        self._file = None
+        self._segment = 0
+        self._offset = 0
+        self._durable = (0, 0)
+        self._syncing = False
+        self._unsynced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def init_app(self, app, handler: Callable[[List[bytes]], None]):
+        """handler(payloads) dipanggil consumer di dalam app context"""
+        if self.enabled and self._app is not app:
+            # App yang dibuat sebelum fork (--preload): worker memulai adopsi saat request pertama
+            app.before_request(self.ensure_started)
+        self._app = app
+        self._handler = handler
+        self.ensure_started()
+
+    def ensure_started(self):
+        """
+        Adopsi direktori worker yang mati begitu proses ini start, tanpa menunggu
+        webhook baru (consumer sendiri baru dibuat saat append pertama)
+        """
+        if not self.enabled or self._app is None or self._adopt_pid == os.getpid():
+            return
+        with self._condition:
+            if self._adopt_pid == os.getpid():
+                return
+            self._adopt_pid = os.getpid()
+        threading.Thread(target=self._adopt_at_start, name='webhook-journal-adopt', daemon=True).start()
+
+    def _adopt_at_start(self):
+        backoff = 0.0
+        while True:
+            try:
+                self.adopt_orphans()
+                return
+            except Exception as e:
+                backoff = min(max(backoff * 2, 1.0), MAX_RETRY_BACKOFF)
+                logger.error("❌ Adopsi journal gagal, coba lagi dalam %.0f detik: %s", backoff, e)
+                metrics.WEBHOOK_JOURNAL_RECORDS.labels(result='retry').inc()
+                time.sleep(backoff)
+
+    def _ensure_open(self):
+        # Direktori & thread dibuat di proses yang menulis (aman setelah fork gunicorn)
+        if self._pid == os.getpid():
+            return
+        name = f'{socket.gethostname()}-{os.getpid()}-{int(time.time())}'
+        # Dibuat & dikunci dengan nama tersembunyi dulu supaya tidak diadopsi worker lain
+        staging = os.path.join(self.root, f'.{name}')
+        directory = os.path.join(self.root, name)
+        os.makedirs(staging, exist_ok=True)
+        self._lock_file = _try_lock(staging)
+        os.rename(staging, directory)
+        self.directory = directory
+        self._segment = 1
+        self._offset = 0
+        self._durable = (1, 0)
+        self._syncing = False
+        self._file = open(os.path.join(directory, _segment_name(1)), 'ab')
+        write_checkpoint(directory, (1, 0))
+        self._pid = os.getpid()
+        threading.Thread(target=self._consume, name='webhook-journal', daemon=True).start()
+        logger.info("📒 Webhook journal: %s", directory)
+
+    def _rotate(self):
+        """Tutup segmen aktif (sudah di-fsync) dan buka segmen berikutnya (lock dipegang)"""
+        while self._syncing:
+            self._condition.wait()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._segment += 1
+        self._offset = 0
+        self._file = open(os.path.join(self.directory, _segment_name(self._segment)), 'ab')
+        self._durable = (self._segment, 0)
+        self._unsynced = 0
+        self._condition.notify_all()
+
+    def append(self, payload: bytes, received_at: Optional[float] = None):
+        """Tulis satu body webhook; kembali setelah record durable di disk"""
+        record = encode_record(payload, time.time() if received_at is None else received_at)
+        with self._condition:
+            self._ensure_open()
+            if self._offset and self._offset + len(record) > self.segment_bytes:
+                self._rotate()
+            self._file.write(record)
+            self._offset += len(record)
+            self._unsynced += 1
+            position = (self._segment, self._offset)
+            metrics.QUEUE_DEPTH.labels(queue='webhook_journal').inc()
+
+            while self._durable < position:
+                if self._syncing:
+                    self._condition.wait()
+                    continue
+                self._sync()
+        metrics.WEBHOOK_JOURNAL_RECORDS.labels(result='appended').inc()
+
+    def _sync(self):
+        """Jadi leader group commit: satu fsync untuk semua record yang sudah ditulis"""
+        self._syncing = True
+        try:
+            if self.group_commit > 0:
+                # Lock dilepas selama menunggu: request lain ikut menulis ke segmen ini
+                self._condition.wait(self.group_commit)
+            target = (self._segment, self._offset)
+            metrics.WEBHOOK_JOURNAL_GROUP_SIZE.observe(self._unsynced)
+            self._unsynced = 0
+            self._file.flush()
+            fileno = self._file.fileno()
+            started = time.perf_counter()
+            self._condition.release()
+            try:
+                os.fsync(fileno)
+            finally:
+                self._condition.acquire()
+            metrics.WEBHOOK_JOURNAL_FSYNC.observe(time.perf_counter() - started)
+            self._durable = max(self._durable, target)
+        finally:
+            self._syncing = False
+            self._condition.notify_all()
+
+    def _wait_durable(self, position: Tuple[int, int], timeout: float) -> Tuple[int, int]:
+        with self._condition:
+            if self._durable <= position:
+                self._condition.wait(timeout)
+            return self._durable
+
+    def _read_batch(self, directory: str, position: Tuple[int, int],
+                    until: Optional[Tuple[int, int]]) -> Tuple[List[bytes], Tuple[int, int]]:
+        """
+        Maksimal batch_records payload mulai dari `position`, tidak melewati `until`
+        (posisi durable). until=None untuk direktori yatim: baca sampai record valid terakhir.
+        """
+        payloads = []
+        segment, offset = position
+        while len(payloads) < self.batch_records:
+            path = os.path.join(directory, _segment_name(segment))
+            if not os.path.exists(path):
+                break
+            for end, _, payload in iter_segment(path, offset):
+                if until is not None and (segment, end) > until:
+                    break
+                payloads.append(payload)
+                offset = end
+                if len(payloads) >= self.batch_records:
+                    break
+            else:
+                # Berhenti sebelum batas: record di `offset` rusak; lewati supaya
+                # record sesudahnya tidak ikut tertahan (consumer tidak berputar di sini)
+                limit = until[1] if until is not None and segment == until[0] else os.path.getsize(path)
+                if offset < limit:
+                    offset = _skip_corrupt(path, offset, limit)
+                    continue
+                # Segmen habis; segmen sebelum segmen durable sudah di-fsync saat rotasi
+                next_exists = os.path.exists(os.path.join(directory, _segment_name(segment + 1)))
+                if next_exists and (until is None or segment < until[0]):
+                    segment, offset = segment + 1, 0
+                    continue
+            break
+        return payloads, (segment, offset)
+
+    def _process(self, payloads: List[bytes]):
+        """
+        Jalankan handler. Payload yang tidak bisa di-decode dilewati oleh handler;
+        exception lain (DB/Graph API down) diteruskan supaya checkpoint tidak maju.
+        """
+        started = time.perf_counter()
+        with self._app.app_context():
+            self._handler(payloads)
+        metrics.WEBHOOK_JOURNAL_RECORDS.labels(result='processed').inc(len(payloads))
+        logger.debug("📒 %s record journal diproses (%.3fs)", len(payloads), time.perf_counter() - started)
+
+    def _prune(self, segment: int):
+        """Hapus segmen yang sudah diproses, sisakan keep_segments sebagai trace"""
+        for number in _segment_numbers(self.directory):
+            if number >= segment - self.keep_segments:
+                break
+            os.remove(os.path.join(self.directory, _segment_name(number)))
+
+    def _consume(self):
+        position = read_checkpoint(self.directory)
+        next_scan = time.monotonic()
+        backoff = 0.0
+        while True:
+            durable = self._wait_durable(position, timeout=1.0)
+            try:
+                if time.monotonic() >= next_scan:
+                    self.adopt_orphans()
+                    next_scan = time.monotonic() + self.orphan_scan_interval
+                if durable <= position:
+                    continue
+                payloads, new_position = self._read_batch(self.directory, position, durable)
+                if payloads:
+                    self._process(payloads)
+                    metrics.QUEUE_DEPTH.labels(queue='webhook_journal').dec(len(payloads))
+                if new_position != position:
+                    write_checkpoint(self.directory, new_position)
+                    if new_position[0] != position[0]:
+                        self._prune(new_position[0])
+                    position = new_position
+                backoff = 0.0
+            except Exception as e:
+                # Checkpoint tidak maju: batch yang sama dicoba lagi (dedup message_id
+                # membuat pesan yang sempat diproses tidak dikirim dua kali)
+                backoff = min(max(backoff * 2, 1.0), MAX_RETRY_BACKOFF)
+                logger.error("❌ Journal consumer gagal, coba lagi dalam %.0f detik: %s", backoff, e)
+                metrics.WEBHOOK_JOURNAL_RECORDS.labels(result='retry').inc()
+                time.sleep(backoff)
+
+    def adopt_orphans(self) -> int:
+        """Proses record direktori worker yang sudah mati, lalu hapus direktorinya"""
+        processed = 0
+        for directory in sorted(glob.glob(os.path.join(self.root, '*', ''))):
+            directory = directory.rstrip(os.sep)
+            if directory == self.directory:
+                continue
+            try:
+                lock_file = _try_lock(directory)
+            except OSError:
+                continue  # baru saja dihapus worker lain yang mengadopsinya
+            if lock_file is None:
+                continue  # pemiliknya masih hidup
+            try:
+                position = read_checkpoint(directory)
+                while True:
+                    payloads, new_position = self._read_batch(directory, position, None)
+                    if payloads:
+                        self._process(payloads)
+                        metrics.WEBHOOK_JOURNAL_RECORDS.labels(result='replayed').inc(len(payloads))
+                        processed += len(payloads)
+                    write_checkpoint(directory, new_position)
+                    position = new_position
+                    if len(payloads) < self.batch_records:
+                        break
+                shutil.rmtree(directory, ignore_errors=True)
+            finally:
+                lock_file.close()
+        if processed:
+            logger.warning("📒 %s record journal dari worker yang mati diproses ulang", processed)
+        return processed
+
+
+journal = WebhookJournal(
+    os.getenv('WEBHOOK_JOURNAL_DIR', ''),
+    segment_bytes=int(os.getenv('WEBHOOK_JOURNAL_SEGMENT_BYTES', str(64 * 1024 * 1024))),
+    group_commit=float(os.getenv('WEBHOOK_JOURNAL_GROUP_COMMIT', '0.002')),
+    keep_segments=int(os.getenv('WEBHOOK_JOURNAL_KEEP_SEGMENTS', '4')),
+    batch_records=int(os.getenv('WEBHOOK_JOURNAL_BATCH', '100')),
+)